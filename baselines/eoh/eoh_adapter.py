@@ -25,7 +25,10 @@ class EoH:
         print("- Evolution Start -")
 
         method = EOH(self.paras, self.problem, prob_rank, pop_greedy)
-        results = method.run()
+        try:
+            results = method.run()
+        finally:
+            self.problem.evaluator.close()
 
         print("> End of Evolution! ")
         print("----------------------------------------- ")
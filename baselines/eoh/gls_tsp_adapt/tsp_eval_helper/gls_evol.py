@@ -46,7 +46,7 @@ def nearest_neighbor_2End(dis_matrix, depot):
     return route2End
 
 
-@jit(nopython=True)
+@jit(nopython=True, cache=True)
 def local_search(init_tour, init_cost, D, N, first_improvement=False):
     cur_route, cur_cost = init_tour, init_cost
     improved = True
@@ -65,7 +65,7 @@ def local_search(init_tour, init_cost, D, N, first_improvement=False):
     return cur_route, cur_cost
 
 
-@jit(nopython=True)
+@jit(nopython=True, cache=True)
 def route2tour(route):
     s = 0
     tour = []
@@ -75,7 +75,7 @@ def route2tour(route):
     return tour
 
 
-@jit(nopython=True)
+@jit(nopython=True, cache=True)
 def tour2route(tour):
     n = len(tour)
     route2End = np.zeros((n, 2))
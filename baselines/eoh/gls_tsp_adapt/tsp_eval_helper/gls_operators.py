@@ -4,7 +4,7 @@ import numpy as np
 from numba import jit
 
 
-@jit(nopython=True)
+@jit(nopython=True, cache=True)
 def two_opt(tour, i, j):
     if i == j:
         return tour
@@ -25,7 +25,7 @@ def two_opt(tour, i, j):
     return tour
 
 
-@jit(nopython=True)
+@jit(nopython=True, cache=True)
 def two_opt_cost(tour, D, i, j):
     if i == j:
         return 0
@@ -40,7 +40,7 @@ def two_opt_cost(tour, D, i, j):
     return delta
 
 
-@jit(nopython=True)
+@jit(nopython=True, cache=True)
 def two_opt_a2a(tour, D, N, first_improvement=False, set_delta=0):
     best_move = None
     best_delta = set_delta
@@ -63,7 +63,7 @@ def two_opt_a2a(tour, D, N, first_improvement=False, set_delta=0):
     return 0, tour
 
 
-@jit(nopython=True)
+@jit(nopython=True, cache=True)
 def two_opt_o2a(tour, D, i, first_improvement=False):
     assert i > 0 and i < len(tour) - 1
 
@@ -87,7 +87,7 @@ def two_opt_o2a(tour, D, i, first_improvement=False):
     return 0, tour
 
 
-@jit(nopython=True)
+@jit(nopython=True, cache=True)
 def two_opt_o2a_all(tour, D, N, i):
     best_move = None
     best_delta = 0
@@ -105,7 +105,7 @@ def two_opt_o2a_all(tour, D, N, i):
     return best_delta, tour
 
 
-@jit(nopython=True)
+@jit(nopython=True, cache=True)
 def relocate(tour, i, j):
     a = tour[i, 0]
     b = tour[i, 1]
@@ -121,7 +121,7 @@ def relocate(tour, i, j):
     return tour
 
 
-@jit(nopython=True)
+@jit(nopython=True, cache=True)
 def relocate_cost(tour, D, i, j):
     if i == j:
         return 0
@@ -142,7 +142,7 @@ def relocate_cost(tour, D, i, j):
     return delta
 
 
-@jit(nopython=True)
+@jit(nopython=True, cache=True)
 def relocate_o2a(tour, D, i, first_improvement=False):
     assert i > 0 and i < len(tour) - 1
 
@@ -166,7 +166,7 @@ def relocate_o2a(tour, D, i, first_improvement=False):
     return 0, tour
 
 
-@jit(nopython=True)
+@jit(nopython=True, cache=True)
 def relocate_o2a_all(tour, D, N, i):
     best_move = None
     best_delta = 0
@@ -184,7 +184,7 @@ def relocate_o2a_all(tour, D, N, i):
     return best_delta, tour
 
 
-@jit(nopython=True)
+@jit(nopython=True, cache=True)
 def relocate_a2a(tour, D, N, first_improvement=False, set_delta=0):
     best_move = None
     best_delta = set_delta
@@ -52,7 +52,7 @@ def transform_to_graph(distance_matrix):
 
     return graph
 
-@jit(nopython=True)
+@jit(nopython=True, cache=True)
 def calculate_neighbor_matrix(distance_matrix, m):
     n = len(distance_matrix)
     nearest_neighbor_indices = np.zeros((n, m))
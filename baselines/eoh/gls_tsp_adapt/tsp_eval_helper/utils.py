@@ -17,7 +17,7 @@ def tour_cost(dis_m, tour):
     return c
 
 
-@jit(nopython=True)
+@jit(nopython=True, cache=True)
 def tour_cost_2End(dis_m, tour2End):
     c = 0
     s = 0
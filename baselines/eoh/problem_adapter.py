@@ -1,10 +1,9 @@
 import logging
 import os
-import subprocess
 import re
 
-from baselines.eoh.gls_tsp_adapt.gls_tsp_eval import Sandbox
-from utils.utils import block_until_running, file_to_string, filter_traceback
+from evaluation import EvaluationTask, make_evaluator
+from utils.utils import file_to_string
 
 class Prompts:
     def __init__(self, problem_cfg, root_dir:str):
@@ -65,6 +64,7 @@ class Problem:
         self.obj_type = self.config.problem.obj_type
         self.problem_type = self.config.problem.problem_type
         self.output_file = f"{self.root_dir}/problems/{self.problem}/gpt.py"
+        self.evaluator = make_evaluator(cfg, root_dir)
 
         if self.problem_type == "tsp_constructive":
             from .original.prompts.tsp_greedy import GetPrompts
@@ -116,118 +116,32 @@ class Problem:
         """
         self.iteration = iteration
         population = [self.response_to_individual(resp, index) for index, resp in enumerate(codes)]
-        inner_runs = []
+        tasks = []
 
         for response_id, individual in enumerate(population):
             runid = hash(individual["code"])
 
             if individual["code"] is None:
                 population[response_id] = self.mark_invalid_individual(individual, "Invalid response!")
-                inner_runs.append(None)
                 continue
 
             logging.info(f"Iteration {self.iteration}: Running Code {runid}")
+            tasks.append(EvaluationTask(individual["code"], individual["stdout_filepath"], response_id))
 
-            try:
-                logging.debug(f"Iteration {self.iteration}: Processing Code Run {runid}")
-
-                if self.problem != 'tsp_gls':
-                    with open(self.output_file, 'w') as file:
-                        file.writelines(individual["code"] + '\n')
-
-                    stdout_filepath = individual["stdout_filepath"]
-                    file_path = f'{self.root_dir}/problems/{self.problem}/eval.py' if self.problem_type != "black_box" else f'{self.root_dir}/problems/{self.problem}/eval_black_box.py'
-
-                    with open(stdout_filepath, 'w') as f:
-                        process = subprocess.Popen(
-                            ['python', '-u', file_path, f'{self.problem_size}', self.root_dir, "train"], stdout=f,
-                            stderr=f)
-
-                    block_until_running(stdout_filepath, log_status=True)
-                    inner_runs.append(process)
-
-                else:
-                    # Special case handling for tsp_gls
-                    sand_box = Sandbox()
-                    result, run_ok = sand_box.run(individual["code"])
-
-                    if not run_ok:
-                        raise RuntimeError("Sandbox execution failed")
-
-                    # Assuming `result` contains the output that you would otherwise read from the stdout file
-                    stdout_str = result
-                    individual["stdout_filepath"] = "Sandbox Execution"
-
-                    # Process the result directly, similar to how it's done after reading the stdout file
-                    traceback_msg = filter_traceback(stdout_str)
-
-                    if not traceback_msg:
-                        try:
-                            individual["obj"] = float(stdout_str.split('\n')[-2])
-                            assert individual["obj"] > 0, "Objective value <= 0 is not supported."
-                            if self.obj_type == "max":
-                                individual["obj"] = -individual["obj"]
-                            individual["exec_success"] = True
-                        except Exception as e:
-                            population[response_id] = self.mark_invalid_individual(individual,
-                                                                                   "Invalid stdout / objective value!")
-                            logging.error(f"Error processing objective for response_id {response_id}: {e}")
-                    else:
-                        population[response_id] = self.mark_invalid_individual(individual, traceback_msg)
-                        logging.error(f"Traceback for response_id {response_id}: {traceback_msg}")
-
-                    logging.info(
-                        f"Iteration {self.iteration}, response_id {response_id}: Objective value: {individual.get('obj')}")
-                    inner_runs.append(None)  # No process to manage for Sandbox
-
-            except Exception as e:
-                logging.error(f"Error for response_id {response_id}: {e}")
-                population[response_id] = self.mark_invalid_individual(individual, str(e))
-                inner_runs.append(None)
-                continue
-
-        # Wait for all processes to finish and collect results for non-Sandbox evaluations
-        for response_id, process in enumerate(inner_runs):
-            if process is None:
-                continue
-
-            try:
-                process.communicate(timeout=self.config.timeout)
-            except subprocess.TimeoutExpired as e:
-                logging.error(f"Timeout for response_id {response_id}: {e}")
-                population[response_id] = self.mark_invalid_individual(population[response_id], str(e))
-                process.kill()
-                continue
-
+        for result in self.evaluator.run(tasks):
+            response_id = result.task.response_id
             individual = population[response_id]
-            stdout_filepath = individual["stdout_filepath"]
-
-            try:
-                with open(stdout_filepath, 'r') as f:
-                    stdout_str = f.read()
-
-                traceback_msg = filter_traceback(stdout_str)
-
-                if not traceback_msg:  # If execution has no error
-                    try:
-                        individual["obj"] = float(stdout_str.split('\n')[-2])
-                        assert individual["obj"] > 0, "Objective value <= 0 is not supported."
-                        if self.obj_type == "max":
-                            individual["obj"] = -individual["obj"]
-                        individual["exec_success"] = True
-                    except Exception as e:
-                        population[response_id] = self.mark_invalid_individual(individual,
-                                                                               "Invalid stdout / objective value!")
-                        logging.error(f"Error processing objective for response_id {response_id}: {e}")
-                else:
-                    population[response_id] = self.mark_invalid_individual(individual, traceback_msg)
-                    logging.error(f"Traceback for response_id {response_id}: {traceback_msg}")
-
-                logging.info(
-                    f"Iteration {self.iteration}, response_id {response_id}: Objective value: {individual.get('obj')}")
-
-            except Exception as e:
-                logging.error(f"Failed to read stdout for response_id {response_id}: {e}")
-                population[response_id] = self.mark_invalid_individual(individual, "Failed to read stdout")
+            if result.success and result.obj > 0:
+                individual["obj"] = -result.obj if self.obj_type == "max" else result.obj
+                individual["exec_success"] = True
+            elif result.success:
+                population[response_id] = self.mark_invalid_individual(individual, "Invalid stdout / objective value!")
+                logging.error(f"Objective value <= 0 is not supported, response_id {response_id}: {result.obj}")
+            else:
+                population[response_id] = self.mark_invalid_individual(individual, result.traceback_msg)
+                logging.error(f"Traceback for response_id {response_id}: {result.traceback_msg}")
+
+            logging.info(
+                f"Iteration {self.iteration}, response_id {response_id}: Objective value: {individual.get('obj')}")
 
         return [indiv.get("obj") for indiv in population]
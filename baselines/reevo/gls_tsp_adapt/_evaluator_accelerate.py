@@ -4,7 +4,11 @@
 from __future__ import annotations
 
 import ast
-from typing import Sequence, Tuple, Any
+import hashlib
+import importlib
+import os
+import time
+from typing import Callable, Sequence, Tuple, Any
 import sys
 
 sys.path.append('../')
@@ -35,7 +39,8 @@ def add_import_package_statement(program: str, package_name: str, as_name=None,
 
 def _add_numba_decorator(
         program: str,
-        function_name: str
+        function_name: str,
+        jit_options: dict
 ) -> str:
     # parse to syntax tree
     tree = ast.parse(program)
@@ -63,7 +68,7 @@ def _add_numba_decorator(
                     ctx=ast.Load()
                 ),
                 args=[],  # args do not have argument name
-                keywords=[ast.keyword(arg='nopython', value=ast.NameConstant(value=True))]
+                keywords=[ast.keyword(arg=arg, value=ast.Constant(value=value)) for arg, value in jit_options.items()]
                 # keywords have argument name
             )
             # add the decorator to the decorator_list of the node
@@ -77,6 +82,7 @@ def _add_numba_decorator(
 def add_numba_decorator(
         program: str,
         function_name: str | Sequence[str],
+        **jit_options,
 ) -> str:
     """
     This function aims to accelerate the evaluation of the searched code. This is achieved by decorating '@numba.jit()'
@@ -93,14 +99,73 @@ def add_numba_decorator(
         numba.jit()
         def func(a: np.ndarray):
             return a * 2
+
+    jit_options are the keyword arguments of numba.jit(), nopython=True by default.
     """
+    jit_options = jit_options or {'nopython': True}
     if isinstance(function_name, str):
-        return _add_numba_decorator(program, function_name)
+        return _add_numba_decorator(program, function_name, jit_options)
     for f_name in function_name:
-        program = _add_numba_decorator(program, f_name)
+        program = _add_numba_decorator(program, f_name, jit_options)
     return program
 
 
+# Ways to run a heuristic, fastest first: compiled by numba, numba's object mode, plain Python
+JIT_MODES = {
+    'nopython': {'nopython': True, 'cache': True},
+    'object': {'forceobj': True, 'cache': True},
+    'python': None,
+}
+
+
+def _load_cached_program(program: str, cache_dir: str):
+    """Import the program as a module named after its hash, so that numba can cache what it compiles next to it.
+
+    ``cache_dir`` is put on ``sys.path``: numba's cache and the joblib workers
+    that receive the heuristic import the module by name. A program that is
+    already cached is not rewritten, as numba would take the new modification
+    time for a change of source and compile again.
+    """
+    module_name = f'heuristic_{hashlib.sha256(program.encode()).hexdigest()[:24]}'
+    path = os.path.join(cache_dir, f'{module_name}.py')
+    if not os.path.exists(path):
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(program)
+        os.replace(tmp_path, path)
+        importlib.invalidate_caches()
+    if cache_dir not in sys.path:
+        sys.path.insert(0, cache_dir)
+    return importlib.import_module(module_name)
+
+
+def compile_heuristic(program: str, function_name: str, probe_args: tuple, cache_dir: str,
+                      modes: Sequence[str] = tuple(JIT_MODES)) -> Tuple[Callable, str, float]:
+    """Compile the heuristic in the first of ``modes`` that runs it on ``probe_args``.
+
+    Returns the heuristic, the mode used and the seconds spent compiling. The
+    probe call, on a small instance, compiles the heuristic before the
+    evaluation starts, and a heuristic that numba cannot compile falls back to
+    the next mode instead of failing. Compiled heuristics are cached on disk
+    in ``cache_dir`` by the hash of their code, so a repeated heuristic, or
+    the same heuristic in another worker process, is loaded instead of
+    compiled. If every mode fails, the error of the last one is raised.
+    """
+    program = add_import_package_statement(program, 'numpy', 'np')
+    for mode in modes:
+        start = time.perf_counter()
+        try:
+            jit_options = JIT_MODES[mode]
+            moded_program = add_numba_decorator(program, function_name, **jit_options) if jit_options else program
+            func = getattr(_load_cached_program(moded_program, cache_dir), function_name)
+            func(*probe_args)
+            return func, mode, time.perf_counter() - start
+        except Exception:
+            if mode == modes[-1]:
+                raise
+
+
 def add_np_random_seed_below_numpy_import(program: str, seed: int = 2024) -> str:
     """Add 'import numpy as np' statement (if needed) to the program and insert 'np.random.seed(seed)' under it.
     Args:
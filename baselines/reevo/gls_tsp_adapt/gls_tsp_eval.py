@@ -1,10 +1,16 @@
 import multiprocessing
+import os
 import sys
 from typing import Any, Callable
 
+import numpy as np
+
 sys.path.append('../')
 from baselines.reevo.gls_tsp_adapt import _evaluator_accelerate
-from baselines.reevo.gls_tsp_adapt.tsp_eval_helper import ael_evaluation
+from baselines.reevo.gls_tsp_adapt.tsp_eval_helper import ael_evaluation, gls_evol, readTSPRandom
+
+# Compiled heuristics, by the hash of their code
+JIT_CACHE_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../../.cache/gls_jit'))
 
 
 def evaluate(function: Callable):
@@ -12,30 +18,29 @@ def evaluate(function: Callable):
     return evaluator.evaluate(function)
 
 
+def probe_args() -> tuple:
+    """Arguments of the types the GLS passes to the heuristic, on a 20-node instance: distances, tour, penalties."""
+    instance_path = os.path.join(os.path.dirname(ael_evaluation.__file__), 'instance', 'TSP20.pkl')
+    distances = readTSPRandom.read_instance_all(instance_path)[1][0]
+    return distances, gls_evol.nearest_neighbor_2End(distances, 0).astype(int), np.zeros_like(distances)
+
+
 class Sandbox:
     def __init__(self, verbose=False, numba_accelerate=True, timeout=30):
         self._verbose = verbose
         self._numba_accelerate = numba_accelerate
         self._timeout = timeout
+        self.last_mode = None  # how the last heuristic ran: see _evaluator_accelerate.JIT_MODES
 
     def run(self,
             function_to_evolve: str,  # RZ: accelerate the code by decorating @numba.jit() on function_to_evolve.
             ) -> tuple[Any, bool]:
         try:
             func_name = _evaluator_accelerate._extract_function_name(function_to_evolve)
-            function_to_evolve = _evaluator_accelerate.add_import_package_statement(function_to_evolve, 'numpy', 'np')
-            if self._numba_accelerate:
-                function_to_evolve = _evaluator_accelerate.add_numba_decorator(
-                    program=function_to_evolve,
-                    function_name=[func_name]
-                )
-            # print(function_to_evolve)
-            # compile the program, and maps the global func/var/class name to its address
-            all_globals_namespace = {}
-            # execute the program, map func/var/class to global namespace
-            exec(function_to_evolve, all_globals_namespace)
-            # get the pointer of 'function_to_run'
-            func_pointer = all_globals_namespace[func_name]
+            # compile the heuristic with numba, falling back to object mode or plain Python if numba cannot
+            modes = tuple(_evaluator_accelerate.JIT_MODES) if self._numba_accelerate else ('python',)
+            func_pointer, self.last_mode, _ = _evaluator_accelerate.compile_heuristic(
+                function_to_evolve, func_name, probe_args(), JIT_CACHE_DIR, modes)
             # return the execution results
             results = evaluate(func_pointer)
             if results is not None:
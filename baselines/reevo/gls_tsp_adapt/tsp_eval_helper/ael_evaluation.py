@@ -43,19 +43,12 @@ class Evaluation:
 
         return neighborhood_matrix
 
-    def evaluateGLS(self, heuristic_func: Callable):
-
-        # time.sleep(1)
-
-        nins = 64
-        gaps = np.zeros(nins)
-
-        # print("Start evaluation ...")
-
-        inputs = [(x, self.opt_costs[x], self.instances[x], self.coords[x], self.time_limit, self.ite_max,
-                   self.perturbation_moves, heuristic_func) for x in range(nins)]
-        # gaps = Parallel(n_jobs=nins)(delayed(solve_instance)(*input) for input in inputs)
+    def solve(self, x, heuristic_func: Callable):
+        """Gap of instance ``x``, or None if GLS failed on it."""
+        return solve_instance(x, self.opt_costs[x], self.instances[x], self.coords[x], self.time_limit, self.ite_max,
+                              self.perturbation_moves, heuristic_func)
 
+    def n_jobs(self):
         # ====================== Add Runtime Config by RZ ======================
         # read config file and load n_jobs during runtime
         try:
@@ -67,8 +60,26 @@ class Evaluation:
             n_jobs = config_dict['n_jobs']
         except:
             n_jobs = 4
+        # Concurrent candidates share the CPUs: stay within this evaluation's CPU slot
+        from evaluation.cpu_slots import cpu_slots
         # ======================================================================
+        return min(n_jobs, cpu_slots())
+
+    def evaluateGLS(self, heuristic_func: Callable, instance_ids=None):
+
+        # time.sleep(1)
+
+        nins = 64
+        gaps = np.zeros(nins)
+
+        # print("Start evaluation ...")
+
+        instance_ids = range(nins) if instance_ids is None else instance_ids
+        inputs = [(x, self.opt_costs[x], self.instances[x], self.coords[x], self.time_limit, self.ite_max,
+                   self.perturbation_moves, heuristic_func) for x in instance_ids]
+        # gaps = Parallel(n_jobs=nins)(delayed(solve_instance)(*input) for input in inputs)
 
+        n_jobs = self.n_jobs()
         try:
             gaps = Parallel(n_jobs=n_jobs, timeout=self.time_limit * 1.1)(
                 delayed(solve_instance)(*input) for input in inputs)
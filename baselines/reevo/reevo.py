@@ -1,11 +1,10 @@
-import subprocess
 import numpy as np
 import json
 import tiktoken
 from datetime import datetime
 import os
 from utils.utils import *
-from baselines.reevo.gls_tsp_adapt.gls_tsp_eval import Sandbox
+from evaluation import EvaluationTask, make_evaluator
 
 class ReEvo:
     def __init__(self, cfg, root_dir) -> None:
@@ -25,6 +24,7 @@ class ReEvo:
         self.best_code_path_overall = None
 
         self.init_prompt()
+        self.evaluator = make_evaluator(self.cfg, self.root_dir)
         self.init_population()
 
     def init_prompt(self) -> None:
@@ -177,96 +177,27 @@ class ReEvo:
         """
         Evaluate population by running code in parallel and computing objective values.
         """
-        if self.problem == 'tsp_gls':
-            sand_box = Sandbox()
-
-            inner_runs = []
-            # Run code to evaluate
-            for response_id in range(len(population)):
-                self.function_evals += 1
-                # Skip if response is invalid
-                if population[response_id]["code"] is None:
-                    population[response_id] = self.mark_invalid_individual(population[response_id], "Invalid response!")
-                    inner_runs.append(None)
-                    continue
-
-                logging.info(f"Iteration {self.iteration}: Running Code {response_id}")
-
-                result, run_ok = sand_box.run(population[response_id]['code'])
-                print("Log seed:", result, run_ok)
-
-
-                with open(os.path.join(self._my_log_path, f'samples_{self.function_evals}.json'), 'w') as f:
-                    _score = result if run_ok else None
-                    content = {
-                        'function': population[response_id]['code'],
-                        'score': _score,
-                        'iter': self.iteration
-                    }
-                    json.dump(content, f)
-                    f.close()
-
-                individual = population[response_id]
-                if run_ok:
-                    individual["obj"] = result
-                    individual["exec_success"] = run_ok
-                else:
-                    population[response_id] = self.mark_invalid_individual(population[response_id], 'RZ: no message.')
-
-                logging.info(
-                    f"Iteration {self.iteration}, response_id {response_id}: Objective value: {individual['obj']}")
-            return population
-        else:
-            inner_runs = []
-            # Run code to evaluate
-            for response_id in range(len(population)):
-                self.function_evals += 1
-                # Skip if response is invalid
-                if population[response_id]["code"] is None:
-                    population[response_id] = self.mark_invalid_individual(population[response_id], "Invalid response!")
-                    inner_runs.append(None)
-                    continue
-
-                logging.info(f"Iteration {self.iteration}: Running Code {response_id}")
-
-                try:
-                    process = self._run_code(population[response_id], response_id)
-                    inner_runs.append(process)
-                except Exception as e:  # If code execution fails
-                    logging.info(f"Error for response_id {response_id}: {e}")
-                    population[response_id] = self.mark_invalid_individual(population[response_id], str(e))
-                    inner_runs.append(None)
-
-            # Update population with objective values
-            for response_id, inner_run in enumerate(inner_runs):
-                if inner_run is None:  # If code execution fails, skip
-                    continue
-                try:
-                    inner_run.communicate(timeout=self.cfg.timeout)  # Wait for code execution to finish
-                except subprocess.TimeoutExpired as e:
-                    logging.info(f"Error for response_id {response_id}: {e}")
-                    population[response_id] = self.mark_invalid_individual(population[response_id], str(e))
-                    inner_run.kill()
-                    continue
-
-                individual = population[response_id]
-                stdout_filepath = individual["stdout_filepath"]
-                with open(stdout_filepath, 'r') as f:  # read the stdout file
-                    stdout_str = f.read()
-                traceback_msg = filter_traceback(stdout_str)
-
-                individual = population[response_id]
-                # Store objective value for each individual
-                if traceback_msg == '':  # If execution has no error
-                    try:
-                        individual["obj"] = float(stdout_str.split('\n')[-2]) if self.obj_type == "min" else -float(
-                            stdout_str.split('\n')[-2])
-                        individual["exec_success"] = True
-                    except:
-                        population[response_id] = self.mark_invalid_individual(population[response_id],
-                                                                               "Invalid std out / objective value!")
-                else:  # Otherwise, also provide execution traceback error feedback
-                    population[response_id] = self.mark_invalid_individual(population[response_id], traceback_msg)
+        tasks = []
+        for response_id in range(len(population)):
+            self.function_evals += 1
+            # Skip if response is invalid
+            if population[response_id]["code"] is None:
+                population[response_id] = self.mark_invalid_individual(population[response_id], "Invalid response!")
+                continue
+
+            logging.info(f"Iteration {self.iteration}: Running Code {response_id}")
+            individual = population[response_id]
+            tasks.append(EvaluationTask(individual["code"], individual["stdout_filepath"], response_id))
+
+        # Update population with objective values
+        for result in self.evaluator.run(tasks):
+            response_id = result.task.response_id
+            if result.success:
+                population[response_id]["obj"] = result.obj if self.obj_type == "min" else -result.obj
+                population[response_id]["exec_success"] = True
+            else:  # Otherwise, also provide execution traceback error feedback
+                population[response_id] = self.mark_invalid_individual(population[response_id],
+                                                                       result.traceback_msg)
 
         # Log after all population is evaluated
         valid_objs = [ind["obj"] for ind in population if ind["exec_success"]]
@@ -275,26 +206,6 @@ class ReEvo:
 
         return population
 
-    def _run_code(self, individual: dict, response_id) -> subprocess.Popen:
-        """
-        Write code into a file and run eval script.
-        """
-        logging.debug(f"Iteration {self.iteration}: Processing Code Run {response_id}")
-
-        with open(self.output_file, 'w') as file:
-            file.writelines(individual["code"] + '\n')
-
-        # Execute the python file with flags
-        with open(individual["stdout_filepath"], 'w') as f:
-            eval_file_path = f'{self.root_dir}/problems/{self.problem}/eval.py' if self.problem_type != "black_box" else f'{self.root_dir}/problems/{self.problem}/eval_black_box.py'
-            process = subprocess.Popen(['python', '-u', eval_file_path, f'{self.problem_size}', self.root_dir, "train"],
-                                       stdout=f, stderr=f)
-
-        block_until_running(individual["stdout_filepath"], log_status=True, iter_num=self.iteration,
-                            response_id=response_id)
-
-        return process
-
     def update_iter(self) -> None:
         """
         Update after each iteration
@@ -500,6 +411,7 @@ class ReEvo:
         return population
 
     def evolve(self):
+      try:
         while self.function_evals < self.cfg.max_fe:
             # If all individuals are invalid, stop
             if all([not individual["exec_success"] for individual in self.population]):
@@ -527,5 +439,7 @@ class ReEvo:
             self.population.extend(self.evaluate_population(mutated_population))
             # Update
             self.update_iter()
+      finally:
+        self.evaluator.close()
 
-        return self.best_code_overall, self.best_code_path_overall
\ No newline at end of file
+      return self.best_code_overall, self.best_code_path_overall
\ No newline at end of file
@@ -0,0 +1,102 @@
+"""Evaluation of LLM-generated heuristics.
+
+Runs each candidate heuristic through its problem's ``eval.py`` in an
+isolated workspace, many candidates at a time, either as one process per
+candidate (:class:`EvaluationEngine`) or on long-lived workers that keep the
+evaluator and dataset loaded (:class:`WarmWorkerPool`), or on evaluation
+daemons on other hosts (:class:`RemoteEvaluator`). Any of them can be wrapped
+in a :class:`CachedEvaluator` so that candidates already evaluated are not
+run again, and in a :class:`PreflightScreen` so that candidates failing a
+cheap in-process check are never dispatched. Every evaluator takes a list
+of tasks or a :class:`TaskStream` filled while the first tasks already run.
+Candidates that differ only in parameter values can share a template, which
+warm workers load once (:func:`bind_parameters`); :class:`TemplateRouter`
+sends them to a warm pool whatever the configured backend.
+``tsp_gls`` candidates are scored by the GLS sandbox, one process per
+candidate (:class:`SandboxEvaluator`). :func:`make_evaluator` builds the evaluator
+that every algorithm uses from the run's config.
+
+Quick start::
+
+    from evaluation import EvaluationEngine, EvaluationTask
+    engine = EvaluationEngine(root_dir, "tsp_aco", 50, timeout=50)
+    results = engine.run([EvaluationTask(code, "stdout0.txt")])
+"""
+
+from .backend import TemplateRouter, make_evaluator
+from .cache import (
+    CachedEvaluator,
+    FitnessCache,
+    code_fingerprint,
+    evaluator_version,
+    heuristic_aliases,
+    normalize_code,
+)
+from .cpu_slots import CpuAllocator, CpuSlot, apply_cpu_slot, cpu_slots
+from .engine import (
+    EvaluationEngine,
+    EvaluationResult,
+    EvaluationTask,
+    collect_in_order,
+    default_num_workers,
+    parse_stdout,
+    prepare_workspace,
+    result_from_record,
+)
+from .limits import ResourceLimits
+from .parameterised import bind_parameters, load_template
+from .preflight import PreflightScreen
+from .record import (
+    InstanceBudget,
+    InstanceTimeout,
+    Race,
+    RaceLost,
+    ResultRecord,
+    report_objective,
+    solve_instances,
+    timed_heuristic,
+)
+from .remote import EvaluationServer, RemoteEvaluator
+from .sandbox import SandboxEvaluator
+from .stream import TaskStream
+from .warm_pool import WarmWorkerPool
+
+__all__ = [
+    "TemplateRouter",
+    "make_evaluator",
+    "CachedEvaluator",
+    "FitnessCache",
+    "code_fingerprint",
+    "evaluator_version",
+    "heuristic_aliases",
+    "normalize_code",
+    "CpuAllocator",
+    "CpuSlot",
+    "apply_cpu_slot",
+    "cpu_slots",
+    "EvaluationEngine",
+    "EvaluationResult",
+    "EvaluationTask",
+    "collect_in_order",
+    "default_num_workers",
+    "parse_stdout",
+    "prepare_workspace",
+    "result_from_record",
+    "ResourceLimits",
+    "bind_parameters",
+    "load_template",
+    "PreflightScreen",
+    "InstanceBudget",
+    "InstanceTimeout",
+    "Race",
+    "RaceLost",
+    "ResultRecord",
+    "report_objective",
+    "solve_instances",
+    "timed_heuristic",
+    "EvaluationServer",
+    "RemoteEvaluator",
+    "SandboxEvaluator",
+    "TaskStream",
+    "WarmWorkerPool",
+]
@@ -0,0 +1,174 @@
+"""The evaluator every algorithm uses, built from the run's config.
+
+HSEvo, ReEvo, ReEvoHS, ReEvoRF and EoH all evaluate their candidates through
+:func:`make_evaluator`. Whatever the configured backend, the evaluator takes
+:class:`~evaluation.engine.EvaluationTask` objects and returns
+:class:`~evaluation.engine.EvaluationResult` objects. A faster backend
+therefore speeds up every algorithm, and comparisons between algorithms are
+not skewed by differences in how they evaluate.
+
+``eval_backend`` selects the implementation:
+
+- ``process``: one ``eval.py`` run per candidate, ``n_eval_workers`` at a time
+  (:class:`~evaluation.engine.EvaluationEngine`);
+- ``sequential``: the same, one candidate at a time;
+- ``warm``: long-lived workers with the evaluator and dataset loaded
+  (:class:`~evaluation.warm_pool.WarmWorkerPool`);
+- ``remote``: evaluation daemons on other hosts
+  (:class:`~evaluation.remote.RemoteEvaluator`).
+
+``tsp_gls`` is always scored by the GLS sandbox, one process per candidate
+(:class:`~evaluation.sandbox.SandboxEvaluator`). With ``hs_compile_once``,
+the ``process`` and ``sequential`` backends hand harmonies, which share a
+parameterised template, to warm workers while a harmony search lasts
+(:class:`TemplateRouter`). The pre-flight screen and the fitness cache wrap
+the backend when enabled, so there is one of each per run whatever evaluates
+a candidate. Local backends share the CPUs out in slots, one per concurrent
+evaluation (see :mod:`evaluation.cpu_slots`).
+"""
+
+from __future__ import annotations
+
+import multiprocessing.connection
+from typing import Callable, Iterator, Sequence, Union
+
+from .cache import CachedEvaluator, FitnessCache, evaluator_version, heuristic_aliases
+from .cpu_slots import CpuAllocator
+from .engine import EvaluationEngine, EvaluationResult, EvaluationTask, collect_in_order, default_num_workers
+from .limits import ResourceLimits
+from .preflight import PreflightScreen
+from .remote import RemoteEvaluator
+from .sandbox import SANDBOX_DIR, SandboxEvaluator
+from .stream import FilteredStream, TaskStream
+from .warm_pool import WarmWorkerPool
+
+BACKENDS = ("process", "sequential", "warm", "remote")
+
+
+class _Resumed(FilteredStream):
+    """``source`` with the tasks already taken from it put back in front."""
+
+    def __init__(self, taken: list[EvaluationTask], source: TaskStream) -> None:
+        super().__init__(source, lambda task: True)
+        self.taken = taken
+
+    @property
+    def finished(self) -> bool:
+        return not self.taken and self.source.finished
+
+    def drain(self) -> list[EvaluationTask]:
+        tasks, self.taken = self.taken + self.source.drain(), []
+        return tasks
+
+
+class TemplateRouter:
+    """Evaluate harmonies on warm workers and every other candidate on ``evaluator``.
+
+    The harmonies of one harmony search differ only in parameter values, and
+    carry the parameterised template they share. Warm workers compile it once
+    and bind each harmony's values, which takes milliseconds instead of a
+    process start-up. A call whose first task has a template goes to the pool
+    built by ``make_pool``; any other call goes to ``evaluator``. The pool is
+    started for the first harmonies and stopped as soon as other candidates are
+    evaluated again, so it holds no processes or CPU slots between harmony
+    searches. The two never run at once and may share a
+    :class:`~evaluation.cpu_slots.CpuAllocator`.
+
+    Args:
+        evaluator: Backend for candidates without a template.
+        make_pool: Builds the :class:`~evaluation.warm_pool.WarmWorkerPool` for harmonies.
+    """
+
+    def __init__(self, evaluator, make_pool: Callable[[], WarmWorkerPool]) -> None:
+        self.evaluator = evaluator
+        self.make_pool = make_pool
+        self._pool = None
+
+    def run(self, tasks: Sequence[EvaluationTask]) -> list[EvaluationResult]:
+        """Evaluate ``tasks``; results are returned in task order."""
+        return collect_in_order(tasks, self.iter_results(tasks))
+
+    def iter_results(self, tasks: Union[Sequence[EvaluationTask], TaskStream]) -> Iterator[EvaluationResult]:
+        """Evaluate ``tasks`` on the backend chosen by the first of them, yielding results as they are ready.
+
+        ``tasks`` may be a :class:`~evaluation.stream.TaskStream` that is still being filled.
+        """
+        source = TaskStream.of(tasks)
+        taken = source.drain()
+        while not taken and not source.finished:
+            multiprocessing.connection.wait([source])
+            taken = source.drain()
+        if not taken:
+            return
+        if taken[0].template is not None:
+            if self._pool is None:
+                self._pool = self.make_pool()
+            backend = self._pool
+        else:
+            self._stop_pool()
+            backend = self.evaluator
+        yield from backend.iter_results(_Resumed(taken, source))
+
+    def _stop_pool(self) -> None:
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+    def close(self) -> None:
+        self._stop_pool()
+        self.evaluator.close()
+
+
+def make_evaluator(cfg, root_dir: str):
+    """Evaluator for the problem in ``cfg``, wrapped in the pre-flight screen and fitness cache if enabled."""
+    problem = cfg.problem.problem_name
+    problem_size = cfg.problem.problem_size
+    problem_type = cfg.problem.problem_type
+    eval_backend = cfg.get("eval_backend", "process")
+    if eval_backend not in BACKENDS:
+        raise ValueError(f"Unknown eval_backend {eval_backend!r}, expected one of {', '.join(BACKENDS)}")
+    limits = ResourceLimits(cpu_seconds=cfg.get("eval_cpu_limit"),
+                            memory_mb=cfg.get("eval_memory_limit"),
+                            max_processes=cfg.get("eval_process_limit"))
+    num_workers = 1 if eval_backend == "sequential" else cfg.get("n_eval_workers")
+    cpu_allocator = None
+    if cfg.get("cpu_slots", True):
+        # Size the thread pools inside each evaluation to its share of the CPUs
+        cpu_allocator = CpuAllocator(int(num_workers) if num_workers else default_num_workers(),
+                                     cfg.get("cpu_slot_size"), pin=cfg.get("cpu_pinning", False))
+    version_paths = [f"{root_dir}/problems/{problem}"]
+
+    if problem == "tsp_gls":
+        evaluator = SandboxEvaluator(root_dir, problem_size, timeout=cfg.timeout,
+                                     num_workers=num_workers, limits=limits, cpu_allocator=cpu_allocator)
+        version_paths.append(f"{root_dir}/{SANDBOX_DIR}")
+    elif eval_backend == "remote":
+        # Evaluation daemons (python -m evaluation.serve) on other hosts; they apply their own limits
+        evaluator = RemoteEvaluator(cfg.eval_remote_workers, cfg.get("eval_remote_authkey"),
+                                    problem, problem_size, problem_type, timeout=cfg.timeout)
+    elif eval_backend == "warm":
+        # Long-lived workers with the evaluator, solver and train dataset already loaded
+        evaluator = WarmWorkerPool(root_dir, problem, problem_size, timeout=cfg.timeout,
+                                   num_workers=num_workers, limits=limits, cpu_allocator=cpu_allocator)
+    else:
+        evaluator = EvaluationEngine(root_dir, problem, problem_size, problem_type, timeout=cfg.timeout,
+                                     num_workers=num_workers, limits=limits, cpu_allocator=cpu_allocator)
+        if cfg.get("hs_compile_once", True):
+            # Harmonies share their code: warm workers compile it once per harmony search
+            evaluator = TemplateRouter(evaluator, lambda: WarmWorkerPool(
+                root_dir, problem, problem_size, timeout=cfg.timeout, num_workers=num_workers, limits=limits,
+                cpu_allocator=cpu_allocator))
+
+    if cfg.get("preflight", True):
+        # Reject candidates that fail to compile, have the wrong signature or crash on a tiny instance
+        prompt_path_suffix = "_black_box" if problem_type == "black_box" else ""
+        evaluator = PreflightScreen(evaluator, root_dir, problem,
+                                    f"{root_dir}/prompts/{problem}{prompt_path_suffix}/func_signature.txt",
+                                    timeout=cfg.get("preflight_timeout", 5), limits=limits)
+    if cfg.get("fitness_cache", True):
+        # Skip candidates whose normalised code was already evaluated in this run, or in earlier runs sharing the
+        # cache file if one is given
+        evaluator = CachedEvaluator(evaluator, FitnessCache(cfg.get("fitness_cache_path")), problem, problem_size,
+                                    "train", evaluator_version(*version_paths),
+                                    heuristic_aliases(f"{root_dir}/problems/{problem}/eval.py"))
+    return evaluator
@@ -0,0 +1,273 @@
+"""Fitness cache keyed on the normalised heuristic code.
+
+LLMs often return heuristics that differ from an earlier one only in
+comments, whitespace or docstrings, or in the ``_v1``/``_v2`` suffix of the
+function name. Harmony search can also propose the same parameter vector
+twice. :class:`CachedEvaluator` fingerprints each candidate's normalised
+AST together with the problem, problem size, dataset split and a hash of the
+evaluator sources. Only candidates it has not seen before are forwarded to
+the wrapped evaluator.
+
+By default the cache lives in memory for one run. Evaluations of the ACO
+problems are stochastic, and a cache shared across runs would freeze the
+first noisy score of a heuristic for every later seed. Given a file,
+successful evaluations are appended to it, so later runs start with them
+already known. Failures are remembered only for the current run. This way
+a broken environment is never cached.
+"""
+
+from __future__ import annotations
+
+import ast
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+from typing import Iterator, Optional, Sequence, Union
+
+from .engine import EvaluationResult, EvaluationTask, collect_in_order
+from .stream import FilteredStream, TaskStream
+
+class _DocstringStripper(ast.NodeTransformer):
+    """Drop module, class and function docstrings."""
+
+    def _strip_docstring(self, node):
+        body = node.body
+        if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant) \
+                and isinstance(body[0].value.value, str):
+            node.body = body[1:] or [ast.Pass()]
+        return node
+
+    def visit_Module(self, node):
+        self.generic_visit(node)
+        return self._strip_docstring(node)
+
+    def visit_ClassDef(self, node):
+        self.generic_visit(node)
+        return self._strip_docstring(node)
+
+    def visit_FunctionDef(self, node):
+        self.generic_visit(node)
+        return self._strip_docstring(node)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+
+class _Renamer(ast.NodeTransformer):
+    """Rename the function ``old`` to ``new``, where it is defined and wherever the name is used."""
+
+    def __init__(self, old: str, new: str) -> None:
+        self.old = old
+        self.new = new
+
+    def visit_FunctionDef(self, node):
+        self.generic_visit(node)
+        if node.name == self.old:
+            node.name = self.new
+        return node
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Name(self, node):
+        if node.id == self.old:
+            node.id = self.new
+        return node
+
+
+def heuristic_aliases(eval_path: str) -> tuple[str, ...]:
+    """Names under which the evaluator ``eval_path`` looks the heuristic up, from its ``possible_func_names``.
+
+    Empty if it binds the heuristic by one exact name, e.g. ``priority_v2``.
+    """
+    try:
+        with open(eval_path, 'r') as f:
+            tree = ast.parse(f.read())
+    except (OSError, SyntaxError):
+        return ()
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(isinstance(target, ast.Name) and target.id == "possible_func_names"
+                                                for target in node.targets):
+            try:
+                return tuple(ast.literal_eval(node.value))
+            except ValueError:
+                return ()
+    return ()
+
+
+def normalize_code(code: str, aliases: Sequence[str] = ()) -> str:
+    """Canonical form of ``code``: its AST without comments, docstrings or formatting.
+
+    If ``code`` defines exactly one function named in ``aliases``, the names
+    under which the evaluator accepts the heuristic, it is renamed to the first
+    of them, so that ``heuristics_v1`` and ``heuristics_v2`` share a form.
+    Falls back to the whitespace-stripped source when ``code`` does not parse.
+    """
+    try:
+        tree = _DocstringStripper().visit(ast.parse(code))
+    except SyntaxError:
+        return "\n".join(line.rstrip() for line in code.strip().splitlines())
+    names = {node.name for node in tree.body
+             if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name in aliases}
+    if len(names) == 1:
+        tree = _Renamer(names.pop(), aliases[0]).visit(tree)
+    return ast.dump(tree, annotate_fields=False, include_attributes=False)
+
+
+def evaluator_version(*paths: str) -> str:
+    """Hash of the evaluator sources (``.py`` files, excluding candidate ``gpt.py``) under ``paths``."""
+    digest = hashlib.sha256()
+    for path in paths:
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames[:] = sorted(d for d in dirnames if d not in ("__pycache__", "dataset"))
+            for filename in sorted(filenames):
+                if not filename.endswith(".py") or filename == "gpt.py":
+                    continue
+                with open(os.path.join(dirpath, filename), 'rb') as f:
+                    digest.update(filename.encode())
+                    digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def code_fingerprint(code: str, problem: str, problem_size, split: str, version: str,
+                     aliases: Sequence[str] = ()) -> str:
+    """Cache key of ``code`` evaluated on ``problem`` with the given size, split and evaluator version.
+
+    ``aliases`` are the heuristic names the evaluator accepts, see :func:`normalize_code`.
+    """
+    payload = json.dumps([normalize_code(code, aliases), problem, str(problem_size), split, version])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class FitnessCache:
+    """Map from code fingerprint to ``(obj, traceback_msg)``, backed by a JSON-lines file.
+
+    Args:
+        path: File successful evaluations are appended to, and read back by
+            later runs. ``None``, the default, keeps the cache in memory only.
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path
+        self._entries: dict[str, tuple[Optional[float], str]] = {}
+        if path is not None and os.path.isfile(path):
+            with open(path, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self._entries[entry["key"]] = (entry["obj"], "")
+                    except (ValueError, KeyError):
+                        continue  # Tolerate a partially written last line
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[tuple[Optional[float], str]]:
+        return self._entries.get(key)
+
+    def put(self, key: str, obj: Optional[float], traceback_msg: str = "") -> None:
+        self._entries[key] = (obj, traceback_msg)
+        if obj is None or self.path is None:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, 'a') as f:
+            f.write(json.dumps({"key": key, "obj": obj}) + '\n')
+
+
+def _write_cached_stdout(result: EvaluationResult) -> None:
+    """Leave the usual stdout transcript for a candidate answered from the cache."""
+    with open(result.task.stdout_filepath, 'w') as f:
+        f.write("[*] Fitness cache hit\n")
+        if result.success:
+            f.write(f"[*] Average:\n{result.obj}\n")
+        else:
+            f.write(result.traceback_msg + '\n')
+
+
+class CachedEvaluator:
+    """Wrap an evaluator so that known candidates are answered from a :class:`FitnessCache`.
+
+    Duplicates within one batch are evaluated once. Timed-out runs,
+    candidates stopped by a race and runs with timed-out instances are never
+    cached: they depend on the machine's load or on the elitist of the moment.
+    Runs at a lower fidelity are cached apart from full evaluations.
+
+    Args:
+        evaluator: Any object with ``iter_results(tasks)`` and ``close()``, e.g.
+            :class:`~evaluation.engine.EvaluationEngine`.
+        cache: The fitness cache to consult and fill.
+        problem: Problem name, part of the cache key.
+        problem_size: Problem size, part of the cache key.
+        split: Dataset split evaluated, part of the cache key.
+        version: Evaluator version, see :func:`evaluator_version`.
+        aliases: Names under which the evaluator accepts the heuristic, see
+            :func:`heuristic_aliases`. Candidates that differ only in which of
+            them they use share a key.
+    """
+
+    def __init__(self, evaluator, cache: FitnessCache, problem: str, problem_size, split: str = "train",
+                 version: str = "", aliases: Sequence[str] = ()) -> None:
+        self.evaluator = evaluator
+        self.cache = cache
+        self.problem = problem
+        self.problem_size = problem_size
+        self.split = split
+        self.version = version
+        self.aliases = tuple(aliases)
+
+    def key(self, task: EvaluationTask) -> str:
+        split = self.split if task.fidelity is None or task.fidelity >= 1 else f"{self.split}@{task.fidelity}"
+        return code_fingerprint(task.code, self.problem, self.problem_size, split, self.version, self.aliases)
+
+    def run(self, tasks: Sequence[EvaluationTask]) -> list[EvaluationResult]:
+        """Evaluate the candidates not answered by the cache; results are returned in task order."""
+        return collect_in_order(tasks, self.iter_results(tasks))
+
+    def iter_results(self, tasks: Union[Sequence[EvaluationTask], TaskStream]) -> Iterator[EvaluationResult]:
+        """Yield cache hits as soon as they are seen, and the other results as the wrapped evaluator completes them.
+
+        ``tasks`` may be a :class:`~evaluation.stream.TaskStream` that is still being filled.
+        """
+        in_flight: dict[int, str] = {}
+        duplicates: dict[str, list[EvaluationTask]] = {}
+        hits: list[EvaluationResult] = []
+        n_tasks = n_hits = 0
+
+        def keep(task: EvaluationTask) -> bool:
+            nonlocal n_tasks, n_hits
+            n_tasks += 1
+            key = self.key(task)
+            if self.cache.get(key) is not None:
+                obj, traceback_msg = self.cache.get(key)
+                hits.append(EvaluationResult(task, obj, traceback_msg))
+            elif key in duplicates:  # Duplicate of a candidate being evaluated, answered with it
+                duplicates[key].append(task)
+            else:
+                in_flight[id(task)] = key
+                duplicates[key] = []
+                return True
+            n_hits += 1
+            return False
+
+        def take_hits() -> Iterator[EvaluationResult]:
+            while hits:
+                result = hits.pop(0)
+                _write_cached_stdout(result)
+                yield result
+
+        for result in self.evaluator.iter_results(FilteredStream(TaskStream.of(tasks), keep)):
+            yield from take_hits()
+            key = in_flight.pop(id(result.task))
+            if not result.timed_out and not result.stopped_early and not result.timed_out_instances:
+                self.cache.put(key, result.obj, result.traceback_msg)
+            yield result
+            for task in duplicates.pop(key):
+                duplicate = dataclasses.replace(result, task=task)
+                _write_cached_stdout(duplicate)
+                yield duplicate
+        yield from take_hits()
+        if n_hits:
+            logging.info(f"Fitness cache: {n_hits}/{n_tasks} candidates reused a known result")
+
+    def close(self) -> None:
+        self.evaluator.close()
@@ -0,0 +1,128 @@
+"""CPU slots: how many cores each concurrent evaluation may use.
+
+Several evaluations run at once, and each of them may start threads or
+processes of its own: torch intra-op threads in the ACO solvers, BLAS and
+OpenMP threads, numba threads in ``problems/tsp_gls/gls.py``, the thread
+pool of ``multi_start_guided_local_search`` and the joblib workers of
+``ael_evaluation.py``. Left alone, every one of them sizes itself for the
+whole machine, and a host running ``n`` evaluations runs ``n`` times as many
+threads as it has cores.
+
+A :class:`CpuAllocator` splits the usable CPUs into one :class:`CpuSlot` per
+concurrent evaluation, ``cpu_count // num_workers`` CPUs each by default.
+The evaluator hands each run a slot, and the run's environment caps every
+thread pool to the slot's size. The run calls :func:`apply_cpu_slot` at
+start-up. It pins the process to the slot's CPUs if pinning is on, and
+resizes the pools of libraries that were imported before the environment
+could take effect, as in a forked warm worker. Code that sizes its own
+pool asks :func:`cpu_slots` how many CPUs it has.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+CPU_SLOTS_ENV = "HSEVO_CPU_SLOTS"
+CPU_AFFINITY_ENV = "HSEVO_CPU_AFFINITY"
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMEXPR_NUM_THREADS",
+                   "VECLIB_MAXIMUM_THREADS", "NUMBA_NUM_THREADS")
+
+
+def usable_cpus() -> list[int]:
+    """CPUs the calling process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def cpu_slots() -> int:
+    """Number of CPUs the current evaluation may use: its slot's size, or every usable CPU outside a slot."""
+    return int(os.environ.get(CPU_SLOTS_ENV) or 0) or len(usable_cpus())
+
+
+@dataclass(frozen=True)
+class CpuSlot:
+    """CPUs granted to one evaluation; ``pin`` binds the evaluation to exactly these CPUs."""
+
+    cpus: tuple[int, ...]
+    pin: bool = False
+
+    def env(self) -> dict[str, str]:
+        """Environment variables that size every thread pool of the evaluation to the slot."""
+        env = {name: str(len(self.cpus)) for name in THREAD_ENV_VARS}
+        env[CPU_SLOTS_ENV] = str(len(self.cpus))
+        if self.pin:
+            env[CPU_AFFINITY_ENV] = ",".join(map(str, self.cpus))
+        return env
+
+
+class CpuAllocator:
+    """Thread-safe pool of ``num_slots`` CPU slots.
+
+    Args:
+        num_slots: Number of evaluations that run at once.
+        slot_size: CPUs per slot. Defaults to ``len(cpus) // num_slots``, at
+            least one. Slots overlap when ``num_slots * slot_size`` exceeds
+            the number of CPUs.
+        pin: Pin each evaluation to its slot's CPUs.
+        cpus: CPUs to share out. Defaults to :func:`usable_cpus`.
+    """
+
+    def __init__(self, num_slots: int, slot_size: Optional[int] = None, pin: bool = False,
+                 cpus: Optional[Sequence[int]] = None) -> None:
+        cpus = list(cpus) if cpus else usable_cpus()
+        size = min(len(cpus), max(1, int(slot_size) if slot_size else len(cpus) // max(1, num_slots)))
+        self.slot_size = size
+        self._free = deque(CpuSlot(tuple(cpus[(i * size + k) % len(cpus)] for k in range(size)), pin)
+                           for i in range(max(1, num_slots)))
+        self._lock = threading.Lock()
+
+    def acquire(self) -> CpuSlot:
+        """Take a free slot; the caller runs at most ``num_slots`` evaluations at once."""
+        with self._lock:
+            if not self._free:
+                raise RuntimeError("No free CPU slot: more concurrent evaluations than slots")
+            return self._free.popleft()
+
+    def release(self, slot: Optional[CpuSlot]) -> None:
+        if slot is not None:
+            with self._lock:
+                self._free.append(slot)
+
+
+def apply_cpu_slot(slot: Optional[CpuSlot] = None) -> Optional[int]:
+    """Confine the calling evaluation process to its slot; return the slot's size, or None outside a slot.
+
+    ``slot`` is exported to the environment first, for processes that did
+    not receive it at start-up. Thread pools of torch, numba and (with
+    threadpoolctl) BLAS/OpenMP that already exist are resized.
+    """
+    if slot is not None:
+        os.environ.update(slot.env())
+    if not os.environ.get(CPU_SLOTS_ENV):
+        return None
+    n_threads = int(os.environ[CPU_SLOTS_ENV])
+    affinity = os.environ.get(CPU_AFFINITY_ENV)
+    if affinity and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, [int(cpu) for cpu in affinity.split(",")])
+        except OSError:
+            pass  # CPUs outside this host's cpuset; thread counts still apply
+    # Only resize what is loaded: importing torch here would cost every evaluation seconds
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(n_threads)
+    if "numba" in sys.modules:
+        numba = sys.modules["numba"]
+        numba.set_num_threads(min(n_threads, numba.config.NUMBA_NUM_THREADS))
+    if "numpy" in sys.modules:
+        try:
+            from threadpoolctl import threadpool_limits
+            threadpool_limits(n_threads)
+        except ImportError:
+            pass
+    return n_threads
@@ -0,0 +1,365 @@
+"""Concurrent evaluation of a generation of candidate heuristics.
+
+Each candidate gets its own workspace directory holding its ``gpt.py``, and
+its ``eval.py`` run is launched through :mod:`evaluation.launch` so that the
+candidate module is resolved from that workspace. Every run has its own
+process group, which is killed as a whole when the run ends, and can be
+held to :class:`~evaluation.limits.ResourceLimits`. Runs are executed on a
+bounded pool, so a generation finishes in roughly the time of its slowest
+candidate rather than the sum of all of them.
+
+The engine does not poll. Each child is watched through a descriptor that
+becomes readable when it exits: a pidfd where the platform has one, or
+otherwise a pipe whose write end only the child holds. A single selector
+waits on all running children and on the nearest deadline. Results are
+handled in completion order, and each candidate's timeout is counted from
+its own start. Tasks can also be fed in while others run, through a
+:class:`~evaluation.stream.TaskStream`.
+
+The objective of each run is read from the :class:`~evaluation.record.ResultRecord`
+that the launcher saves in the candidate's workspace. The text transcript is
+parsed only when no record was left behind.
+
+Typical usage::
+
+    engine = EvaluationEngine(root_dir, "tsp_aco", 50, timeout=50)
+    results = engine.run([EvaluationTask(code, "stdout0.txt", response_id=0)])
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import selectors
+import shutil
+import subprocess
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Iterator, Optional, Sequence, Union
+
+from .cpu_slots import CpuAllocator, CpuSlot
+from .limits import LIMITS_ENV, ResourceLimits, describe_exit, kill_process_group
+from .record import (BUDGET_ENV, DISPATCH_TIME_ENV, FIDELITY_ENV, RACE_ENV, RESULT_FILENAME, InstanceBudget, Race,
+                     ResultRecord)
+from .stream import TaskStream
+from .telemetry import reap_with_cpu_time
+
+WORKSPACE_DIR = "workspaces"
+
+
+@dataclass
+class EvaluationTask:
+    """A single candidate to evaluate.
+
+    It is optionally stopped early by a :class:`~evaluation.record.Race`, and
+    its instances optionally held to an :class:`~evaluation.record.InstanceBudget`.
+
+    A candidate that only differs from others by the values of some
+    parameters can also carry the ``template`` they share and its own
+    ``params``: the template's functions called with ``params`` as keyword
+    arguments behave like ``code``. Warm workers then load the template once
+    for all of them (see :mod:`evaluation.parameterised`). Other evaluators
+    run ``code``.
+
+    A ``fidelity`` below 1 asks for a cheaper estimate of the objective on
+    that fraction of the evaluation effort (see :mod:`evaluation.record`).
+    """
+
+    code: str
+    stdout_filepath: str
+    response_id: int = 0
+    race: Optional[Race] = None
+    budget: Optional[InstanceBudget] = None
+    template: Optional[str] = None
+    params: Optional[dict[str, float]] = None
+    fidelity: Optional[float] = None
+
+
+@dataclass
+class EvaluationResult:
+    """Outcome of evaluating one :class:`EvaluationTask`.
+
+    ``obj`` is the raw objective reported by ``eval.py`` (no sign flip for
+    maximisation problems); it is ``None`` when the run failed, in which case
+    ``traceback_msg`` holds the feedback to give the LLM. ``instance_objs``
+    and ``instance_times`` hold the objective and wall time in seconds of
+    each instance that was solved. ``stopped_early`` marks a candidate that
+    lost its race. ``timed_out_instances`` lists the instances that exceeded
+    their time budget and were scored with a penalty. ``telemetry`` holds the
+    run's resource usage, see :mod:`evaluation.telemetry`.
+    """
+
+    task: EvaluationTask
+    obj: Optional[float] = None
+    traceback_msg: str = ""
+    timed_out: bool = False
+    instance_objs: list[float] = field(default_factory=list)
+    instance_times: list[float] = field(default_factory=list)
+    stopped_early: bool = False
+    timed_out_instances: list[int] = field(default_factory=list)
+    telemetry: dict[str, float] = field(default_factory=dict)
+
+    @property
+    def success(self) -> bool:
+        return self.obj is not None
+
+
+def default_num_workers() -> int:
+    """Number of concurrent evaluations to run when none is configured."""
+    return max(1, os.cpu_count() or 1)
+
+
+def parse_stdout(stdout_str: str) -> tuple[Optional[float], str]:
+    """Return ``(objective, traceback_msg)`` from the text printed by ``eval.py``.
+
+    Only used when a run left no :class:`~evaluation.record.ResultRecord`,
+    e.g. because the interpreter died before the launcher could save it.
+    """
+    # Imported here so that eval.py runs, which import evaluation.record, do not load litellm
+    from utils.utils import filter_traceback
+    traceback_msg = filter_traceback(stdout_str)
+    if traceback_msg != '':
+        return None, traceback_msg
+    try:
+        return float(stdout_str.split('\n')[-2]), ""
+    except (IndexError, ValueError):
+        return None, "Invalid std out / objective value!"
+
+
+def prepare_workspace(workspace_dir: str, task: EvaluationTask) -> str:
+    """Write the candidate's code to ``<workspace_dir>/<stdout stem>/gpt.py``.
+
+    Returns the candidate's workspace directory.
+    """
+    name = os.path.splitext(os.path.basename(task.stdout_filepath))[0]
+    workspace = os.path.join(workspace_dir, name)
+    os.makedirs(workspace, exist_ok=True)
+    # A stale bytecode cache could shadow a rewritten gpt.py of the same size.
+    shutil.rmtree(os.path.join(workspace, "__pycache__"), ignore_errors=True)
+    if os.path.exists(os.path.join(workspace, RESULT_FILENAME)):
+        os.remove(os.path.join(workspace, RESULT_FILENAME))
+    with open(os.path.join(workspace, "gpt.py"), 'w') as file:
+        file.writelines(task.code + '\n')
+    return workspace
+
+
+def result_from_record(task: EvaluationTask, record: ResultRecord) -> EvaluationResult:
+    """Turn the record reported by ``eval.py`` into an :class:`EvaluationResult`."""
+    traceback_msg = record.failure
+    if record.obj is None and not traceback_msg:
+        traceback_msg = "Invalid std out / objective value!"
+    return EvaluationResult(task, obj=record.obj if not record.failure else None, traceback_msg=traceback_msg,
+                            instance_objs=record.instance_objs, instance_times=record.instance_times,
+                            stopped_early=record.stopped_early, timed_out_instances=record.timed_out_instances,
+                            telemetry=dict(record.telemetry))
+
+
+def collect_in_order(tasks: Sequence[EvaluationTask], results) -> list[EvaluationResult]:
+    """Reorder results produced in completion order to follow ``tasks``."""
+    by_task = {id(result.task): result for result in results}
+    return [by_task[id(task)] for task in tasks]
+
+
+class _Run:
+    """A running ``eval.py`` process and the descriptor signalling its exit."""
+
+    def __init__(self, task: EvaluationTask, workspace: str, process: subprocess.Popen, exit_fd: int,
+                 timeout: float, started: float, slot: Optional[CpuSlot] = None) -> None:
+        self.task = task
+        self.workspace = workspace
+        self.process = process
+        self.exit_fd = exit_fd
+        self.slot = slot
+        self.started = started
+        self.deadline = started + timeout
+
+
+def _popen_with_exit_fd(cmd: list[str], stdout, env: Optional[dict] = None) -> tuple[subprocess.Popen, int]:
+    """Start ``cmd`` in a new process group and return it with a descriptor that becomes readable once it exits."""
+    kwargs = dict(stdout=stdout, stderr=stdout, start_new_session=True, env=env)
+    if hasattr(os, "pidfd_open"):
+        process = subprocess.Popen(cmd, **kwargs)
+        try:
+            return process, os.pidfd_open(process.pid)
+        except OSError:  # e.g. kernel older than 5.3
+            process.kill()
+            process.wait()
+    read_fd, write_fd = os.pipe()
+    try:
+        process = subprocess.Popen(cmd, pass_fds=(write_fd,), **kwargs)
+    except BaseException:
+        os.close(read_fd)
+        raise
+    finally:
+        os.close(write_fd)
+    return process, read_fd
+
+
+class EvaluationEngine:
+    """Run ``eval.py`` for many candidates concurrently, each in its own workspace.
+
+    Args:
+        root_dir: Project root containing ``problems/`` and ``evaluation/``.
+        problem: Problem name, i.e. the directory under ``problems/``.
+        problem_size: Training instance size passed to ``eval.py``.
+        problem_type: ``"black_box"`` selects ``eval_black_box.py``.
+        timeout: Wall-clock limit in seconds for one candidate.
+        num_workers: Maximum number of concurrent runs. Defaults to the
+            number of CPUs.
+        workspace_dir: Directory (relative to the current working directory)
+            under which per-candidate workspaces are created.
+        limits: CPU-time, memory and process-count caps for each run.
+        eval_script: Script to run instead of the problem's ``eval.py``. It
+            takes the same arguments and must report its objective with
+            :func:`~evaluation.record.report_objective`.
+        env: Extra environment variables for each run.
+        cpu_allocator: Hands each run a :class:`~evaluation.cpu_slots.CpuSlot`
+            that sizes its thread pools. Must have at least ``num_workers``
+            slots. Without one, runs size their pools for the whole machine.
+    """
+
+    def __init__(self, root_dir: str, problem: str, problem_size: int, problem_type: str = "",
+                 timeout: float = 50, num_workers: Optional[int] = None,
+                 workspace_dir: str = WORKSPACE_DIR, limits: Optional[ResourceLimits] = None,
+                 eval_script: Optional[str] = None, env: Optional[dict[str, str]] = None,
+                 cpu_allocator: Optional[CpuAllocator] = None) -> None:
+        self.root_dir = root_dir
+        self.problem = problem
+        self.problem_size = problem_size
+        self.timeout = timeout
+        self.num_workers = max(1, int(num_workers)) if num_workers else default_num_workers()
+        self.workspace_dir = workspace_dir
+        self.limits = limits
+        self.env = env or {}
+        self.cpu_allocator = cpu_allocator
+
+        eval_name = "eval_black_box.py" if problem_type == "black_box" else "eval.py"
+        self.eval_script = eval_script or f"{root_dir}/problems/{problem}/{eval_name}"
+        self.launcher = f"{root_dir}/evaluation/launch.py"
+
+    def close(self) -> None:
+        """Release resources held by the engine (nothing to release for one-shot processes)."""
+
+    def command(self, workspace: str) -> list[str]:
+        return [sys.executable, '-u', self.launcher, workspace, self.eval_script,
+                f'{self.problem_size}', self.root_dir, "train"]
+
+    def run(self, tasks: Sequence[EvaluationTask]) -> list[EvaluationResult]:
+        """Evaluate ``tasks`` concurrently; results are returned in task order."""
+        return collect_in_order(tasks, self.iter_results(tasks))
+
+    def iter_results(self, tasks: Union[Sequence[EvaluationTask], TaskStream]) -> Iterator[EvaluationResult]:
+        """Evaluate ``tasks`` concurrently, yielding each result as soon as its run finishes.
+
+        ``tasks`` may be a :class:`~evaluation.stream.TaskStream` that is still being filled.
+        """
+        source = TaskStream.of(tasks)
+        pending = deque()
+        running: dict[int, _Run] = {}
+        selector = selectors.DefaultSelector()
+        listening = False
+        try:
+            while pending or running or not source.finished:
+                pending.extend(source.drain())
+                # Keep up to num_workers candidates running
+                while pending and len(running) < self.num_workers:
+                    task = pending.popleft()
+                    try:
+                        run = self._launch(task)
+                    except Exception as e:
+                        logging.info(f"Error for response_id {task.response_id}: {e}")
+                        yield EvaluationResult(task, traceback_msg=str(e))
+                        continue
+                    running[run.exit_fd] = run
+                    selector.register(run.exit_fd, selectors.EVENT_READ, run)
+                # Wake up for new tasks while the stream is open
+                if not listening and not source.closed:
+                    selector.register(source, selectors.EVENT_READ)
+                    listening = True
+                elif listening and source.closed:
+                    selector.unregister(source)
+                    listening = False
+                if not running and not listening:
+                    continue
+
+                wait_for = max(0.0, min(run.deadline for run in running.values()) - time.monotonic()) \
+                    if running else None
+                finished = [key.data for key, _ in selector.select(wait_for) if key.data is not None]
+                now = time.monotonic()
+                expired = [run for run in running.values() if run not in finished and now >= run.deadline]
+                for run in finished + expired:
+                    selector.unregister(run.exit_fd)
+                    del running[run.exit_fd]
+                    os.close(run.exit_fd)
+                    yield self._collect(run, timed_out=run in expired)
+        finally:
+            # Only reached with runs left if the caller stopped iterating early
+            for run in running.values():
+                kill_process_group(run.process.pid)
+                run.process.wait()
+                os.close(run.exit_fd)
+                if run.slot is not None:
+                    self.cpu_allocator.release(run.slot)
+            selector.close()
+
+    def _launch(self, task: EvaluationTask) -> _Run:
+        workspace = prepare_workspace(self.workspace_dir, task)
+        env = dict(os.environ, **self.env)
+        if task.race is not None:
+            env[RACE_ENV] = task.race.to_json()
+        if task.budget is not None:
+            env[BUDGET_ENV] = task.budget.to_json()
+        if task.fidelity is not None:
+            env[FIDELITY_ENV] = repr(task.fidelity)
+        if self.limits:
+            env[LIMITS_ENV] = self.limits.to_json()
+        slot = self.cpu_allocator.acquire() if self.cpu_allocator else None
+        if slot is not None:
+            env.update(slot.env())
+        env[DISPATCH_TIME_ENV] = repr(time.time())
+        started = time.monotonic()
+        try:
+            with open(task.stdout_filepath, 'w') as f:
+                process, exit_fd = _popen_with_exit_fd(self.command(workspace), f, env)
+        except BaseException:
+            if slot is not None:
+                self.cpu_allocator.release(slot)
+            raise
+        return _Run(task, workspace, process, exit_fd, self.timeout, started, slot)
+
+    def _collect(self, run: _Run, timed_out: bool) -> EvaluationResult:
+        task = run.task
+        # Tear down the whole process group, including anything the candidate forked
+        kill_process_group(run.process.pid)
+        # Killed and crashed runs record no CPU time of their own, yet count against the run's budget
+        cpu_time = reap_with_cpu_time(run.process)
+        if run.slot is not None:
+            self.cpu_allocator.release(run.slot)
+        wall_time = time.monotonic() - run.started
+        if timed_out:
+            traceback_msg = str(subprocess.TimeoutExpired(run.process.args, self.timeout))
+            logging.info(f"Error for response_id {task.response_id}: {traceback_msg}")
+            result = EvaluationResult(task, traceback_msg=traceback_msg, timed_out=True,
+                                      telemetry={"wall_time": wall_time})
+            if cpu_time is not None:
+                result.telemetry["cpu_time"] = cpu_time
+            return result
+
+        record = ResultRecord.load(os.path.join(run.workspace, RESULT_FILENAME))
+        if record is not None:
+            result = result_from_record(task, record)
+        else:
+            with open(task.stdout_filepath, 'r') as f:
+                stdout_str = f.read()
+            obj, traceback_msg = parse_stdout(stdout_str)
+            if obj is None and "Traceback" not in stdout_str and run.process.returncode != 0:
+                traceback_msg = describe_exit(run.process.returncode)
+            result = EvaluationResult(task, obj=obj, traceback_msg=traceback_msg)
+        result.telemetry["wall_time"] = wall_time
+        if cpu_time is not None:
+            result.telemetry.setdefault("cpu_time", cpu_time)
+        status = "successful" if result.success else "stopped early" if result.stopped_early else "execution error"
+        logging.info(f"Code Run {task.response_id} {status}!")
+        return result
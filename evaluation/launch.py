@@ -0,0 +1,68 @@
+"""Run a problem's ``eval.py`` against one candidate workspace.
+
+Usage::
+
+    python -u evaluation/launch.py <workspace_dir> <eval_script> [eval args...]
+
+``eval.py`` imports the candidate heuristic with ``import gpt``. When the
+script is run directly, its own directory is ``sys.path[0]`` and the shared
+``problems/<problem>/gpt.py`` always wins. This launcher puts the candidate's
+workspace in front of the problem directory instead, then runs ``eval.py``
+as ``__main__``. Concurrent candidates therefore never share a ``gpt.py``.
+
+When the run ends, the launcher saves the :class:`~evaluation.record.ResultRecord`
+filled in by ``eval.py`` to ``<workspace_dir>/result.json``. If ``eval.py``
+raised, the record also holds the traceback. A :class:`~evaluation.record.Race`
+passed in the ``HSEVO_RACE`` environment variable applies to the run, as does
+an :class:`~evaluation.record.InstanceBudget` passed in ``HSEVO_INSTANCE_BUDGET``, as does
+the fidelity passed in ``HSEVO_FIDELITY``, and
+:class:`~evaluation.limits.ResourceLimits` passed in ``HSEVO_LIMITS`` are
+applied before ``eval.py`` starts, as is the run's CPU slot
+(:func:`~evaluation.cpu_slots.apply_cpu_slot`). The launcher adds the process's CPU time
+and peak memory to the record's telemetry.
+"""
+
+import os
+import runpy
+import sys
+import traceback
+
+
+def main(argv: list[str]) -> None:
+    workspace_dir, eval_script, *eval_args = argv
+    problem_dir = os.path.dirname(os.path.abspath(eval_script))
+    root_dir = os.path.dirname(os.path.dirname(problem_dir))
+
+    launcher_dir = os.path.dirname(os.path.abspath(__file__))
+    sys.path[:] = [p for p in sys.path if os.path.abspath(p or os.curdir) != launcher_dir]
+    sys.path[:0] = [os.path.abspath(workspace_dir), problem_dir, root_dir]
+    sys.argv = [eval_script, *eval_args]
+
+    from evaluation.cpu_slots import apply_cpu_slot
+    from evaluation.limits import LIMITS_ENV, ResourceLimits
+    from evaluation.record import (BUDGET_ENV, DISPATCH_TIME_ENV, FIDELITY_ENV, RACE_ENV, RESULT_FILENAME,
+                                   InstanceBudget, InstanceTimeout, Race, RaceLost, reset_record)
+    from evaluation.telemetry import cpu_time_with_children, peak_rss_mb
+    ResourceLimits.from_json(os.environ.get(LIMITS_ENV)).apply()
+    apply_cpu_slot()
+    dispatched_at = os.environ.get(DISPATCH_TIME_ENV)
+    fidelity = os.environ.get(FIDELITY_ENV)
+    record = reset_record(Race.from_json(os.environ.get(RACE_ENV)),
+                          InstanceBudget.from_json(os.environ.get(BUDGET_ENV)),
+                          float(dispatched_at) if dispatched_at else None,
+                          float(fidelity) if fidelity else None)
+    try:
+        runpy.run_path(eval_script, run_name="__main__")
+    except RaceLost as e:
+        record.failure = str(e)
+        print(record.failure)
+    except (Exception, InstanceTimeout):
+        record.failure = traceback.format_exc()
+        raise
+    finally:
+        record.telemetry.update(cpu_time=cpu_time_with_children(), peak_rss_mb=peak_rss_mb())
+        record.save(os.path.join(workspace_dir, RESULT_FILENAME))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
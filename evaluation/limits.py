@@ -0,0 +1,120 @@
+"""Operating-system resource limits for candidate evaluation.
+
+A candidate that allocates a huge array or forks a pool of workers can
+starve every other evaluation on the machine. :class:`ResourceLimits` caps
+a candidate's CPU time, address space and number of processes with
+``setrlimit``. Every candidate also runs in its own session and process
+group, so the evaluator can kill the candidate together with anything it
+spawned (see :func:`kill_process_group`).
+
+Limits are applied only where the :mod:`resource` module exists (POSIX).
+Elsewhere they are ignored with a warning.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import signal
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+LIMITS_ENV = "HSEVO_LIMITS"
+
+
+@dataclass
+class ResourceLimits:
+    """Per-candidate resource caps; ``None`` leaves a resource unlimited.
+
+    Args:
+        cpu_seconds: CPU time, in seconds, a candidate may use. It is counted
+            separately from the wall-clock ``timeout`` and catches candidates
+            that burn CPU in several threads.
+        memory_mb: Address space, in MiB, of the evaluating process.
+        max_processes: ``RLIMIT_NPROC`` for the evaluating process. Linux
+            counts every process of the user against this limit, so it must
+            leave room for what is already running.
+    """
+
+    cpu_seconds: Optional[int] = None
+    memory_mb: Optional[int] = None
+    max_processes: Optional[int] = None
+
+    def __bool__(self) -> bool:
+        return any(limit is not None for limit in (self.cpu_seconds, self.memory_mb, self.max_processes))
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self))
+
+    @classmethod
+    def from_json(cls, text: Optional[str]) -> ResourceLimits:
+        return cls(**json.loads(text)) if text else cls()
+
+    def apply(self, cpu_offset: float = 0.0) -> None:
+        """Apply the limits to the calling process.
+
+        ``cpu_offset`` is the CPU time the process has already used, so that a
+        long-lived worker can grant each task a fresh CPU budget.
+        """
+        if not self:
+            return
+        if resource is None:
+            logging.warning("Resource limits are not supported on this platform and are ignored.")
+            return
+        if self.cpu_seconds is not None:
+            # SIGXCPU, which terminates by default, at the soft limit. The hard limit is left alone: once lowered,
+            # an unprivileged worker could never raise the soft limit again for its next task's budget. A candidate
+            # that ignores SIGXCPU is still stopped by the wall-clock timeout.
+            _set_limit(resource.RLIMIT_CPU, math.ceil(cpu_offset + self.cpu_seconds))
+        if self.memory_mb is not None:
+            size = int(self.memory_mb) * 1024 * 1024
+            _set_limit(resource.RLIMIT_AS, size, size)
+        if self.max_processes is not None:
+            _set_limit(resource.RLIMIT_NPROC, int(self.max_processes), int(self.max_processes))
+
+
+def _set_limit(which: int, soft: int, hard: Optional[int] = None) -> None:
+    """Set a limit, never above the current hard limit. Without ``hard``, the hard limit is kept."""
+    _, current_hard = resource.getrlimit(which)
+    hard = current_hard if hard is None else hard
+    if current_hard != resource.RLIM_INFINITY:
+        soft, hard = min(soft, current_hard), min(hard, current_hard)
+    resource.setrlimit(which, (soft, hard))
+
+
+def cpu_time_used() -> float:
+    """CPU time (user + system) used so far by the calling process."""
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def kill_process_group(pgid: int) -> None:
+    """Kill every process in the process group ``pgid``, ignoring an already empty group."""
+    if not hasattr(os, "killpg"):
+        return
+    try:
+        os.killpg(pgid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def describe_exit(returncode: int) -> str:
+    """Failure reason for an evaluation process that died without reporting a result."""
+    if returncode < 0:
+        try:
+            name = signal.Signals(-returncode).name
+        except ValueError:
+            name = f"signal {-returncode}"
+        if name == "SIGXCPU":
+            return "Evaluation exceeded its CPU time limit (SIGXCPU)"
+        return f"Evaluation process was killed by {name}"
+    return f"Evaluation process exited with code {returncode}"
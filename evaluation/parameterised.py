@@ -0,0 +1,86 @@
+"""Candidates that share their code and differ only in the values of some parameters.
+
+Harmony search tunes the numeric parameters of one LLM heuristic: every
+harmony is the same function with other defaults for, e.g., ``alpha`` and
+``beta``. Written out as code, each harmony is compiled on its own and, with
+one-shot evaluation, pays for an interpreter, the imports and a dataset load.
+An :class:`~evaluation.engine.EvaluationTask` can instead carry the shared
+``template`` and the harmony's ``params``. A warm worker compiles each
+template once (:func:`load_template`) and, for each task, binds the values
+to the template's functions (:func:`bind_parameters`), with the evaluator
+and dataset still loaded. Each harmony then costs the binding and the
+dispatch, a few milliseconds, on top of solving the instances.
+
+The values are bound as the defaults of the parameters, as in the code
+written out for the harmony. Calls that pass a parameter explicitly, and
+calls between the template's own functions, therefore behave exactly as in
+that code.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import inspect
+import types
+from collections import OrderedDict
+
+MAX_TEMPLATES = 4  # Harmony search uses one template at a time
+
+_templates: OrderedDict[str, types.ModuleType] = OrderedDict()
+
+
+def load_template(template: str) -> types.ModuleType:
+    """The module of ``template``, compiled on first use. The most recent templates are kept."""
+    key = hashlib.sha256(template.encode()).hexdigest()
+    module = _templates.get(key)
+    if module is None:
+        module = types.ModuleType("gpt")
+        exec(compile(template, "gpt.py", "exec"), module.__dict__)
+        _templates[key] = module
+        if len(_templates) > MAX_TEMPLATES:
+            _templates.popitem(last=False)
+    else:
+        _templates.move_to_end(key)
+    return module
+
+
+def bind_parameters(module: types.ModuleType, params: dict[str, float]) -> types.ModuleType:
+    """Copy of ``module`` in which the parameters named in ``params`` default to their values.
+
+    The parameters are those of the first function, in source order, that has
+    a default for any of them: harmony search tunes the parameters of the
+    first signature of the code. ``module`` is left untouched. Raises
+    ValueError if that function lacks a default for some of the parameters.
+    """
+    bound = types.ModuleType(module.__name__)
+    namespace = bound.__dict__
+    namespace.update(module.__dict__)
+    unbound = set(params)
+    for name, function in module.__dict__.items():
+        # Functions of the template itself, rebuilt so that they call each other's bound versions
+        if not inspect.isfunction(function) or function.__globals__ is not module.__dict__:
+            continue
+        code = function.__code__
+        defaults = list(function.__defaults__ or ())
+        kwdefaults = dict(function.__kwdefaults__ or {})
+        first_default = code.co_argcount - len(defaults)
+        if unbound == set(params):
+            for i, arg in enumerate(code.co_varnames[first_default:code.co_argcount]):
+                if arg in params:
+                    defaults[i] = params[arg]
+                    unbound.discard(arg)
+            for arg in kwdefaults:
+                if arg in params:
+                    kwdefaults[arg] = params[arg]
+                    unbound.discard(arg)
+        rebuilt = types.FunctionType(code, namespace, function.__name__, tuple(defaults) or None,
+                                     function.__closure__)
+        rebuilt.__kwdefaults__ = kwdefaults or None
+        rebuilt.__qualname__ = function.__qualname__
+        rebuilt.__doc__ = function.__doc__
+        rebuilt.__annotations__ = function.__annotations__
+        rebuilt.__dict__.update(function.__dict__)
+        namespace[name] = rebuilt
+    if unbound:
+        raise ValueError(f"No default to bind for {', '.join(sorted(unbound))} in the template")
+    return bound
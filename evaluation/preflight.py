@@ -0,0 +1,351 @@
+"""Cheap screening of candidates before their full evaluation.
+
+Many LLM responses fail within seconds of starting. They have a syntax error,
+the wrong function name or arity, return an array of the wrong shape, or
+produce NaNs. Each of these would still pay for a process launch and a
+dataset load. :class:`PreflightScreen` catches them first:
+
+1. the code is compiled;
+2. the heuristic function is looked up and its arity is checked against
+   ``prompts/<problem>/func_signature.txt``;
+3. a smoke run binds the candidate with the problem's ``set_heuristic`` and
+   solves ``preflight_instance()``, a small synthetic instance defined in
+   ``eval.py``, with the solver cut to ``PREFLIGHT_ITERATIONS`` iterations.
+   Every output of the heuristic must be numeric, have the shape given by
+   ``preflight_output_shape`` in ``eval.py`` and contain no NaN. The
+   objective must be finite.
+
+The first two steps run in the loop's process. The smoke run runs the
+candidate's code, so it runs in a worker process of its own, started once
+with the problem's ``eval.py`` loaded and held to the run's
+:class:`~evaluation.limits.ResourceLimits`. A candidate that exhausts its
+memory or kills its process fails the screen without harming the loop. A
+smoke run takes milliseconds. Candidates are still screened one at a time,
+as they are handed to the wrapped evaluator, which starts evaluating the
+first ones meanwhile.
+
+Harmonies share a parameterised template (``EvaluationTask.template``) and
+differ only in parameter values. Once one harmony of a template has passed,
+the others skip the screen.
+
+Candidates that fail are answered at once, with their traceback as feedback.
+The others are forwarded to the wrapped evaluator. With a
+:class:`~evaluation.stream.TaskStream`, each candidate is screened when it
+arrives. Running out of time on the small instance is not a failure: the
+full evaluation, with its own timeout, decides.
+"""
+
+from __future__ import annotations
+
+import ast
+import functools
+import inspect
+import logging
+import math
+import multiprocessing
+import os
+import re
+import time
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+from typing import Iterator, Optional, Sequence, Union
+
+import numpy as np
+
+from .engine import WORKSPACE_DIR, EvaluationResult, EvaluationTask, collect_in_order, prepare_workspace
+from .limits import ResourceLimits, cpu_time_used, describe_exit, kill_process_group
+from .stream import FilteredStream, TaskStream
+from .telemetry import cpu_time_with_children, process_cpu_time
+from .warm_pool import _load_candidate, _load_evaluator, _preload_modules
+
+PREFLIGHT_ITERATIONS = 1  # Iterations of the problem's solver (N_ITERATIONS in eval.py) in a smoke run
+LOAD_TIMEOUT = 120  # Seconds the smoke-run worker may take to import the problem's eval.py
+
+
+def _fail(task: EvaluationTask, traceback_msg: str, mode: str = 'w') -> str:
+    """Leave ``traceback_msg`` in the candidate's stdout file, like a failed ``eval.py`` run would."""
+    with open(task.stdout_filepath, mode) as f:
+        f.write(traceback_msg + '\n')
+    return traceback_msg
+
+
+def parse_signature(path: str) -> Optional[ast.FunctionDef]:
+    """Parse a ``func_signature.txt`` such as ``def heuristics_v{version}(...) -> ...:``.
+
+    Returns the function definition, with ``_v{version}`` removed from its name.
+    """
+    try:
+        with open(path, 'r') as f:
+            text = f.read().strip()
+    except OSError:
+        return None
+    text = text.replace("_v{version}", "").replace("{version}", "")
+    try:
+        node = ast.parse(text + "\n    pass").body[0]
+    except SyntaxError:
+        return None
+    return node if isinstance(node, ast.FunctionDef) else None
+
+
+def check_signature(tree: ast.Module, expected: ast.FunctionDef) -> str:
+    """Return why the candidate does not define a function callable like ``expected``, or ``""``."""
+    name_pattern = re.compile(rf"^{re.escape(expected.name)}(_v\d+)?$")
+    functions = [node for node in tree.body
+                 if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and name_pattern.match(node.name)]
+    if not functions:
+        return f"Function `{expected.name}` (or a versioned `{expected.name}_vN`) is not defined."
+
+    n_args = len(expected.args.posonlyargs) + len(expected.args.args)
+    for function in functions:
+        args = function.args
+        positional = len(args.posonlyargs) + len(args.args)
+        required = positional - len(args.defaults)
+        if required <= n_args and (positional >= n_args or args.vararg is not None):
+            return ""
+    function = functions[-1]
+    return (f"`{function.name}` cannot be called with the {n_args} arguments of the expected signature "
+            f"`{ast.unparse(expected.args)}`.")
+
+
+def check_output(output, shape: Optional[tuple] = None) -> None:
+    """Raise ValueError if a heuristic's ``output`` is not numeric, is not of ``shape`` or holds NaN.
+
+    Infinite values are accepted: heuristics use them to rule out or force a choice, and solvers that cannot
+    handle them fail in the smoke run itself.
+    """
+    try:
+        values = np.asarray(output, dtype=float)
+    except (TypeError, ValueError):
+        raise ValueError(f"The heuristic must return numbers, not {type(output).__name__}") from None
+    if shape is not None and values.shape != tuple(shape):
+        raise ValueError(f"The heuristic returned an output of shape {values.shape} instead of {tuple(shape)}")
+    if np.isnan(values).any():
+        raise ValueError(f"The heuristic returned NaN in {np.isnan(values).sum()} of {values.size} values")
+
+
+def _checked_heuristic(heuristic, output_shape=None):
+    """``heuristic``, with each output checked against the shape ``output_shape`` gives for its arguments."""
+    @functools.wraps(heuristic)
+    def wrapper(*args, **kwargs):
+        output = heuristic(*args, **kwargs)
+        check_output(output, output_shape(*args, **kwargs) if output_shape else None)
+        return output
+    return wrapper
+
+
+def _smoke_run(evaluator, workspace: str) -> str:
+    """Solve the pre-flight instance with the candidate of ``workspace``; return the traceback, or ``""``."""
+    try:
+        print("[*] Pre-flight check ...")
+        candidate = _load_candidate(workspace)
+        evaluator.set_heuristic(candidate)
+        # Check the outputs of the candidate's function as bound by set_heuristic (wrapped by timed_heuristic)
+        functions = [value for value in vars(candidate).values() if inspect.isfunction(value)]
+        for name, value in list(vars(evaluator).items()):
+            if any(getattr(value, "__wrapped__", None) is function for function in functions):
+                setattr(evaluator, name, _checked_heuristic(value, getattr(evaluator, "preflight_output_shape", None)))
+        obj = float(evaluator.solve(evaluator.preflight_instance()))
+        if not math.isfinite(obj):
+            raise ValueError(f"Objective on the pre-flight instance is not finite: {obj}")
+        print(f"[*] Pre-flight objective: {obj}")
+        return ""
+    except (Exception, SystemExit):  # A candidate calling sys.exit() must not take the worker down
+        return traceback.format_exc()
+
+
+def _worker_main(conn, root_dir: str, problem: str, limits: Optional[ResourceLimits] = None) -> None:
+    """Smoke-run worker: load the problem's ``eval.py`` once, then screen candidates.
+
+    Sends ``""`` once ready, or why smoke runs are unavailable. A task is
+    ``(workspace, stdout_filepath)`` and is answered with the traceback of
+    the smoke run, ``""`` if it passed, and the CPU time it took.
+    """
+    if hasattr(os, "setsid"):
+        os.setsid()
+    limits = limits or ResourceLimits()
+    ResourceLimits(memory_mb=limits.memory_mb, max_processes=limits.max_processes).apply()
+    try:
+        evaluator = _load_evaluator(root_dir, problem)
+        if not hasattr(evaluator, "preflight_instance"):
+            raise AttributeError(f"problems/{problem}/eval.py defines no preflight_instance()")
+    except Exception as e:
+        conn.send(f"{type(e).__name__}: {e}")
+        return
+    if hasattr(evaluator, "N_ITERATIONS"):
+        evaluator.N_ITERATIONS = min(evaluator.N_ITERATIONS, PREFLIGHT_ITERATIONS)
+    conn.send("")
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        workspace, stdout_filepath = task
+        ResourceLimits(cpu_seconds=limits.cpu_seconds).apply(cpu_offset=cpu_time_used())
+        cpu_before = cpu_time_with_children()
+        with open(stdout_filepath, 'w') as f, redirect_stdout(f), redirect_stderr(f):
+            traceback_msg = _smoke_run(evaluator, workspace)
+        conn.send((traceback_msg, cpu_time_with_children() - cpu_before))
+
+
+class PreflightScreen:
+    """Wrap an evaluator so that candidates failing a cheap pre-flight check are not dispatched.
+
+    Args:
+        evaluator: Any object with ``iter_results(tasks)`` and ``close()``.
+        root_dir: Project root containing ``problems/``.
+        problem: Problem name, i.e. the directory under ``problems/``.
+        signature_path: The problem's ``func_signature.txt``. Without it the
+            arity check is skipped.
+        timeout: Wall-clock limit in seconds for the smoke run.
+        workspace_dir: Directory under which per-candidate workspaces are created.
+        limits: CPU-time, memory and process-count caps of the smoke-run
+            worker. The CPU budget is granted per candidate.
+    """
+
+    def __init__(self, evaluator, root_dir: str, problem: str, signature_path: Optional[str] = None,
+                 timeout: float = 5, workspace_dir: str = WORKSPACE_DIR,
+                 limits: Optional[ResourceLimits] = None) -> None:
+        self.evaluator = evaluator
+        self.root_dir = root_dir
+        self.problem = problem
+        self.timeout = timeout
+        self.workspace_dir = workspace_dir
+        self.limits = limits
+        self.signature = parse_signature(signature_path) if signature_path else None
+        self._process = None
+        self._conn = None
+        self._smoke_runs = True
+        self._passed_templates: set[str] = set()
+        self._cpu_times: dict[int, float] = {}  # Smoke-run CPU time by id() of the task, until its result
+
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            self._ctx = multiprocessing.get_context("forkserver")
+            self._ctx.set_forkserver_preload(_preload_modules(f"{root_dir}/problems/{problem}") + [__name__])
+        else:
+            self._ctx = multiprocessing.get_context("spawn")
+
+    def _worker(self):
+        """Connection to the smoke-run worker, started on first use; ``None`` if smoke runs are unavailable."""
+        if self._conn is None and self._smoke_runs:
+            self._conn, child_conn = self._ctx.Pipe()
+            self._process = self._ctx.Process(target=_worker_main, daemon=True,
+                                              args=(child_conn, self.root_dir, self.problem, self.limits))
+            self._process.start()
+            child_conn.close()
+            try:
+                reason = self._conn.recv() if self._conn.poll(LOAD_TIMEOUT) \
+                    else f"loading the evaluator took more than {LOAD_TIMEOUT} s"
+            except (EOFError, OSError):
+                self._process.join()
+                reason = describe_exit(self._process.exitcode)
+            if reason:
+                logging.warning(f"Pre-flight smoke runs disabled for {self.problem}: {reason}")
+                self._smoke_runs = False
+                self._stop_worker()
+        return self._conn
+
+    def _stop_worker(self) -> None:
+        if self._process is None:
+            return
+        kill_process_group(self._process.pid)
+        self._process.kill()
+        self._process.join()
+        self._conn.close()
+        self._process = self._conn = None
+
+    def check(self, task: EvaluationTask) -> str:
+        """Return the failure feedback for ``task``, or ``""`` if it may proceed to the full evaluation."""
+        if task.template is not None and task.template in self._passed_templates:
+            return ""
+        try:
+            tree = ast.parse(task.code, filename="gpt.py")
+        except SyntaxError:
+            return _fail(task, traceback.format_exc())
+        if self.signature is not None:
+            message = check_signature(tree, self.signature)
+            if message:
+                return _fail(task, message)
+        traceback_msg = self._smoke_run(task)
+        if not traceback_msg and task.template is not None:
+            self._passed_templates.add(task.template)
+        return traceback_msg
+
+    def _smoke_run(self, task: EvaluationTask) -> str:
+        conn = self._worker()
+        if conn is None:
+            return ""
+        workspace = prepare_workspace(self.workspace_dir, task)
+        cpu_before = process_cpu_time(self._process.pid)
+        started = time.monotonic()
+        try:
+            conn.send((os.path.abspath(workspace), os.path.abspath(task.stdout_filepath)))
+            if not conn.poll(self.timeout):
+                # Slow on the small instance: the full evaluation decides
+                self._cpu_times[id(task)] = self._worker_cpu_time(cpu_before, started)
+                self._stop_worker()
+                return ""
+            traceback_msg, self._cpu_times[id(task)] = conn.recv()
+        except (EOFError, OSError):
+            self._cpu_times[id(task)] = self._worker_cpu_time(cpu_before, started)
+            self._process.join()
+            traceback_msg = f"Pre-flight check failed: {describe_exit(self._process.exitcode)}"
+            self._stop_worker()
+        return _fail(task, traceback_msg, mode='a') if traceback_msg else ""
+
+    def _worker_cpu_time(self, cpu_before: Optional[float], started: float) -> float:
+        """CPU time of a smoke run the worker did not report; its wall time once the worker has died."""
+        now = process_cpu_time(self._process.pid)
+        if now is None or cpu_before is None:
+            return time.monotonic() - started
+        return now - cpu_before
+
+    def run(self, tasks: Sequence[EvaluationTask]) -> list[EvaluationResult]:
+        """Screen and evaluate ``tasks``; results are returned in task order."""
+        return collect_in_order(tasks, self.iter_results(tasks))
+
+    def iter_results(self, tasks: Union[Sequence[EvaluationTask], TaskStream]) -> Iterator[EvaluationResult]:
+        """Yield the candidates rejected by the pre-flight check as soon as they are screened, and the full evaluations.
+
+        ``tasks`` may be a :class:`~evaluation.stream.TaskStream` that is still being filled.
+        """
+        rejected: list[EvaluationResult] = []
+        n_tasks = 0
+
+        def keep(task: EvaluationTask) -> bool:
+            nonlocal n_tasks
+            n_tasks += 1
+            traceback_msg = self.check(task)
+            if not traceback_msg:
+                return True
+            logging.info(f"Code Run {task.response_id} failed the pre-flight check!")
+            rejected.append(EvaluationResult(task, traceback_msg=traceback_msg,
+                                             telemetry={"cpu_time": self._cpu_times.pop(id(task), 0.0)}))
+            return False
+
+        n_rejected = 0
+        for result in self.evaluator.iter_results(FilteredStream(TaskStream.of(tasks), keep)):
+            while rejected:
+                n_rejected += 1
+                yield rejected.pop(0)
+            # The smoke run is part of the candidate's cost
+            smoke_cpu_time = self._cpu_times.pop(id(result.task), 0.0)
+            if smoke_cpu_time:
+                result.telemetry["cpu_time"] = result.telemetry.get("cpu_time", 0.0) + smoke_cpu_time
+            yield result
+        while rejected:
+            n_rejected += 1
+            yield rejected.pop(0)
+        if n_rejected:
+            logging.info(f"Pre-flight check: {n_rejected}/{n_tasks} candidates rejected")
+
+    def close(self) -> None:
+        if self._conn is not None:
+            try:
+                self._conn.send(None)
+            except OSError:
+                pass
+        self._stop_worker()
+        self.evaluator.close()
@@ -0,0 +1,314 @@
+"""Structured result record emitted by ``problems/<problem>/eval.py``.
+
+The evolution loop used to recover a candidate's objective from the last
+line of the ``eval.py`` transcript. ``eval.py`` now reports through this
+module:
+
+- ``solve_instances(solve, instances)`` evaluates each instance, prints the
+  usual ``[*] Instance i: obj`` line, and records its objective and wall
+  time;
+- ``report_objective(obj)`` prints the ``[*] Average:`` footer and records
+  the overall objective.
+
+The record also holds the run's :mod:`~evaluation.telemetry`. ``eval.py``
+wraps the candidate with :func:`timed_heuristic` so that time inside the
+heuristic can be told apart from the solver's.
+
+The launcher saves the record as ``result.json`` in the candidate's
+workspace, along with the traceback if ``eval.py`` raised. Warm workers send
+the record straight back over their pipe. The text transcript is still
+written, for humans and as the LLM's feedback.
+
+A run can be given a :class:`Race`. ``solve_instances`` then stops the
+candidate as soon as the mean over the instances solved so far is clearly
+worse than the bound. The loop sets the bound from its elitist.
+
+A run can also be given an :class:`InstanceBudget`. ``solve_instances``
+then interrupts any instance that runs longer than the budget and moves on
+to the next one. A timed-out instance scores a penalty derived from the
+worst instance that finished, so the candidate keeps credit for the work it
+did. The interruption uses ``SIGALRM``, which Python only handles between
+bytecodes. A candidate stuck in one long native call is still stopped only
+by the run's overall timeout.
+
+Finally, a run can be given a fidelity below 1, for a cheaper estimate of
+the objective. ``solve_instances`` then solves only that fraction of the
+instances, the first ones. Evaluators that solve their instances some
+other way, e.g. concurrently, select the same ones with
+:func:`fidelity_instances`.
+"""
+
+from __future__ import annotations
+
+import functools
+import inspect
+import json
+import math
+import os
+import signal
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Iterable, Optional
+
+RESULT_FILENAME = "result.json"
+RACE_ENV = "HSEVO_RACE"
+BUDGET_ENV = "HSEVO_INSTANCE_BUDGET"
+DISPATCH_TIME_ENV = "HSEVO_DISPATCH_TIME"
+FIDELITY_ENV = "HSEVO_FIDELITY"
+
+
+@dataclass
+class Race:
+    """Early-stopping rule for one candidate.
+
+    Args:
+        bound: Running-mean objective beyond which the candidate has lost, in
+            the loop's minimisation sense (negated for maximisation problems).
+        maximize: Whether ``eval.py`` reports an objective to maximise.
+        min_instances: Instances to solve before the running mean is trusted.
+    """
+
+    bound: float
+    maximize: bool = False
+    min_instances: int = 1
+
+    def is_lost(self, objs: list[float]) -> bool:
+        if len(objs) < self.min_instances:
+            return False
+        mean = sum(objs) / len(objs)
+        return (-mean if self.maximize else mean) > self.bound
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self))
+
+    @classmethod
+    def from_json(cls, text: Optional[str]) -> Optional[Race]:
+        return cls(**json.loads(text)) if text else None
+
+
+class RaceLost(Exception):
+    """Raised by :func:`solve_instances` when a candidate is stopped by its :class:`Race`."""
+
+
+@dataclass
+class InstanceBudget:
+    """Per-instance time limit with partial credit.
+
+    Args:
+        seconds: Wall-clock time allowed for one instance.
+        penalty: An instance that runs out of time scores the worst objective
+            among the instances that finished, made worse by
+            ``penalty * abs(worst)``.
+        maximize: Whether ``eval.py`` reports an objective to maximise.
+    """
+
+    seconds: float
+    penalty: float = 1.0
+    maximize: bool = False
+
+    def penalty_objective(self, objs: list[float]) -> float:
+        """Score of a timed-out instance, given the objectives of the instances that finished."""
+        worst = min(objs) if self.maximize else max(objs)
+        return worst - self.penalty * abs(worst) if self.maximize else worst + self.penalty * abs(worst)
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self))
+
+    @classmethod
+    def from_json(cls, text: Optional[str]) -> Optional[InstanceBudget]:
+        return cls(**json.loads(text)) if text else None
+
+
+class InstanceTimeout(BaseException):
+    """Raised into the solver when an instance exceeds its :class:`InstanceBudget`.
+
+    A ``BaseException``, so that ``except Exception`` in candidates cannot swallow it.
+    """
+
+
+def _on_instance_alarm(signum, frame):
+    raise InstanceTimeout()
+
+
+@dataclass
+class ResultRecord:
+    """Outcome of one ``eval.py`` run.
+
+    ``failure`` is empty on success. Otherwise it holds the reason the run
+    failed, usually the traceback. ``stopped_early`` marks a candidate stopped
+    by its :class:`Race`. ``timed_out_instances`` lists the instances that
+    exceeded the :class:`InstanceBudget`; their entries in ``instance_objs``
+    are penalties. ``telemetry`` is described in :mod:`evaluation.telemetry`.
+    """
+
+    obj: Optional[float] = None
+    instance_objs: list[float] = field(default_factory=list)
+    instance_times: list[float] = field(default_factory=list)
+    failure: str = ""
+    stopped_early: bool = False
+    timed_out_instances: list[int] = field(default_factory=list)
+    telemetry: dict[str, float] = field(default_factory=dict)
+
+    def save(self, path: str) -> None:
+        """Write the record atomically, so a reader never sees a partial file."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(asdict(self), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional[ResultRecord]:
+        """Read a record saved by :meth:`save`, or ``None`` if there is none."""
+        try:
+            with open(path, 'r') as f:
+                return cls(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+
+
+_record = ResultRecord()
+_race: Optional[Race] = None
+_budget: Optional[InstanceBudget] = None
+_dispatched_at: Optional[float] = None
+_fidelity = 1.0
+_heuristic_time = 0.0
+
+
+def current_record() -> ResultRecord:
+    return _record
+
+
+def current_fidelity() -> float:
+    """Fraction of the full evaluation effort the current candidate is given, in ``(0, 1]``."""
+    return _fidelity
+
+
+def current_race() -> Optional[Race]:
+    return _race
+
+
+def current_budget() -> Optional[InstanceBudget]:
+    return _budget
+
+
+def fidelity_instances(instances: Iterable) -> list:
+    """The instances solved at the current fidelity: the first ``ceil(len(instances) * fidelity)``, at least one."""
+    instances = list(instances)
+    if _fidelity < 1.0:
+        instances = instances[:max(1, math.ceil(len(instances) * _fidelity))]
+    return instances
+
+
+def reset_record(race: Optional[Race] = None, budget: Optional[InstanceBudget] = None,
+                 dispatched_at: Optional[float] = None, fidelity: Optional[float] = None) -> ResultRecord:
+    """Start a new record for the next candidate, optionally raced or with a per-instance budget, and return it.
+
+    ``dispatched_at`` is the ``time.time()`` at which the evaluator handed out
+    the candidate, from which the start-up time is measured. ``fidelity`` is
+    the fraction of the instances to solve (all of them if ``None``).
+    """
+    global _record, _race, _budget, _dispatched_at, _fidelity, _heuristic_time
+    _record = ResultRecord()
+    _race = race
+    _budget = budget
+    _dispatched_at = dispatched_at
+    _fidelity = min(1.0, fidelity) if fidelity else 1.0
+    _heuristic_time = 0.0
+    return _record
+
+
+def timed_heuristic(heuristic: Callable) -> Callable:
+    """Wrap the candidate's heuristic so that the time spent inside it is recorded.
+
+    The wrapper keeps the heuristic's signature, for evaluators that inspect it.
+    """
+    @functools.wraps(heuristic)
+    def wrapper(*args, **kwargs):
+        global _heuristic_time
+        start = time.perf_counter()
+        try:
+            return heuristic(*args, **kwargs)
+        finally:
+            _heuristic_time += time.perf_counter() - start
+
+    try:
+        wrapper.__signature__ = inspect.signature(heuristic)
+    except (TypeError, ValueError):
+        pass
+    return wrapper
+
+
+def solve_instances(solve: Callable, instances: Iterable, *args, **kwargs) -> list[float]:
+    """Call ``solve(instance, *args, **kwargs)`` on every instance and record the outcomes.
+
+    Returns the per-instance objectives as floats, with penalties for the
+    instances that exceeded the current :class:`InstanceBudget`. Raises
+    :class:`RaceLost` if the current :class:`Race` is lost before the last
+    instance. At a fidelity below 1, only the first instances are solved.
+    """
+    instances = fidelity_instances(instances)
+    # The alarm can only be delivered to the main thread
+    budget = _budget if hasattr(signal, "SIGALRM") and threading.current_thread() is threading.main_thread() \
+        else None
+    if budget is not None:
+        previous_handler = signal.signal(signal.SIGALRM, _on_instance_alarm)
+    if _dispatched_at is not None:
+        _record.telemetry["startup_time"] = time.time() - _dispatched_at
+    heuristic_time = _heuristic_time
+    objs: list[Optional[float]] = []
+    try:
+        for i, instance in enumerate(instances):
+            start = time.perf_counter()
+            try:
+                if budget is not None:
+                    signal.setitimer(signal.ITIMER_REAL, budget.seconds)
+                value = solve(instance, *args, **kwargs)
+                # Disarm before leaving the try, so that an alarm due just as solve() returns is still caught here
+                if budget is not None:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+                obj = float(value)
+            except InstanceTimeout:
+                obj = None
+            finally:
+                if budget is not None:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+            elapsed = time.perf_counter() - start
+            if obj is None:
+                print(f"[*] Instance {i}: timed out after {budget.seconds} s")
+                _record.timed_out_instances.append(i)
+            else:
+                print(f"[*] Instance {i}: {obj}")
+            objs.append(obj)
+            _record.instance_objs.append(obj)
+            _record.instance_times.append(elapsed)
+            solved = [obj for obj in objs if obj is not None]
+            if _race is not None and i + 1 < len(instances) and _race.is_lost(solved):
+                _record.stopped_early = True
+                raise RaceLost(f"Evaluation stopped early: the mean objective {sum(solved) / len(solved)} over "
+                               f"{len(solved)}/{len(instances)} instances is too far behind the best heuristic "
+                               f"so far.")
+    finally:
+        if budget is not None:
+            signal.signal(signal.SIGALRM, previous_handler)
+        solve_time = sum(_record.instance_times)
+        heuristic_time = _heuristic_time - heuristic_time
+        _record.telemetry.update(solve_time=solve_time, heuristic_time=heuristic_time,
+                                 solver_time=max(0.0, solve_time - heuristic_time))
+
+    if _record.timed_out_instances:
+        solved = [obj for obj in objs if obj is not None]
+        if not solved:
+            raise RuntimeError(f"Every instance exceeded the time budget of {budget.seconds} s.")
+        penalty = budget.penalty_objective(solved)
+        print(f"[*] {len(_record.timed_out_instances)}/{len(instances)} instances timed out and score {penalty}")
+        objs = [penalty if obj is None else obj for obj in objs]
+        _record.instance_objs[-len(objs):] = objs
+    return objs
+
+
+def report_objective(obj: float) -> None:
+    """Print the transcript footer and record ``obj`` as the overall objective."""
+    print("[*] Average:")
+    print(obj)
+    _record.obj = float(obj)
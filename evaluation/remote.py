@@ -0,0 +1,403 @@
+"""Evaluation on remote worker daemons over a small TCP work-queue protocol.
+
+One machine limits how many heuristics can be evaluated per generation. An
+evaluation farm is a set of :class:`EvaluationServer` daemons, each started
+on a host that has a checkout of this repository::
+
+    python -m evaluation.serve --host 0.0.0.0 --port 6000 --slots 8 --authkey <secret>
+
+The evolution loop uses a :class:`RemoteEvaluator` that connects to the
+daemons. It has the same ``run``/``iter_results``/``close`` interface as the
+local backends, so HSEvo, ReEvo and EoH can all use the same farm, even at
+the same time. Each daemon limits its concurrent evaluations to ``--slots``
+in total, across all of its clients.
+
+Protocol. Messages are dicts sent with :mod:`multiprocessing.connection`,
+which handles framing and the HMAC handshake on ``authkey``.
+
+- On connect the server sends ``{"type": "hello", "slots": n}``.
+- The client sends ``{"type": "task", "id", "problem", "problem_size",
+  "problem_type", "timeout", "code", "response_id", "race", "budget",
+  "fidelity"}``.
+- The server answers ``{"type": "result", "id", "obj", "traceback_msg",
+  "timed_out", "instance_objs", "instance_times", "stopped_early",
+  "timed_out_instances", "telemetry", "stdout"}``. The telemetry is
+  measured on the worker host.
+- While connected, the server also sends ``{"type": "heartbeat"}`` every
+  ``heartbeat_interval`` seconds.
+
+A worker that stops sending heartbeats, or whose connection drops, is
+considered dead. Its in-flight tasks are re-dispatched to the remaining
+workers, up to ``max_attempts`` times per task. A worker that comes back is
+reconnected at the next dispatch. Connecting is bounded by
+``connect_timeout``. An unreachable address is retried after
+``RETRY_DELAY`` seconds, then after twice as long after each failure, up to
+``heartbeat_timeout``, so a host that drops packets never stalls the workers
+that are up. With no worker connected, the client sleeps until the next
+retry is due rather than polling.
+
+Everything works on localhost: start several daemons on different ports
+and list them all in the client's ``addresses``.
+"""
+
+from __future__ import annotations
+
+import itertools
+import logging
+import multiprocessing.connection
+import os
+import socket
+import tempfile
+import threading
+import time
+from collections import deque
+from dataclasses import asdict
+from typing import Iterator, Optional, Sequence, Union
+
+from .cpu_slots import CpuAllocator
+from .engine import EvaluationEngine, EvaluationResult, EvaluationTask, collect_in_order, default_num_workers
+from .limits import ResourceLimits
+from .record import InstanceBudget, Race
+from .stream import TaskStream
+
+DEFAULT_PORT = 6000
+AUTHKEY_ENV = "HSEVO_EVAL_AUTHKEY"
+RETRY_DELAY = 0.25  # Seconds before the first retry of an unreachable worker; doubled after each failure
+
+
+def parse_address(address: str) -> tuple[str, int]:
+    """``"host:port"`` (or just ``"host"``) to a ``(host, port)`` pair."""
+    host, _, port = str(address).rpartition(":")
+    if not host:
+        return port, DEFAULT_PORT
+    return host, int(port)
+
+
+def resolve_authkey(authkey: Optional[str]) -> bytes:
+    """The shared secret: ``authkey`` if given, else the ``HSEVO_EVAL_AUTHKEY`` environment variable."""
+    authkey = authkey or os.environ.get(AUTHKEY_ENV)
+    if not authkey:
+        raise ValueError(f"An authkey is required for remote evaluation (pass one or set {AUTHKEY_ENV}).")
+    return authkey.encode() if isinstance(authkey, str) else authkey
+
+
+class EvaluationServer:
+    """Worker daemon that evaluates tasks received from :class:`RemoteEvaluator` clients.
+
+    Args:
+        address: ``(host, port)`` to listen on.
+        authkey: Shared secret clients must know.
+        root_dir: Project root containing ``problems/`` and ``evaluation/``.
+        slots: Maximum number of concurrent evaluations. Defaults to the
+            number of CPUs.
+        work_dir: Directory for workspaces and stdout files. Defaults to a
+            temporary directory.
+        heartbeat_interval: Seconds between heartbeats to each client.
+        limits: Resource limits applied to every evaluation.
+        pin_cpus: Pin each evaluation to the CPUs of its slot. Either way,
+            the host's CPUs are shared out in ``slots`` CPU slots.
+    """
+
+    def __init__(self, address: tuple[str, int], authkey: bytes, root_dir: str, slots: Optional[int] = None,
+                 work_dir: Optional[str] = None, heartbeat_interval: float = 2.0,
+                 limits: Optional[ResourceLimits] = None, pin_cpus: bool = False) -> None:
+        self.address = address
+        self.authkey = authkey
+        self.root_dir = root_dir
+        self.slots = max(1, int(slots)) if slots else default_num_workers()
+        self.work_dir = work_dir or tempfile.mkdtemp(prefix="hsevo_eval_")
+        self.heartbeat_interval = heartbeat_interval
+        self.limits = limits
+        self._slots = threading.Semaphore(self.slots)
+        self._cpu_allocator = CpuAllocator(self.slots, pin=pin_cpus)
+        self._engines: dict[tuple, EvaluationEngine] = {}
+        self._lock = threading.Lock()
+        self._serial = itertools.count()
+
+    def serve_forever(self) -> None:
+        with multiprocessing.connection.Listener(self.address, authkey=self.authkey) as listener:
+            logging.info(f"Evaluation server listening on {listener.address} with {self.slots} slots")
+            while True:
+                try:
+                    conn = listener.accept()
+                except (OSError, multiprocessing.AuthenticationError) as e:
+                    logging.warning(f"Rejected connection: {e}")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _engine(self, problem: str, problem_size, problem_type: str, timeout: float) -> EvaluationEngine:
+        key = (problem, problem_size, problem_type, timeout)
+        with self._lock:
+            if key not in self._engines:
+                self._engines[key] = EvaluationEngine(
+                    self.root_dir, problem, problem_size, problem_type, timeout=timeout, num_workers=1,
+                    workspace_dir=os.path.join(self.work_dir, "workspaces"), limits=self.limits,
+                    cpu_allocator=self._cpu_allocator)
+            return self._engines[key]
+
+    def _handle(self, conn) -> None:
+        """Serve one client: heartbeats on a side thread, one thread per received task."""
+        send_lock = threading.Lock()
+        stopped = threading.Event()
+
+        def send(message: dict) -> None:
+            with send_lock:
+                conn.send(message)
+
+        def heartbeat() -> None:
+            while not stopped.wait(self.heartbeat_interval):
+                try:
+                    send({"type": "heartbeat"})
+                except OSError:
+                    return
+
+        try:
+            send({"type": "hello", "slots": self.slots})
+            threading.Thread(target=heartbeat, daemon=True).start()
+            while True:
+                message = conn.recv()
+                if message.get("type") == "task":
+                    threading.Thread(target=self._run_task, args=(send, message), daemon=True).start()
+        except (EOFError, OSError):
+            pass
+        finally:
+            stopped.set()
+            conn.close()
+
+    def _run_task(self, send, message: dict) -> None:
+        with self._slots:
+            engine = self._engine(message["problem"], message["problem_size"], message.get("problem_type", ""),
+                                  message["timeout"])
+            stdout_filepath = os.path.join(self.work_dir, f"task{next(self._serial)}_stdout.txt")
+            race = Race(**message["race"]) if message.get("race") else None
+            budget = InstanceBudget(**message["budget"]) if message.get("budget") else None
+            task = EvaluationTask(message["code"], stdout_filepath, message.get("response_id", 0), race, budget,
+                                  fidelity=message.get("fidelity"))
+            result = engine.run([task])[0]
+            try:
+                with open(stdout_filepath, 'r') as f:
+                    stdout = f.read()
+                os.remove(stdout_filepath)
+            except OSError:
+                stdout = ""
+        reply = {key: value for key, value in asdict(result).items() if key != "task"}
+        try:
+            send({"type": "result", "id": message["id"], "stdout": stdout, **reply})
+        except OSError:
+            pass  # The client went away; it re-dispatches the task elsewhere
+
+
+class _RemoteWorker:
+    def __init__(self, address: tuple[str, int], conn, slots: int) -> None:
+        self.address = address
+        self.conn = conn
+        self.slots = slots
+        self.tasks: dict[int, EvaluationTask] = {}
+        self.last_seen = time.monotonic()
+
+    @property
+    def name(self) -> str:
+        return f"{self.address[0]}:{self.address[1]}"
+
+
+class RemoteEvaluator:
+    """Evaluate candidates on :class:`EvaluationServer` daemons.
+
+    Args:
+        addresses: ``"host:port"`` of every worker daemon.
+        authkey: Shared secret. Defaults to the ``HSEVO_EVAL_AUTHKEY``
+            environment variable.
+        problem: Problem name, i.e. the directory under ``problems/``.
+        problem_size: Training instance size passed to ``eval.py``.
+        problem_type: ``"black_box"`` selects ``eval_black_box.py``.
+        timeout: Wall-clock limit in seconds for one candidate, enforced by
+            the workers.
+        heartbeat_timeout: Seconds of silence after which a worker is
+            considered dead.
+        max_attempts: Dispatches of one task before it is reported as failed.
+        connect_timeout: Seconds allowed to open a connection to a worker.
+    """
+
+    def __init__(self, addresses: Sequence[str], authkey: Optional[str], problem: str, problem_size: int,
+                 problem_type: str = "", timeout: float = 50, heartbeat_timeout: float = 10,
+                 max_attempts: int = 3, connect_timeout: float = 3) -> None:
+        self.addresses = [parse_address(address) for address in addresses]
+        self.authkey = resolve_authkey(authkey)
+        self.problem = problem
+        self.problem_size = problem_size
+        self.problem_type = problem_type
+        self.timeout = timeout
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_attempts = max_attempts
+        self.connect_timeout = connect_timeout
+        self._workers: dict[tuple[str, int], _RemoteWorker] = {}
+        self._retry_at: dict[tuple[str, int], float] = {}  # Unreachable addresses are not retried before then
+        self._failures: dict[tuple[str, int], int] = {}  # Consecutive failed connections of each address
+        self._task_ids = itertools.count()
+
+    def _open(self, address: tuple[str, int]) -> multiprocessing.connection.Connection:
+        """Connect and authenticate like ``multiprocessing.connection.Client``, within ``connect_timeout``."""
+        sock = socket.create_connection(address, timeout=self.connect_timeout)
+        sock.setblocking(True)
+        conn = multiprocessing.connection.Connection(sock.detach())
+        try:
+            if not conn.poll(self.connect_timeout):
+                raise TimeoutError("no authentication challenge received")
+            multiprocessing.connection.answer_challenge(conn, self.authkey)
+            multiprocessing.connection.deliver_challenge(conn, self.authkey)
+            if not conn.poll(self.heartbeat_timeout):
+                raise TimeoutError("no hello received")
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    def _connect(self) -> None:
+        """(Re)connect to every worker daemon that is not connected and not waiting for a retry."""
+        for address in self.addresses:
+            if address in self._workers or time.monotonic() < self._retry_at.get(address, 0.0):
+                continue
+            try:
+                conn = self._open(address)
+                hello = conn.recv()
+            except (OSError, EOFError, TimeoutError, multiprocessing.AuthenticationError) as e:
+                logging.debug(f"Cannot connect to evaluation worker {address[0]}:{address[1]}: {e}")
+                self._failures[address] = self._failures.get(address, 0) + 1
+                delay = min(self.heartbeat_timeout, RETRY_DELAY * 2 ** (self._failures[address] - 1))
+                self._retry_at[address] = time.monotonic() + delay
+                continue
+            self._retry_at.pop(address, None)
+            self._failures.pop(address, None)
+            self._workers[address] = _RemoteWorker(address, conn, int(hello.get("slots", 1)))
+            logging.info(f"Connected to evaluation worker {address[0]}:{address[1]} ({hello.get('slots')} slots)")
+
+    def _drop(self, worker: _RemoteWorker, reason: str) -> list[EvaluationTask]:
+        """Forget a dead worker and return its in-flight tasks."""
+        logging.info(f"Evaluation worker {worker.name} lost ({reason}); re-dispatching {len(worker.tasks)} tasks")
+        try:
+            worker.conn.close()
+        except OSError:
+            pass
+        del self._workers[worker.address]
+        return list(worker.tasks.values())
+
+    def _dispatch(self, worker: _RemoteWorker, task: EvaluationTask) -> bool:
+        task_id = next(self._task_ids)
+        message = {"type": "task", "id": task_id, "problem": self.problem, "problem_size": self.problem_size,
+                   "problem_type": self.problem_type, "timeout": self.timeout, "code": task.code,
+                   "response_id": task.response_id, "race": asdict(task.race) if task.race else None,
+                   "budget": asdict(task.budget) if task.budget else None, "fidelity": task.fidelity}
+        try:
+            worker.conn.send(message)
+        except OSError:
+            return False
+        worker.tasks[task_id] = task
+        return True
+
+    def run(self, tasks: Sequence[EvaluationTask]) -> list[EvaluationResult]:
+        """Evaluate ``tasks`` on the farm; results are returned in task order."""
+        return collect_in_order(tasks, self.iter_results(tasks))
+
+    def iter_results(self, tasks: Union[Sequence[EvaluationTask], TaskStream]) -> Iterator[EvaluationResult]:
+        """Evaluate ``tasks`` on the farm, yielding each result as soon as it arrives.
+
+        ``tasks`` may be a :class:`~evaluation.stream.TaskStream` that is still being filled.
+        """
+        source = TaskStream.of(tasks)
+        pending = deque()
+        attempts = {}
+        unreachable_since = None
+
+        def requeue(lost: list[EvaluationTask], reason: str) -> Iterator[EvaluationResult]:
+            for task in lost:
+                if attempts[id(task)] >= self.max_attempts:
+                    yield EvaluationResult(task, traceback_msg=f"Evaluation failed on {attempts[id(task)]} "
+                                                               f"workers: {reason}")
+                else:
+                    pending.appendleft(task)
+
+        try:
+            while pending or any(worker.tasks for worker in self._workers.values()) or not source.finished:
+                for task in source.drain():
+                    pending.append(task)
+                    attempts[id(task)] = 0
+                if pending:
+                    self._connect()
+                # Fill free slots, least loaded workers first
+                for worker in sorted(self._workers.values(), key=lambda w: len(w.tasks) / w.slots):
+                    while pending and len(worker.tasks) < worker.slots:
+                        task = pending.popleft()
+                        if not self._dispatch(worker, task):
+                            pending.appendleft(task)
+                            break
+                        attempts[id(task)] += 1
+
+                # Wake up for new tasks while the stream is open
+                waitables = [] if source.closed else [source]
+                if not self._workers:
+                    if not pending:
+                        unreachable_since = None
+                        multiprocessing.connection.wait(waitables, timeout=1)
+                        continue
+                    unreachable_since = unreachable_since or time.monotonic()
+                    give_up_at = unreachable_since + self.heartbeat_timeout
+                    if time.monotonic() > give_up_at:
+                        while pending:
+                            task = pending.popleft()
+                            logging.info(f"Error for response_id {task.response_id}: no evaluation worker reachable")
+                            yield EvaluationResult(task, traceback_msg="No evaluation worker is reachable.")
+                    else:
+                        # Sleep until the next retry is due, or until it is time to give up
+                        wake_at = min([give_up_at + 0.01] + list(self._retry_at.values()))
+                        multiprocessing.connection.wait(waitables, timeout=max(0.0, wake_at - time.monotonic()))
+                    continue
+                unreachable_since = None
+
+                workers = {worker.conn: worker for worker in self._workers.values()}
+                ready = multiprocessing.connection.wait(list(workers) + waitables, timeout=self.heartbeat_timeout / 4)
+                for conn in ready:
+                    if conn is source:
+                        continue
+                    worker = workers[conn]
+                    try:
+                        while conn.poll():
+                            message = conn.recv()
+                            worker.last_seen = time.monotonic()
+                            if message.get("type") == "result" and message["id"] in worker.tasks:
+                                yield self._result(worker.tasks.pop(message["id"]), message)
+                    except (EOFError, OSError):
+                        yield from requeue(self._drop(worker, "connection closed"), f"{worker.name} disconnected")
+
+                now = time.monotonic()
+                for worker in list(self._workers.values()):
+                    if now - worker.last_seen > self.heartbeat_timeout:
+                        yield from requeue(self._drop(worker, "no heartbeat"), f"{worker.name} stopped responding")
+        finally:
+            # Only matters if the caller stopped iterating early: late results of these tasks are ignored
+            for worker in self._workers.values():
+                worker.tasks.clear()
+
+    def _result(self, task: EvaluationTask, message: dict) -> EvaluationResult:
+        with open(task.stdout_filepath, 'w') as f:
+            f.write(message.get("stdout", ""))
+        result = EvaluationResult(task, obj=message["obj"], traceback_msg=message["traceback_msg"],
+                                  timed_out=message["timed_out"], instance_objs=message["instance_objs"],
+                                  instance_times=message["instance_times"], stopped_early=message["stopped_early"],
+                                  timed_out_instances=message.get("timed_out_instances", []),
+                                  telemetry=message.get("telemetry", {}))
+        if result.timed_out:
+            logging.info(f"Error for response_id {task.response_id}: {result.traceback_msg}")
+        else:
+            status = "successful" if result.success else "stopped early" if result.stopped_early else "execution error"
+            logging.info(f"Code Run {task.response_id} {status}!")
+        return result
+
+    def close(self) -> None:
+        """Disconnect from all workers; the daemons keep running."""
+        for worker in list(self._workers.values()):
+            try:
+                worker.conn.close()
+            except OSError:
+                pass
+        self._workers = {}
+
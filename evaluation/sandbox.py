@@ -0,0 +1,71 @@
+"""Evaluation of ``tsp_gls`` candidates with the GLS sandbox.
+
+``tsp_gls`` candidates are scored by the sandbox in
+``baselines/reevo/gls_tsp_adapt`` rather than by ``problems/tsp_gls/eval.py``:
+the heuristic is compiled with numba and run by the guided local search of
+``tsp_eval_helper`` on 64 instances, spread over ``n_jobs`` joblib workers.
+:class:`SandboxEvaluator` runs ``problems/tsp_gls/eval_sandbox.py``, which
+does this for one candidate, as an ordinary engine run. Candidates are
+therefore evaluated concurrently, each in its own process group that is
+killed when it exceeds the timeout, like those of every other problem.
+
+The two levels of parallelism share the CPUs. Each candidate's joblib
+workers are capped at the size of its CPU slot (see
+:mod:`evaluation.cpu_slots`), and the ``n_jobs`` of
+``evaluator_runtime_config.json`` remains an upper bound.
+
+The sandbox's numba kernels are cached on disk. The evaluator compiles them
+once with :mod:`evaluation.warmup` before its first candidate, so that the
+first concurrent candidates do not all compile them at the same time.
+"""
+
+from __future__ import annotations
+
+import logging
+import subprocess
+import sys
+from typing import Optional
+
+from .cpu_slots import CpuAllocator
+from .engine import WORKSPACE_DIR, EvaluationEngine
+from .limits import ResourceLimits
+
+SANDBOX_DIR = "baselines/reevo/gls_tsp_adapt"
+SANDBOX_SCRIPT = "problems/tsp_gls/eval_sandbox.py"
+
+
+class SandboxEvaluator(EvaluationEngine):
+    """:class:`~evaluation.engine.EvaluationEngine` that scores ``tsp_gls`` candidates with the GLS sandbox.
+
+    Args:
+        root_dir: Project root containing ``problems/`` and ``baselines/``.
+        problem_size: Passed on to the script like to ``eval.py``; the sandbox
+            has its own instances.
+        timeout: Wall-clock limit in seconds for one candidate.
+        num_workers: Maximum number of concurrent candidates. Defaults to the
+            number of CPUs.
+        workspace_dir: Directory under which per-candidate workspaces are created.
+        limits: CPU-time, memory and process-count caps for each run.
+        cpu_allocator: CPU slots that cap each run's joblib workers.
+        warm_up: Compile the sandbox's numba kernels into their cache first.
+    """
+
+    def __init__(self, root_dir: str, problem_size: int, timeout: float = 50, num_workers: Optional[int] = None,
+                 workspace_dir: str = WORKSPACE_DIR, limits: Optional[ResourceLimits] = None,
+                 cpu_allocator: Optional[CpuAllocator] = None, warm_up: bool = True) -> None:
+        super().__init__(root_dir, "tsp_gls", problem_size, timeout=timeout, num_workers=num_workers,
+                         workspace_dir=workspace_dir, limits=limits, eval_script=f"{root_dir}/{SANDBOX_SCRIPT}",
+                         cpu_allocator=cpu_allocator)
+        if warm_up:
+            self.warm_up()
+
+    def warm_up(self) -> None:
+        """Compile the sandbox's kernels, or check that they are cached. A failure is left to the candidates."""
+        try:
+            proc = subprocess.run([sys.executable, "-m", "evaluation.warmup", "sandbox"], cwd=self.root_dir,
+                                  capture_output=True, text=True, timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            logging.warning(f"Warm-up of the GLS sandbox took more than {self.timeout}s")
+            return
+        if proc.returncode != 0:
+            logging.warning(f"Warm-up of the GLS sandbox failed:\n{proc.stderr.strip()}")
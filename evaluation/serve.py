@@ -0,0 +1,43 @@
+"""Start an evaluation worker daemon for :class:`~evaluation.remote.RemoteEvaluator` clients.
+
+Usage::
+
+    python -m evaluation.serve --host 0.0.0.0 --port 6000 --slots 8 --authkey <secret>
+
+Run it from the project root of a checkout on each evaluation host.
+"""
+
+import argparse
+import logging
+import os
+from typing import Optional
+
+from .limits import ResourceLimits
+from .remote import AUTHKEY_ENV, DEFAULT_PORT, EvaluationServer, resolve_authkey
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run an HSEvo evaluation worker daemon.")
+    parser.add_argument("--host", default="127.0.0.1", help="interface to listen on (0.0.0.0 for all)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--slots", type=int, default=None, help="concurrent evaluations (default: number of CPUs)")
+    parser.add_argument("--authkey", default=None, help=f"shared secret (default: ${AUTHKEY_ENV})")
+    parser.add_argument("--root-dir", default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser.add_argument("--work-dir", default=None, help="directory for workspaces (default: a temporary one)")
+    parser.add_argument("--heartbeat-interval", type=float, default=2.0)
+    parser.add_argument("--cpu-limit", type=int, default=None, help="CPU seconds per evaluation")
+    parser.add_argument("--memory-limit", type=int, default=None, help="address space in MiB per evaluation")
+    parser.add_argument("--process-limit", type=int, default=None, help="RLIMIT_NPROC per evaluation")
+    parser.add_argument("--pin-cpus", action="store_true", help="pin each evaluation to the CPUs of its slot")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="[%(asctime)s][%(levelname)s] - %(message)s")
+    server = EvaluationServer((args.host, args.port), resolve_authkey(args.authkey), args.root_dir,
+                              slots=args.slots, work_dir=args.work_dir, heartbeat_interval=args.heartbeat_interval,
+                              limits=ResourceLimits(args.cpu_limit, args.memory_limit, args.process_limit),
+                              pin_cpus=args.pin_cpus)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
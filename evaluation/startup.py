@@ -0,0 +1,122 @@
+"""Start-up benchmark: how long an evaluation takes before it solves anything.
+
+Usage::
+
+    python -m evaluation.startup [problem ...] [--repeat 3] [--output startup.jsonl]
+
+Every one-shot evaluation starts an interpreter, imports the problem's
+``eval.py`` with everything it pulls in, and imports the candidate. Over a
+450-evaluation run, a second of imports per candidate adds up. For each
+problem (all of ``problems/`` by default), the benchmark runs a fresh
+interpreter that does exactly this with the problem's seed heuristic, as
+extracted for HSEvo. It reports the median of each phase in seconds:
+
+- ``interpreter``: interpreter start-up, up to the first import;
+- ``evaluation``: ``evaluation.record``, as imported by every ``eval.py``;
+- ``eval_py``: the problem's ``eval.py`` and its solver;
+- ``candidate``: the seed heuristic's own imports;
+
+and the modules with the largest cumulative import time (``-X importtime``).
+With ``--output``, one JSON line per problem is appended, so that start-up
+time can be tracked from commit to commit.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Optional
+
+_CHILD = """
+import json, sys, time
+started = time.perf_counter()
+problem_dir, root_dir, code = sys.argv[1:4]
+sys.path[:0] = [problem_dir, root_dir]
+import evaluation.record
+evaluation_done = time.perf_counter()
+import eval
+eval_done = time.perf_counter()
+exec(compile(code, "gpt.py", "exec"), {"__name__": "gpt"})
+candidate_done = time.perf_counter()
+print(json.dumps({"started": started, "evaluation": evaluation_done - started,
+                  "eval_py": eval_done - evaluation_done, "candidate": candidate_done - eval_done}))
+"""
+
+PHASES = ("interpreter", "evaluation", "eval_py", "candidate")
+
+
+def seed_candidate(root_dir: str, problem: str) -> str:
+    """The problem's seed heuristic, as HSEvo extracts it."""
+    from utils.utils import extract_code_from_generator, file_to_string
+    seed_func = file_to_string(f"{root_dir}/prompts/{problem}/seed_func.txt")
+    return extract_code_from_generator(seed_func).replace("v1", "v2")
+
+
+def _top_imports(importtime: str, count: int) -> list[tuple[str, float]]:
+    """Top-level modules with the largest cumulative import time in ``-X importtime`` output, in seconds."""
+    modules = []
+    for line in importtime.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not name.startswith("   "):  # Nested imports are indented further
+            modules.append((name.strip(), int(cumulative) / 1e6))
+    return sorted(modules, key=lambda module: -module[1])[:count]
+
+
+def measure(root_dir: str, problem: str, repeat: int = 3, top: int = 5) -> dict:
+    """Median start-up phases of ``problem`` over ``repeat`` fresh interpreters."""
+    problem_dir = f"{root_dir}/problems/{problem}"
+    code = seed_candidate(root_dir, problem)
+    samples, top_imports = [], []
+    for _ in range(repeat):
+        launched = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", _CHILD, problem_dir, root_dir, code],
+                              capture_output=True, text=True, cwd=problem_dir)
+        finished = time.perf_counter()
+        if proc.returncode != 0:
+            return {"problem": problem, "error": proc.stderr.strip().splitlines()[-1]}
+        phases = json.loads(proc.stdout.strip().splitlines()[-1])
+        phases["interpreter"] = phases.pop("started") - launched
+        phases["total"] = finished - launched
+        samples.append(phases)
+        top_imports = _top_imports(proc.stderr, top)
+    result = {"problem": problem}
+    result.update({phase: statistics.median(sample[phase] for sample in samples) for phase in PHASES + ("total",)})
+    result["top_imports"] = top_imports
+    return result
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    problems = sorted(name for name in os.listdir(f"{root_dir}/problems")
+                      if os.path.isfile(f"{root_dir}/problems/{name}/eval.py"))
+    parser = argparse.ArgumentParser(description="Measure the start-up time of one-shot evaluations.")
+    parser.add_argument("problems", nargs="*", default=problems, help="problems to measure (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="interpreters per problem; the median is reported")
+    parser.add_argument("--top", type=int, default=5, help="number of slowest imports to list")
+    parser.add_argument("--output", default=None, help="JSON-lines file to append the results to")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, root_dir)
+    for problem in args.problems:
+        result = measure(root_dir, problem, args.repeat, args.top)
+        if "error" in result:
+            print(f"{problem}: failed ({result['error']})")
+        else:
+            phases = ", ".join(f"{phase}={result[phase]:.3f}" for phase in PHASES)
+            slowest = ", ".join(f"{name} {seconds:.3f}" for name, seconds in result["top_imports"])
+            print(f"{problem}: total={result['total']:.3f}s ({phases}); slowest imports: {slowest}")
+        if args.output:
+            with open(args.output, 'a') as f:
+                f.write(json.dumps(dict(result, date=datetime.now().isoformat(timespec="seconds"))) + "\n")
+
+
+if __name__ == "__main__":
+    main()
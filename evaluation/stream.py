@@ -0,0 +1,133 @@
+"""Tasks that arrive while earlier ones are already being evaluated.
+
+Evaluators used to receive a whole generation at once, so no candidate
+could start until the slowest LLM response had arrived. Every evaluator's
+``iter_results`` now also accepts a :class:`TaskStream`. A producer thread
+puts each task in the stream as soon as its response is extracted and
+closes the stream when the batch is complete. The evaluator starts each
+task when a slot is free, and yields results until the stream is closed and
+every task is done::
+
+    stream = TaskStream()
+    threading.Thread(target=produce, args=(stream,)).start()  # put(...) each task, then close()
+    for result in evaluator.iter_results(stream):
+        ...
+
+``fileno()`` is readable while tasks are waiting or once the stream is
+closed. Evaluators add it to the descriptors they already wait on, so a new
+task wakes them up without polling.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from collections import deque
+from typing import TYPE_CHECKING, Callable, Iterable, Union
+
+if TYPE_CHECKING:
+    from .engine import EvaluationTask
+
+
+class TaskStream:
+    """Thread-safe queue of :class:`~evaluation.engine.EvaluationTask` with a wake-up descriptor.
+
+    Args:
+        tasks: Tasks available from the start.
+        closed: Whether more tasks may still be put.
+    """
+
+    def __init__(self, tasks: Iterable[EvaluationTask] = (), closed: bool = False) -> None:
+        self._tasks = deque(tasks)
+        self._closed = closed
+        self._lock = threading.Lock()
+        self._read_fd, self._write_fd = (None, None) if closed else os.pipe()
+        if self._read_fd is not None:
+            os.set_blocking(self._read_fd, False)
+
+    @classmethod
+    def of(cls, tasks: Union[TaskStream, Iterable[EvaluationTask]]) -> TaskStream:
+        """``tasks`` itself if it is a stream, otherwise a closed stream holding them."""
+        return tasks if isinstance(tasks, TaskStream) else cls(tasks, closed=True)
+
+    def put(self, task: EvaluationTask) -> None:
+        with self._lock:
+            if self._closed:
+                raise ValueError("put() on a closed TaskStream")
+            self._tasks.append(task)
+            os.write(self._write_fd, b"t")
+
+    def close(self) -> None:
+        """Signal that no more tasks will be put."""
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                os.write(self._write_fd, b"c")
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def finished(self) -> bool:
+        """Closed, and every task has been taken."""
+        with self._lock:
+            return self._closed and not self._tasks
+
+    def fileno(self) -> int:
+        """Descriptor to wait on while the stream is open; readable once tasks are waiting or it is closed."""
+        return self._read_fd
+
+    def drain(self) -> list[EvaluationTask]:
+        """Take every task that is waiting, without blocking."""
+        with self._lock:
+            tasks = list(self._tasks)
+            self._tasks.clear()
+            if self._read_fd is not None and not self._closed:
+                try:
+                    while os.read(self._read_fd, 4096):
+                        pass
+                except BlockingIOError:
+                    pass
+            return tasks
+
+    def __del__(self) -> None:
+        for fd in (self._read_fd, self._write_fd):
+            if fd is not None:
+                os.close(fd)
+
+
+class FilteredStream(TaskStream):
+    """View of a stream that passes on only the tasks for which ``keep(task)`` is true.
+
+    Evaluator wrappers use it to answer some tasks themselves (a cache hit, a
+    rejected candidate) and forward the others to the wrapped evaluator.
+    ``keep`` runs in the thread that iterates over the results.
+    """
+
+    def __init__(self, source: TaskStream, keep: Callable[[EvaluationTask], bool]) -> None:
+        self.source = source
+        self.keep = keep
+
+    def put(self, task: EvaluationTask) -> None:
+        raise TypeError("put() on a FilteredStream; put tasks in its source")
+
+    def close(self) -> None:
+        self.source.close()
+
+    @property
+    def closed(self) -> bool:
+        return self.source.closed
+
+    @property
+    def finished(self) -> bool:
+        return self.source.finished
+
+    def fileno(self) -> int:
+        return self.source.fileno()
+
+    def drain(self) -> list[EvaluationTask]:
+        return [task for task in self.source.drain() if self.keep(task)]
+
+    def __del__(self) -> None:
+        pass  # The source owns the descriptors
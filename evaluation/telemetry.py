@@ -0,0 +1,126 @@
+"""Resource usage of candidate evaluations.
+
+Every :class:`~evaluation.record.ResultRecord` carries a ``telemetry`` dict
+with these keys, all in seconds except ``peak_rss_mb``:
+
+- ``wall_time``: from dispatch to result, measured by the evaluator;
+- ``startup_time``: from dispatch to the first instance. For a one-shot run
+  this is interpreter start-up, imports and dataset loading. For a warm
+  worker it is loading the candidate, plus the worker's own start-up if it
+  had to be started first;
+- ``solve_time``: solving the instances;
+- ``heuristic_time``: inside the candidate heuristic, as bound by
+  ``set_heuristic`` with :func:`~evaluation.record.timed_heuristic`;
+- ``solver_time``: ``solve_time`` minus ``heuristic_time``, i.e. the
+  problem's own solver (``ACO.run``, ``guided_local_search``,
+  ``online_binpack``, ...);
+- ``cpu_time``: user plus system CPU time of the evaluation and its child
+  processes, including the pre-flight smoke run. Evaluators also record it
+  for runs they kill or that crash;
+- ``peak_rss_mb``: peak resident memory in MiB.
+- ``compile_time``, ``jit_nopython``, ``jit_object``, ``jit_python``: for
+  ``tsp_gls`` only, compiling the heuristic, and 1 for the mode it ran in, 0
+  for the others (see ``compile_heuristic`` in
+  ``baselines/reevo/gls_tsp_adapt/_evaluator_accelerate.py``). Averaged over
+  a generation, these give the share of heuristics that ran in each mode.
+
+Keys that could not be measured are missing.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from typing import Iterable, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def cpu_time_with_children() -> float:
+    """CPU time (user + system) used so far by the calling process and its waited-for children."""
+    if resource is None:
+        return 0.0
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+
+def reap_with_cpu_time(process) -> Optional[float]:
+    """Wait for ``process``, a :class:`subprocess.Popen` child of this process, and return its CPU time.
+
+    The time includes the children it waited for. Returns ``None`` if the child was already reaped.
+    """
+    if not hasattr(os, "wait4"):
+        process.wait()
+        return None
+    try:
+        _, status, usage = os.wait4(process.pid, 0)
+    except ChildProcessError:
+        process.wait()
+        return None
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return usage.ru_utime + usage.ru_stime
+
+
+def process_cpu_time(pid: int) -> Optional[float]:
+    """CPU time used so far by the live process ``pid`` and its waited-for children, from ``/proc`` (Linux only).
+
+    Evaluator workers are children of the multiprocessing fork server rather than of the evaluator, so it cannot
+    reap them with :func:`reap_with_cpu_time`. Returns ``None`` if the process is gone.
+    """
+    try:
+        with open(f"/proc/{pid}/stat", 'r') as f:
+            # Fields after the command name, which may contain spaces; utime, stime, cutime, cstime are 14 to 17
+            fields = f.read().rsplit(")", 1)[1].split()
+        return sum(int(value) for value in fields[11:15]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def reset_peak_rss() -> bool:
+    """Reset the kernel's peak RSS counter of the calling process (Linux only); return whether it worked."""
+    try:
+        with open("/proc/self/clear_refs", 'w') as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb() -> float:
+    """Peak resident memory in MiB of the calling process, or of its largest child.
+
+    Reads ``VmHWM`` where the kernel exposes it, so that :func:`reset_peak_rss`
+    is honoured, and falls back to ``getrusage``.
+    """
+    peak = 0.0
+    try:
+        with open("/proc/self/status", 'r') as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    peak = int(line.split()[1]) / 1024
+                    break
+    except OSError:
+        pass
+    if resource is not None:
+        # ru_maxrss is in KiB on Linux and in bytes on macOS
+        scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+        children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+        if not peak:
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+        peak = max(peak, children)
+    return peak
+
+
+def summarize(telemetries: Iterable[dict]) -> dict:
+    """Mean of every telemetry key over the evaluations that report it."""
+    totals: dict[str, list[float]] = {}
+    for telemetry in telemetries:
+        for key, value in telemetry.items():
+            totals.setdefault(key, []).append(value)
+    return {key: sum(values) / len(values) for key, values in totals.items()}
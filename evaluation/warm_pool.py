@@ -0,0 +1,386 @@
+"""Long-lived evaluator workers that keep the problem's evaluator warm.
+
+A one-shot ``python eval.py`` run pays for interpreter start-up, for importing
+torch/scipy/numba, and for loading the dataset before it evaluates anything.
+:class:`WarmWorkerPool` starts each worker once per problem. The worker
+imports the problem's ``eval.py`` and its solver, loads the training
+instances, and then evaluates one candidate after another. For each task it
+only loads the candidate's ``gpt.py`` and binds it with ``set_heuristic``.
+Tasks that share a parameterised template load the template once, and only
+bind their own parameter values (see :mod:`evaluation.parameterised`).
+
+Candidates on one worker must not influence each other. Each gets its own
+deep copy of the instances, so one that modifies its instance arrays in
+place leaves them intact for the next. The global random number generators
+are also reset before each task, to the state a fresh ``eval.py`` process
+would have: ``random`` and ``numpy`` are reseeded from the OS's entropy, and
+torch, which starts from a fixed seed, gets back its state from after the
+dataset was loaded.
+
+Workers are forked from a fork server that has already imported the
+problem's third-party dependencies. This keeps it cheap to replace a worker
+that was killed for exceeding the timeout.
+
+Every ``problems/<problem>/eval.py`` exposes the interface used here:
+
+- ``set_heuristic(module)`` binds the candidate heuristic found in ``module``;
+- ``load_instances(problem_size, mood)`` returns ``(dataset_path, instances)``;
+- ``solve(instance)`` returns the objective of one instance.
+"""
+
+from __future__ import annotations
+
+import ast
+import copy
+import importlib
+import importlib.util
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import random
+import sys
+import time
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+from typing import Iterator, Optional, Sequence, Union
+
+import numpy as np
+
+from .engine import (
+    WORKSPACE_DIR,
+    EvaluationResult,
+    EvaluationTask,
+    collect_in_order,
+    default_num_workers,
+    prepare_workspace,
+    result_from_record,
+)
+from .cpu_slots import CpuAllocator, CpuSlot, apply_cpu_slot
+from .limits import ResourceLimits, cpu_time_used, describe_exit, kill_process_group
+from .parameterised import bind_parameters, load_template
+from .record import InstanceTimeout, RaceLost, ResultRecord, report_objective, reset_record, solve_instances
+from .stream import TaskStream
+from .telemetry import cpu_time_with_children, peak_rss_mb, process_cpu_time, reset_peak_rss
+
+
+def _load_evaluator(root_dir: str, problem: str):
+    """Import ``problems/<problem>/eval.py`` with the problem directory on the path."""
+    problem_dir = f"{root_dir}/problems/{problem}"
+    sys.path[:0] = [problem_dir, root_dir]
+    return importlib.import_module("eval")
+
+
+def _load_candidate(workspace: str):
+    spec = importlib.util.spec_from_file_location("gpt", os.path.join(workspace, "gpt.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _candidate(workspace: str, template: Optional[str] = None, params: Optional[dict] = None):
+    """The candidate of a task: its template with its parameter values bound, or else its ``gpt.py``."""
+    if template is not None:
+        try:
+            return bind_parameters(load_template(template), params or {})
+        except ValueError:
+            pass  # The parameters are not all defaults of the template: run the code written out
+    return _load_candidate(workspace)
+
+
+def _evaluate(evaluator, instances, workspace: str, race=None, budget=None, dispatched_at=None,
+              template: Optional[str] = None, params: Optional[dict] = None,
+              fidelity: Optional[float] = None) -> ResultRecord:
+    """Evaluate one candidate, printing the same transcript as ``eval.py``."""
+    record = reset_record(race, budget, dispatched_at, fidelity)
+    try:
+        print("[*] Running ...")
+        evaluator.set_heuristic(_candidate(workspace, template, params))
+        objs = solve_instances(evaluator.solve, instances)
+        report_objective(float(np.mean(objs)))
+    except RaceLost as e:
+        record.failure = str(e)
+        print(record.failure)
+    except (Exception, SystemExit, InstanceTimeout):
+        # Neither a candidate calling sys.exit() nor an alarm landing outside its instance may take the worker down
+        record.failure = traceback.format_exc()
+        print(record.failure)
+    return record
+
+
+def _rng_state():
+    """State of torch's global generator, if torch is loaded; ``random`` and ``numpy`` are reseeded instead."""
+    torch = sys.modules.get("torch")
+    return torch.get_rng_state() if torch is not None else None
+
+
+def _reset_rngs(torch_state) -> None:
+    """Give the next candidate the global random number generators of a fresh ``eval.py`` process."""
+    random.seed()
+    np.random.seed()
+    if torch_state is not None:
+        sys.modules["torch"].set_rng_state(torch_state)
+
+
+def _worker_main(conn, root_dir: str, problem: str, problem_size: int, mood: str,
+                 limits: Optional[ResourceLimits] = None, slot: Optional[CpuSlot] = None) -> None:
+    """Worker loop: load the evaluator once, then serve tasks.
+
+    A task is ``(workspace, stdout_filepath, race, budget, dispatched_at,
+    template, params, fidelity)``, and is answered with the candidate's
+    :class:`~evaluation.record.ResultRecord`. The worker leads its own process
+    group so that the pool can kill it together with anything a candidate
+    forked. It keeps its CPU ``slot`` for its whole life.
+    """
+    if hasattr(os, "setsid"):
+        os.setsid()
+    limits = limits or ResourceLimits()
+    ResourceLimits(memory_mb=limits.memory_mb, max_processes=limits.max_processes).apply()
+    apply_cpu_slot(slot)
+    load_error = ""
+    try:
+        evaluator = _load_evaluator(root_dir, problem)
+        _, instances = evaluator.load_instances(problem_size, mood)
+    except Exception:
+        load_error = traceback.format_exc()
+    torch_state = _rng_state()
+    conn.send(None)  # Ready: start-up time does not count against the first candidate's timeout
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        workspace, stdout_filepath, race, budget, dispatched_at, template, params, fidelity = task
+        # Each candidate gets a fresh CPU budget on top of what the worker has used so far
+        ResourceLimits(cpu_seconds=limits.cpu_seconds).apply(cpu_offset=cpu_time_used())
+        cpu_before = cpu_time_with_children()
+        reset_peak_rss()
+        with open(stdout_filepath, 'w') as f, redirect_stdout(f), redirect_stderr(f):
+            if load_error:
+                print(load_error)
+                result = ResultRecord(failure=load_error)
+            else:
+                # A fresh copy of the instances and fresh generators: earlier candidates leave no trace
+                _reset_rngs(torch_state)
+                result = _evaluate(evaluator, copy.deepcopy(instances), workspace, race, budget, dispatched_at,
+                                   template, params, fidelity)
+        # Without a resettable counter (non-Linux), the peak is the worker's so far
+        result.telemetry.update(cpu_time=cpu_time_with_children() - cpu_before, peak_rss_mb=peak_rss_mb())
+        conn.send(result)
+
+
+def _preload_modules(problem_dir: str) -> list[str]:
+    """Third-party modules imported by the problem's Python files, for the fork server."""
+    local = {os.path.splitext(name)[0] for name in os.listdir(problem_dir) if name.endswith(".py")}
+    modules = set()
+    for name in os.listdir(problem_dir):
+        if not name.endswith(".py"):
+            continue
+        try:
+            with open(os.path.join(problem_dir, name)) as f:
+                tree = ast.parse(f.read())
+        except (OSError, SyntaxError):
+            continue
+        for node in tree.body:
+            if isinstance(node, ast.Import):
+                modules.update(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+                modules.add(node.module)
+    return sorted(m for m in modules if m.split('.')[0] not in local | {"gpt"})
+
+
+class _Worker:
+    def __init__(self, process, conn, slot: Optional[CpuSlot] = None) -> None:
+        self.process = process
+        self.conn = conn
+        self.slot = slot
+        self.task: Optional[EvaluationTask] = None
+        self.ready = False
+        self.started = 0.0
+        self.deadline = 0.0
+        self.cpu_at_dispatch: Optional[float] = None
+
+
+class WarmWorkerPool:
+    """Pool of per-problem evaluator workers with the dataset and solver resident.
+
+    Takes the same tasks as :class:`~evaluation.engine.EvaluationEngine` and
+    returns the same results. Workers are started on demand, up to
+    ``num_workers``, and live until :meth:`close`. A worker that exceeds the
+    timeout is killed, and a replacement is forked the next time one is
+    needed.
+
+    Args:
+        root_dir: Project root containing ``problems/``.
+        problem: Problem name, i.e. the directory under ``problems/``.
+        problem_size: Training instance size passed to ``load_instances``.
+        timeout: Wall-clock limit in seconds for one candidate.
+        num_workers: Maximum number of workers. Defaults to the number of CPUs.
+        mood: Dataset split the workers keep loaded.
+        workspace_dir: Directory under which per-candidate workspaces are created.
+        limits: CPU-time, memory and process-count caps. The CPU budget is
+            granted per candidate, the others hold for the whole worker.
+        cpu_allocator: Gives each worker a :class:`~evaluation.cpu_slots.CpuSlot`
+            that sizes its thread pools. Must have at least ``num_workers`` slots.
+    """
+
+    def __init__(self, root_dir: str, problem: str, problem_size: int, timeout: float = 50,
+                 num_workers: Optional[int] = None, mood: str = "train",
+                 workspace_dir: str = WORKSPACE_DIR, limits: Optional[ResourceLimits] = None,
+                 cpu_allocator: Optional[CpuAllocator] = None) -> None:
+        self.root_dir = root_dir
+        self.problem = problem
+        self.problem_size = problem_size
+        self.timeout = timeout
+        self.num_workers = max(1, int(num_workers)) if num_workers else default_num_workers()
+        self.mood = mood
+        self.workspace_dir = workspace_dir
+        self.limits = limits
+        self.cpu_allocator = cpu_allocator
+        self._workers: list[_Worker] = []
+
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            self._ctx = multiprocessing.get_context("forkserver")
+            self._ctx.set_forkserver_preload(
+                _preload_modules(f"{root_dir}/problems/{problem}") + [__name__])
+        else:
+            self._ctx = multiprocessing.get_context("spawn")
+
+    def _spawn(self) -> _Worker:
+        parent_conn, child_conn = self._ctx.Pipe()
+        slot = self.cpu_allocator.acquire() if self.cpu_allocator else None
+        process = self._ctx.Process(target=_worker_main, daemon=True,
+                                    args=(child_conn, self.root_dir, self.problem, self.problem_size, self.mood,
+                                          self.limits, slot))
+        process.start()
+        child_conn.close()
+        return _Worker(process, parent_conn, slot)
+
+    def _kill(self, worker: _Worker) -> None:
+        kill_process_group(worker.process.pid)
+        worker.process.kill()
+        worker.process.join()
+        worker.conn.close()
+        self._release(worker)
+        self._workers.remove(worker)
+
+    def _task_cpu_time(self, worker: _Worker) -> float:
+        """CPU time the worker has used on its task, for a task it cannot report itself.
+
+        A worker that has died is no longer in ``/proc``; its wall time on the task stands in.
+        """
+        now = process_cpu_time(worker.process.pid)
+        if now is None or worker.cpu_at_dispatch is None:
+            return time.monotonic() - worker.started
+        return now - worker.cpu_at_dispatch
+
+    def _release(self, worker: _Worker) -> None:
+        if worker.slot is not None:
+            self.cpu_allocator.release(worker.slot)
+            worker.slot = None
+
+    def _idle_worker(self) -> Optional[_Worker]:
+        for worker in self._workers:
+            if worker.task is None:
+                return worker
+        if len(self._workers) < self.num_workers:
+            worker = self._spawn()
+            self._workers.append(worker)
+            return worker
+        return None
+
+    def run(self, tasks: Sequence[EvaluationTask]) -> list[EvaluationResult]:
+        """Evaluate ``tasks`` on the warm workers; results are returned in task order."""
+        return collect_in_order(tasks, self.iter_results(tasks))
+
+    def iter_results(self, tasks: Union[Sequence[EvaluationTask], TaskStream]) -> Iterator[EvaluationResult]:
+        """Evaluate ``tasks`` on the warm workers, yielding each result as soon as it is ready.
+
+        ``tasks`` may be a :class:`~evaluation.stream.TaskStream` that is still being filled.
+        """
+        source = TaskStream.of(tasks)
+        pending = []
+        try:
+            while pending or any(worker.task is not None for worker in self._workers) or not source.finished:
+                pending.extend(source.drain())
+                # Hand out tasks to idle workers
+                while pending:
+                    worker = self._idle_worker()
+                    if worker is None:
+                        break
+                    task = pending.pop(0)
+                    try:
+                        workspace = prepare_workspace(self.workspace_dir, task)
+                        worker.conn.send((os.path.abspath(workspace), os.path.abspath(task.stdout_filepath),
+                                          task.race, task.budget, time.time(), task.template, task.params,
+                                          task.fidelity))
+                    except Exception as e:
+                        logging.info(f"Error for response_id {task.response_id}: {e}")
+                        yield EvaluationResult(task, traceback_msg=str(e))
+                        continue
+                    worker.task = task
+                    worker.started = time.monotonic()
+                    worker.cpu_at_dispatch = process_cpu_time(worker.process.pid)
+                    # A starting worker gets one timeout to load, then another once it reports ready
+                    worker.deadline = worker.started + self.timeout
+
+                busy = [worker for worker in self._workers if worker.task is not None]
+                # Wake up for new tasks while the stream is open
+                waitables = [worker.conn for worker in busy] + ([] if source.closed else [source])
+                if not waitables:
+                    continue
+                wait_for = max(0.0, min(worker.deadline for worker in busy) - time.monotonic()) if busy else None
+                ready = multiprocessing.connection.wait(waitables, timeout=wait_for)
+
+                for worker in busy:
+                    task = worker.task
+                    if worker.conn in ready:
+                        try:
+                            message = worker.conn.recv()
+                        except (EOFError, OSError):
+                            cpu_time = self._task_cpu_time(worker)
+                            self._kill(worker)
+                            message = ResultRecord(failure=describe_exit(worker.process.exitcode),
+                                                   telemetry={"cpu_time": cpu_time})
+                        if message is None:  # Worker finished loading; the task's clock starts now
+                            worker.ready = True
+                            worker.deadline = time.monotonic() + self.timeout
+                            continue
+                        result = result_from_record(task, message)
+                        result.telemetry["wall_time"] = time.monotonic() - worker.started
+                        status = "successful" if result.success else \
+                            "stopped early" if result.stopped_early else "execution error"
+                        logging.info(f"Code Run {task.response_id} {status}!")
+                        worker.task = None
+                        yield result
+                    elif time.monotonic() >= worker.deadline:
+                        traceback_msg = f"Evaluation timed out after {self.timeout} seconds"
+                        logging.info(f"Error for response_id {task.response_id}: {traceback_msg}")
+                        cpu_time = self._task_cpu_time(worker)
+                        self._kill(worker)
+                        yield EvaluationResult(task, traceback_msg=traceback_msg, timed_out=True,
+                                               telemetry={"wall_time": time.monotonic() - worker.started,
+                                                          "cpu_time": cpu_time})
+        finally:
+            # Only reached with busy workers if the caller stopped iterating early
+            for worker in [worker for worker in self._workers if worker.task is not None]:
+                self._kill(worker)
+
+    def close(self) -> None:
+        """Stop all workers."""
+        for worker in list(self._workers):
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            worker.process.join(timeout=1)
+            if worker.process.is_alive():
+                kill_process_group(worker.process.pid)
+                worker.process.kill()
+                worker.process.join()
+            worker.conn.close()
+            self._release(worker)
+        self._workers = []
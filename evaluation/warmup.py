@@ -0,0 +1,99 @@
+"""Pre-compile the numba kernels of the GLS evaluators into their on-disk caches.
+
+Usage::
+
+    python -m evaluation.warmup [target ...]
+
+The kernels of ``problems/tsp_gls/gls.py`` and of the GLS helpers in
+``baselines/*/gls_tsp_adapt/tsp_eval_helper`` are decorated with
+``cache=True``: numba writes the machine code of each kernel to
+``__pycache__`` next to its source (or under ``NUMBA_CACHE_DIR``), and every
+later process loads it instead of compiling again. Writers replace the cache
+files atomically, so concurrent evaluations that compile the same kernel at
+once never read a partial file. The cache is invalidated when the kernel's
+source changes.
+
+Kernels are compiled for the argument types of their first call. Each target
+therefore runs its solver once on a small instance with the types of the
+real ones:
+
+- ``sandbox``: the GLS sandbox that scores ``tsp_gls`` candidates
+  (:class:`~evaluation.sandbox.SandboxEvaluator` runs it first);
+- ``eoh``: the copy of the GLS helpers used by the EoH baseline;
+- ``tsp_gls``: the solver of ``problems/tsp_gls/eval.py``.
+
+The heuristic of each candidate is still compiled in its own evaluation.
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import os
+import sys
+import time
+from typing import Optional
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _penalise_used_edges(edge_distance, local_opt_tour, edge_n_used):
+    return edge_distance * (1 + edge_n_used)
+
+
+def _warm_gls_helper(package: str) -> None:
+    """Run the GLS of ``package`` (a ``tsp_eval_helper``) once on the smallest shipped instance."""
+    gls_run = importlib.import_module(f"{package}.gls_run")
+    read_tsp_random = importlib.import_module(f"{package}.readTSPRandom")
+    instance_path = os.path.join(os.path.dirname(gls_run.__file__), "instance", "TSP20.pkl")
+    coords, instances, opt_costs = read_tsp_random.read_instance_all(instance_path)
+    gap = gls_run.solve_instance(0, opt_costs[0], instances[0], coords[0], time_limit=10, ite_max=2,
+                                 perturbation_moves=1, heuristic_func=_penalise_used_edges)
+    if gap is None:
+        raise RuntimeError(f"Warm-up run of {package}.gls_run.solve_instance failed")
+
+
+def _warm_tsp_gls() -> None:
+    """Import ``problems/tsp_gls/gls.py``, whose kernels are compiled eagerly for their declared signatures."""
+    sys.path.insert(0, f"{ROOT_DIR}/problems/tsp_gls")
+    try:
+        importlib.import_module("gls")
+    finally:
+        sys.path.remove(f"{ROOT_DIR}/problems/tsp_gls")
+
+
+TARGETS = {
+    "sandbox": lambda: _warm_gls_helper("baselines.reevo.gls_tsp_adapt.tsp_eval_helper"),
+    "eoh": lambda: _warm_gls_helper("baselines.eoh.gls_tsp_adapt.tsp_eval_helper"),
+    "tsp_gls": _warm_tsp_gls,
+}
+
+
+def warm_up(targets=tuple(TARGETS)) -> dict[str, float]:
+    """Compile (or load) the kernels of ``targets``; return the seconds each took."""
+    if ROOT_DIR not in sys.path:
+        sys.path.insert(0, ROOT_DIR)
+    seconds = {}
+    for target in targets:
+        start = time.perf_counter()
+        TARGETS[target]()
+        seconds[target] = time.perf_counter() - start
+    return seconds
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Pre-compile the numba kernels of the GLS evaluators.")
+    parser.add_argument("targets", nargs="*", default=list(TARGETS),
+                        help=f"kernels to compile, among {', '.join(TARGETS)} (default: all)")
+    args = parser.parse_args(argv)
+    unknown = [target for target in args.targets if target not in TARGETS]
+    if unknown:
+        parser.error(f"unknown target(s): {', '.join(unknown)}")
+    for target, seconds in warm_up(args.targets).items():
+        print(f"{target}: ready in {seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,32 @@
-import subprocess
 import numpy as np
+import hashlib
 import json
+import pickle
+import random
+import threading
+import time
 import tiktoken
 from datetime import datetime
 from utils.utils import *
-from baselines.reevo.gls_tsp_adapt.gls_tsp_eval import Sandbox
+from evaluation import EvaluationTask, InstanceBudget, Race, TaskStream, make_evaluator, normalize_code
+from evaluation.telemetry import summarize
+from utils.surrogate import HarmonySurrogate
+
+CHECKPOINT_FILENAME = "checkpoint.pkl"
+
+# Attributes that change during a run; everything else is rebuilt from the config
+CHECKPOINT_STATE = (
+    "generation", "iteration", "function_evals", "prompt_tokens", "completion_tokens", "eval_cpu_time", "mutation_rate",
+    "population", "seed_ind", "elitist", "best_obj_overall", "best_code_overall", "best_code_path_overall",
+    "long_term_reflection_str", "str_comprehensive_memory", "str_flash_memory",
+    "lst_good_reflection", "lst_bad_reflection", "local_sel_hs", "hs_memory",
+    "print_crossover_prompt", "print_mutate_prompt", "print_flash_reflection_prompt",
+    "print_comprehensive_reflection_prompt", "print_hs_prompt",
+)
+
+
+class BudgetExhausted(Exception):
+    """Raised between stages of a generation once any budget of the run is used up."""
 
 
 class HSEvo:
@@ -13,10 +35,14 @@ class HSEvo:
         self.root_dir = root_dir
 
         self.mutation_rate = cfg.mutation_rate
+        self.generation = 0
         self.iteration = 0
         self.function_evals = 0
         self.prompt_tokens = 0
         self.completion_tokens = 0
+        self.eval_cpu_time = 0.0  # CPU seconds spent by the evaluator on candidates
+        self.wall_time_before = 0.0  # Wall time of the run before it was resumed
+        self.start_time = time.monotonic()
         self.elitist = None
         self.best_obj_overall = float("inf")
         self.long_term_reflection_str = ""
@@ -25,6 +51,7 @@ class HSEvo:
         self.best_code_path_overall = None
         self.lst_good_reflection = []
         self.lst_bad_reflection = []
+        self.hs_memory = {}  # Best harmonies found for each parameterised function, see hs_memory_key
 
         self.problem = self.cfg.problem.problem_name
         self.problem_desc = self.cfg.problem.description
@@ -39,6 +66,8 @@ class HSEvo:
 
         self.prompt_dir = f"{self.root_dir}/prompts"
         self.output_file = f"{self.root_dir}/problems/{self.problem}/gpt.py"
+        # Backend from eval_backend, wrapped in the pre-flight screen and the fitness cache
+        self.evaluator = make_evaluator(self.cfg, self.root_dir)
 
         # Loading all text prompts
         # Problem-specific prompt components
@@ -94,7 +123,84 @@ class HSEvo:
         _cur_file_ = os.path.dirname(__file__)
         _cur_timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
 
-        self.init_population()
+        if not (self.cfg.get("resume", False) and self.load_checkpoint()):
+            self.init_population()
+            self.save_checkpoint()
+
+    def save_checkpoint(self) -> None:
+        """
+        Atomically write the run state and the RNG states to the output directory
+        """
+        if not self.cfg.get("checkpoint", True):
+            return
+        state = {name: getattr(self, name) for name in CHECKPOINT_STATE if hasattr(self, name)}
+        state["wall_time"] = self.wall_time()
+        state["np_random_state"] = np.random.get_state()
+        state["random_state"] = random.getstate()
+        tmp_path = f"{CHECKPOINT_FILENAME}.tmp"
+        with open(tmp_path, 'wb') as file:
+            pickle.dump(state, file)
+            file.flush()
+            os.fsync(file.fileno())
+        # A crash leaves either the previous checkpoint or this one, never a partial file
+        os.replace(tmp_path, CHECKPOINT_FILENAME)
+
+    def load_checkpoint(self) -> bool:
+        """
+        Restore the state saved by the last completed generation, if there is one
+        """
+        if not os.path.exists(CHECKPOINT_FILENAME):
+            logging.info(f"No checkpoint in {os.getcwd()}, starting a new run.")
+            return False
+        with open(CHECKPOINT_FILENAME, 'rb') as file:
+            state = pickle.load(file)
+        np.random.set_state(state.pop("np_random_state"))
+        random.setstate(state.pop("random_state"))
+        self.wall_time_before = state.pop("wall_time", 0.0)
+        self.start_time = time.monotonic()
+        for name, value in state.items():
+            setattr(self, name, value)
+        # Metrics of the interrupted iteration are written again
+        for file_name in os.listdir():
+            match = re.fullmatch(r"metrics_iter(\d+)\.jsonl", file_name)
+            if match and int(match.group(1)) >= self.iteration:
+                os.remove(file_name)
+        logging.info(f"Resumed from checkpoint after generation {self.generation} "
+                     f"(iteration={self.iteration}, function_evals={self.function_evals:g}, "
+                     f"best_obj={self.best_obj_overall}).")
+        return True
+
+    def wall_time(self) -> float:
+        """Seconds since the run started, including the time before it was resumed."""
+        return self.wall_time_before + time.monotonic() - self.start_time
+
+    def budget_usage(self) -> list[tuple[str, float, float]]:
+        """
+        (name, used, limit) of every budget; a limit of None means unlimited
+        """
+        return [
+            ("function_evals", self.function_evals, self.cfg.max_fe),
+            ("wall_time", self.wall_time(), self.cfg.get("max_wall_time")),
+            ("prompt_tokens", self.prompt_tokens, self.cfg.get("max_prompt_tokens")),
+            ("completion_tokens", self.completion_tokens, self.cfg.get("max_completion_tokens")),
+            ("eval_cpu_time", self.eval_cpu_time, self.cfg.get("max_eval_cpu_time")),
+        ]
+
+    def check_budget(self, mid_generation: bool = False) -> None:
+        """
+        Raise BudgetExhausted if any budget is used up. Within a generation, max_fe is not checked: like the original
+        protocol, a generation that starts under max_fe runs to its end
+        """
+        for name, used, limit in self.budget_usage():
+            if mid_generation and name == "function_evals":
+                continue
+            if limit is not None and used >= limit:
+                raise BudgetExhausted(f"{name} budget exhausted ({used:g} of {limit:g})")
+
+    def log_budget_usage(self) -> None:
+        usage = [f"{name}={used:g}" + (f"/{limit:g} ({100 * used / limit:.1f}%)" if limit else "")
+                 for name, used, limit in self.budget_usage()]
+        logging.info("Budget used: " + ", ".join(usage))
 
     def cal_usage_LLM(self, lst_prompt, lst_completion, encoding_name="cl100k_base"):
         """Returns the number of tokens in a text string."""
@@ -156,16 +262,8 @@ class HSEvo:
             with open(file_name, 'w') as file:
                 file.writelines(json.dumps(pre_messages))
 
-        responses = multi_chat_completion(messages_lst, 1, self.cfg.model, self.cfg.temperature + 0.3,
-                                          self.cfg.max_tokens, self.cfg.enable_thinking)
-        self.cal_usage_LLM(messages_lst, responses)
-        '''responses = multi_chat_completion([messages], self.cfg.init_pop_size, self.cfg.model,
-                                          self.cfg.temperature + 0.3)  # Increase the temperature for diverse initial population'''
-        population = [self.response_to_individual(response, response_id) for response_id, response in
-                      enumerate(responses)]
-
-        # Run code and evaluate population
-        population = self.evaluate_population(population)
+        # Generate responses and evaluate population
+        population = self.generate_population(messages_lst, 1, self.cfg.temperature + 0.3)
 
         # Update iteration
         self.population = population
@@ -203,6 +301,41 @@ class HSEvo:
         individual["traceback_msg"] = traceback_msg
         return individual
 
+    def race(self):
+        """
+        Early-stopping rule for new candidates: stop once their running mean is worse than the elitist by the margin.
+        """
+        if not self.cfg.get("racing", False) or self.elitist is None:
+            return None
+        best = self.elitist["obj"]
+        return Race(bound=best + self.cfg.get("racing_margin", 0.1) * abs(best), maximize=self.obj_type == "max",
+                    min_instances=self.cfg.get("racing_min_instances", 3))
+
+    def instance_budget(self):
+        """
+        Per-instance time limit: instances over it are interrupted and scored with a penalty instead of failing the run.
+        """
+        if self.cfg.get("instance_timeout") is None:
+            return None
+        return InstanceBudget(seconds=self.cfg.instance_timeout, penalty=self.cfg.get("instance_timeout_penalty", 1.0),
+                              maximize=self.obj_type == "max")
+
+    def save_metrics(self, individual: dict, result) -> None:
+        """
+        Append the outcome and resource telemetry of one evaluation to this iteration's metrics file.
+        """
+        metrics = {
+            "response_id": individual["response_id"],
+            "code_path": individual["code_path"],
+            "obj": individual["obj"] if individual["exec_success"] else None,
+            "exec_success": individual["exec_success"],
+            "timed_out": result.timed_out,
+            "timed_out_instances": result.timed_out_instances,
+            **result.telemetry,
+        }
+        with open(f"metrics_iter{self.iteration}.jsonl", 'a') as file:
+            file.write(json.dumps(metrics) + '\n')
+
     def save_log_population(self, population: list[dict], logHS=False):
         objs = [individual["obj"] for individual in population]
 
@@ -216,112 +349,115 @@ class HSEvo:
                 file.writelines("\n".join(map(str, objs + [self.local_sel_hs])) + '\n')
 
 
-    def evaluate_population(self, population: list[dict], hs_try_idx: int = None) -> list[dict]:
+    def evaluate_population(self, population: list[dict], hs_try_idx: int = None, template: str = None,
+                            params: list[dict] = None, fidelity: float = None) -> list[dict]:
+        """
+        Evaluate population by running code in parallel and computing objective values. Harmonies are evaluated
+        as the parameterised template they share, with the parameter values of each, and possibly at low fidelity.
+        """
+        race = self.race()
+        tasks = [self.prepare_evaluation(population, response_id, race, fidelity)
+                 for response_id in range(len(population))]
+        tasks = [task for task in tasks if task is not None]
+        for task in tasks:
+            if template is not None:
+                task.template, task.params = template, params[task.response_id]
+        return self.collect_evaluations(population, tasks)
+
+    def prepare_evaluation(self, population: list[dict], response_id: int, race,
+                           fidelity: float = None) -> EvaluationTask:
         """
-        Evaluate population by running code in parallel and computing objective values.
+        Count one function evaluation, or its fraction at low fidelity, and return the evaluation task of an
+        individual, or None if its response is invalid.
         """
-        inner_runs = []
+        self.function_evals += fidelity or 1
+        # Skip if response is invalid
+        if population[response_id]["code"] is None:
+            population[response_id] = self.mark_invalid_individual(population[response_id], "Invalid response!")
+            return None
 
-        # Run code to evaluate
-        for response_id in range(len(population)):
-            self.function_evals += 1
-            # Skip if response is invalid
-            if population[response_id]["code"] is None:
-                population[response_id] = self.mark_invalid_individual(population[response_id], "Invalid response!")
-                inner_runs.append(None)
-                continue
+        logging.info(f"Iteration {self.iteration}: Running Code {response_id}")
 
-            logging.info(f"Iteration {self.iteration}: Running Code {response_id}")
-
-            if self.problem == 'tsp_gls':
-                try:
-                    # Use sandboxed execution for 'tsp_gls'
-                    sandbox = Sandbox()
-                    result, run_ok = sandbox.run(population[response_id]['code'])
-                    inner_runs.append((result, run_ok))
-                except Exception as e:  # If sandbox execution fails
-                    logging.info(f"Error for response_id {response_id}: {e}")
-                    population[response_id] = self.mark_invalid_individual(population[response_id], str(e))
-                    inner_runs.append(None)
-            else:
-                try:
-                    # Use default code execution for other problems
-                    process = self._run_code(population[response_id], response_id)
-                    inner_runs.append(process)
-                except Exception as e:  # If code execution fails
-                    logging.info(f"Error for response_id {response_id}: {e}")
-                    population[response_id] = self.mark_invalid_individual(population[response_id], str(e))
-                    inner_runs.append(None)
-
-        # Update population with objective values
-        for response_id, inner_run in enumerate(inner_runs):
-            if inner_run is None:  # If code execution fails, skip
-                continue
+        individual = population[response_id]
+        return EvaluationTask(individual["code"], individual["stdout_filepath"], response_id, race,
+                              self.instance_budget(), fidelity=fidelity)
 
-            individual = population[response_id]
-
-            if self.problem == 'tsp_gls':
-                result, run_ok = inner_run
-                if run_ok:
-                    try:
-                        individual["obj"] = float(result) if self.obj_type == "min" else -float(result)
-                        individual["exec_success"] = True
-                    except:
-                        population[response_id] = self.mark_invalid_individual(population[response_id],
-                                                                               "Invalid objective value!")
-                else:
-                    population[response_id] = self.mark_invalid_individual(population[response_id],
-                                                                           "Sandbox execution failed!")
+    def collect_evaluations(self, population: list[dict], tasks) -> list[dict]:
+        """
+        Evaluate tasks (a list, or a TaskStream still being filled) and store the results in the population.
+        """
+        # Evaluate every candidate concurrently, each in its own workspace, handling results as they complete
+        telemetries = []
+        for result in self.evaluator.iter_results(tasks):
+            response_id = result.task.response_id
+            if result.success:
+                population[response_id]["obj"] = result.obj if self.obj_type == "min" else -result.obj
+                population[response_id]["exec_success"] = True
+                population[response_id]["timed_out_instances"] = result.timed_out_instances
+                if result.timed_out_instances:
+                    logging.info(f"Iteration {self.iteration}: Code Run {response_id} timed out on instances "
+                                 f"{result.timed_out_instances}, scored with a penalty")
             else:
-                try:
-                    inner_run.communicate(timeout=self.cfg.timeout)  # Wait for code execution to finish
-                except subprocess.TimeoutExpired as e:
-                    logging.info(f"Error for response_id {response_id}: {e}")
-                    population[response_id] = self.mark_invalid_individual(population[response_id], str(e))
-                    inner_run.kill()
-                    continue
-
-                stdout_filepath = individual["stdout_filepath"]
-                with open(stdout_filepath, 'r') as f:  # read the stdout file
-                    stdout_str = f.read()
-                traceback_msg = filter_traceback(stdout_str)
-
-                if traceback_msg == '':  # If execution has no error
-                    try:
-                        individual["obj"] = float(stdout_str.split('\n')[-2]) if self.obj_type == "min" else -float(
-                            stdout_str.split('\n')[-2])
-                        individual["exec_success"] = True
-                    except:
-                        population[response_id] = self.mark_invalid_individual(population[response_id],
-                                                                               "Invalid std out / objective value!")
-                else:  # Otherwise, also provide execution traceback error feedback
-                    population[response_id] = self.mark_invalid_individual(population[response_id], traceback_msg)
+                population[response_id] = self.mark_invalid_individual(population[response_id],
+                                                                       result.traceback_msg)
+            population[response_id]["telemetry"] = result.telemetry
+            self.eval_cpu_time += result.telemetry.get("cpu_time", 0.0)
+            self.save_metrics(population[response_id], result)
+            if result.telemetry:
+                telemetries.append(result.telemetry)
 
         # Log after all population is evaluated
-        valid_objs = [ind["obj"] for ind in population if ind["exec_success"]]
+        valid_objs = [ind["obj"] for ind in population if ind is not None and ind["exec_success"]]
         best_obj = min(valid_objs) if valid_objs else float("inf")
-        logging.info(f"Eval={self.function_evals}, TokenIn={self.prompt_tokens}, TokenOut={self.completion_tokens}, MaxObj={best_obj}")
+        logging.info(f"Eval={self.function_evals:g}, TokenIn={self.prompt_tokens}, TokenOut={self.completion_tokens}, MaxObj={best_obj}")
+        if telemetries:
+            mean = summarize(telemetries)
+            logging.info(f"Telemetry (mean of {len(telemetries)}): " +
+                         ", ".join(f"{key}={value:.3f}" for key, value in mean.items()))
 
         return population
 
-    def _run_code(self, individual: dict, response_id) -> subprocess.Popen:
+    def generate_population(self, messages_lst: list, n: int, temperature: float) -> list[dict]:
         """
-        Write code into a file and run eval script.
+        Query the LLM and evaluate the individuals of its responses. In pipeline mode, each response is
+        evaluated as soon as it arrives, while the slower ones are still being generated.
         """
-        logging.debug(f"Iteration {self.iteration}: Processing Code Run {response_id}")
-
-        with open(self.output_file, 'w') as file:
-            file.writelines(individual["code"] + '\n')
-
-        # Execute the python file with flags
-        with open(individual["stdout_filepath"], 'w') as f:
-            eval_file_path = f'{self.root_dir}/problems/{self.problem}/eval.py' if self.problem_type != "black_box" else f'{self.root_dir}/problems/{self.problem}/eval_black_box.py'
-            process = subprocess.Popen(['python', '-u', eval_file_path, f'{self.problem_size}', self.root_dir, "train"],
-                                       stdout=f, stderr=f)
-
-        block_until_running(individual["stdout_filepath"], log_status=True, iter_num=self.iteration,
-                            response_id=response_id)
-        return process
+        if not self.cfg.get("pipeline", True):
+            responses = multi_chat_completion(messages_lst, n, self.cfg.model, temperature,
+                                              self.cfg.max_tokens, self.cfg.enable_thinking)
+            self.cal_usage_LLM(messages_lst, responses)
+            population = [self.response_to_individual(response, response_id) for response_id, response in
+                          enumerate(responses)]
+            return self.evaluate_population(population)
+
+        race = self.race()
+        responses = [None] * (len(messages_lst) * n)
+        population = [None] * len(responses)
+        stream = TaskStream()
+        errors = []
+
+        def generate():
+            try:
+                for response_id, response in iter_chat_completion(messages_lst, n, self.cfg.model, temperature,
+                                                                  self.cfg.max_tokens, self.cfg.enable_thinking):
+                    responses[response_id] = response
+                    population[response_id] = self.response_to_individual(response, response_id)
+                    task = self.prepare_evaluation(population, response_id, race)
+                    if task is not None:
+                        stream.put(task)
+                self.cal_usage_LLM(messages_lst, [response for response in responses if response is not None])
+            except BaseException as e:  # Re-raised in the main thread
+                errors.append(e)
+            finally:
+                stream.close()
+
+        generator = threading.Thread(target=generate, daemon=True)
+        generator.start()
+        self.collect_evaluations(population, stream)
+        generator.join()
+        if errors:
+            raise errors[0]
+        return [individual for individual in population if individual is not None]
 
     def update_iter(self) -> None:
         """
@@ -508,12 +644,8 @@ class HSEvo:
                 logging.info("Crossover Prompt: \nSystem Prompt: \n" + system + "\nUser Prompt: \n" + user)
                 self.print_crossover_prompt = False
 
-        # Asynchronously generate responses
-        response_lst = multi_chat_completion(messages_lst, 1, self.cfg.model, self.cfg.temperature,
-                                             self.cfg.max_tokens, self.cfg.enable_thinking)
-        self.cal_usage_LLM(messages_lst, response_lst)
-        crossed_population = [self.response_to_individual(response, response_id) for response_id, response in
-                              enumerate(response_lst)]
+        # Asynchronously generate responses, evaluating each one as it arrives
+        crossed_population = self.generate_population(messages_lst, 1, self.cfg.temperature)
 
         assert len(crossed_population) == self.cfg.pop_size
         return crossed_population
@@ -549,12 +681,8 @@ class HSEvo:
             logging.info("Mutation Prompt: \nSystem Prompt: \n" + system + "\nUser Prompt: \n" + user)
             self.print_mutate_prompt = False
 
-        responses = multi_chat_completion([messages], int(self.cfg.pop_size * self.mutation_rate), self.cfg.model,
-                                          self.cfg.temperature, self.cfg.max_tokens, self.cfg.enable_thinking)
-        self.cal_usage_LLM([messages], responses)
-        population = [self.response_to_individual(response, response_id) for response_id, response in
-                      enumerate(responses)]
-        return population
+        return self.generate_population([messages], int(self.cfg.pop_size * self.mutation_rate),
+                                        self.cfg.temperature)
 
     def sel_individual_hs(self):
         candidate_hs = [individual for individual in self.population if individual["tryHS"] is False]
@@ -571,18 +699,51 @@ class HSEvo:
             harmony_memory[:, i] = np.random.uniform(lower_bound, upper_bound, self.cfg.hm_size)
         return harmony_memory
 
+    def hs_memory_key(self, func_block, parameter_ranges, fidelity=None) -> str:
+        """
+        Structural fingerprint of a parameterised function: its code without comments, docstrings or formatting, the
+        names of its parameters, and the fidelity its harmonies are scored at. The ranges are left out, so that a
+        search with other bounds still recalls the harmonies that lie within them.
+        """
+        payload = json.dumps([normalize_code(func_block), sorted(parameter_ranges), fidelity])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def recall_harmonies(self, key, parameter_ranges) -> list[tuple[list[float], dict]]:
+        """
+        The best harmonies of earlier searches on the function of key that lie within parameter_ranges, best first, as
+        (harmony, individual) pairs. Harmonies outside the current ranges are dropped rather than clipped: their
+        objectives hold only for their own values.
+        """
+        recalled = [([params[name] for name in parameter_ranges], dict(individual))
+                    for params, individual in self.hs_memory.get(key, [])]
+        bounds = list(parameter_ranges.values())
+        return [(harmony, individual) for harmony, individual in recalled
+                if all(lower <= value <= upper for value, (lower, upper) in zip(harmony, bounds))][:self.cfg.hm_size]
+
+    def remember_harmonies(self, key, parameter_ranges, harmony_memory, population_hs) -> None:
+        """
+        Keep the hm_size best distinct harmonies found so far for the function of key, with their individuals.
+        """
+        entries = self.hs_memory.get(key, []) + [
+            (dict(zip(parameter_ranges, map(float, harmony))), dict(individual))
+            for harmony, individual in zip(harmony_memory, population_hs) if individual["exec_success"]]
+        best = {}
+        for params, individual in sorted(entries, key=lambda entry: entry[1]["obj"]):
+            best.setdefault(tuple(sorted(params.items())), (params, individual))
+        self.hs_memory[key] = list(best.values())[:self.cfg.hm_size]
+
     def responses_to_population(self, responses, try_hs_idx=None) -> list[dict]:
         """
         Convert responses to population. Applied to the initial population.
         """
         population = []
         for response_id, response in enumerate(responses):
-            filename = None if try_hs_idx is None else f"problem_iter{self.iteration}_hs{try_hs_idx}"
+            filename = None if try_hs_idx is None else f"problem_iter{self.iteration}_hs{try_hs_idx + response_id}"
             individual = self.response_to_individual(response, response_id, filename)
             population.append(individual)
         return population
 
-    def create_population_hs(self, str_code, parameter_ranges, harmony_memory, try_hs_idx=None):
+    def create_population_hs(self, str_code, parameter_ranges, harmony_memory, try_hs_idx=None, fidelity=None):
         str_create_pop = []
         for i in range(len(harmony_memory)):
             tmp_str = str_code
@@ -593,7 +754,13 @@ class HSEvo:
             str_create_pop.append("```python\n" + tmp_str + "\n```")
 
         population_hs = self.responses_to_population(str_create_pop, try_hs_idx)
-        return self.evaluate_population(population_hs, try_hs_idx)
+        # The same code with any valid defaults, to which evaluators can bind the values of each harmony
+        template = str_code
+        for name, bounds in parameter_ranges.items():
+            template = template.replace('{' + name + '}', str((bounds[0] + bounds[1]) / 2))
+        template = extract_code_from_generator("```python\n" + template + "\n```")
+        params = [dict(zip(parameter_ranges, map(float, harmony))) for harmony in harmony_memory]
+        return self.evaluate_population(population_hs, try_hs_idx, template, params, fidelity)
 
     def find_best_obj(self, population_hs):
         objs = [individual["obj"] for individual in population_hs]
@@ -612,16 +779,33 @@ class HSEvo:
                 new_harmony[i] = np.random.uniform(bounds[i][0], bounds[i][1])
         return new_harmony
 
-    def update_harmony_memory(self, population_hs, harmony_memory, new_harmony, func_block, parameter_ranges,
-                              try_hs_idx):
-        objs = [individual["obj"] for individual in population_hs]
-        worst_index = np.argmax(np.array(objs))
-
-        new_individual = self.create_population_hs(func_block, parameter_ranges, [new_harmony.tolist()], try_hs_idx)[0]
+    def propose_harmonies(self, harmony_memory, bounds, n, surrogate=None):
+        """
+        Draw n new harmonies. With a surrogate, draw hs_surrogate_pool times as many and keep the n most promising.
+        """
+        if surrogate is None:
+            return [self.create_new_harmony(harmony_memory, bounds) for _ in range(n)]
+        pool_size = n * max(1, int(self.cfg.get("hs_surrogate_pool", 20)))
+        return surrogate.select([self.create_new_harmony(harmony_memory, bounds) for _ in range(pool_size)], n)
 
-        if new_individual['obj'] < population_hs[worst_index]['obj']:
-            population_hs[worst_index] = new_individual
-            harmony_memory[worst_index] = new_harmony
+    def update_harmony_memory(self, population_hs, harmony_memory, new_harmonies, func_block, parameter_ranges,
+                              try_hs_idx, surrogate=None, fidelity=None):
+        """
+        Evaluate a batch of new harmonies concurrently, then let each, best first, replace the worst member of the
+        harmony memory if it is better.
+        """
+        new_population = self.create_population_hs(func_block, parameter_ranges,
+                                                   [new_harmony.tolist() for new_harmony in new_harmonies], try_hs_idx,
+                                                   fidelity)
+        if surrogate is not None:
+            surrogate.observe(new_harmonies, [individual["obj"] for individual in new_population])
+
+        for new_id in np.argsort([individual["obj"] for individual in new_population], kind="stable"):
+            objs = [individual["obj"] for individual in population_hs]
+            worst_index = np.argmax(np.array(objs))
+            if new_population[new_id]['obj'] < population_hs[worst_index]['obj']:
+                population_hs[worst_index] = new_population[new_id]
+                harmony_memory[worst_index] = new_harmonies[new_id]
         return population_hs, harmony_memory
 
     def harmony_search(self):
@@ -649,13 +833,27 @@ class HSEvo:
             return None
         bounds = [value for value in parameter_ranges.values()]
 
+        # Harmonies can be scored at low fidelity, and only the best of them again at full fidelity at the end
+        fidelity = self.cfg.get("hs_low_fidelity")
+        fidelity = fidelity if fidelity and fidelity < 1 else None
+
+        # A function tuned before in this run starts from its best harmonies, whose objectives are known
+        hs_memory_key = self.hs_memory_key(func_block, parameter_ranges, fidelity)
+        known = self.recall_harmonies(hs_memory_key, parameter_ranges) if self.cfg.get("hs_memory", False) else []
+
         harmony_memory = self.initialize_harmony_memory(bounds)
-        population_hs = self.create_population_hs(func_block, parameter_ranges, harmony_memory)
+        for i, (harmony, _) in enumerate(known):
+            harmony_memory[i] = harmony
+        population_hs = []
+        if len(known) < self.cfg.hm_size:
+            population_hs = self.create_population_hs(func_block, parameter_ranges, harmony_memory[len(known):],
+                                                      fidelity=fidelity)
 
         if population_hs is None:
             return None
-        elif len([individual for individual in population_hs if individual["exec_success"] is True]) == 0:
-            self.function_evals -= self.cfg.hm_size
+        population_hs = [individual for _, individual in known] + population_hs
+        if len([individual for individual in population_hs if individual["exec_success"] is True]) == 0:
+            self.function_evals -= (self.cfg.hm_size - len(known)) * (fidelity or 1)
             return None
 
         # [HS-CHECK]
@@ -663,25 +861,58 @@ class HSEvo:
         n_distinct = len(set(init_objs))
         init_best = min(init_objs) if init_objs else float("inf")
 
-        for iteration in range(self.cfg.max_iter):
-            new_harmony = self.create_new_harmony(harmony_memory, bounds)
-            population_hs, harmony_memory = self.update_harmony_memory(population_hs, harmony_memory, new_harmony,
-                                                                       func_block, parameter_ranges, iteration)
+        # Screen the new harmonies with a model of every vector evaluated in this search
+        surrogate = None
+        if self.cfg.get("hs_surrogate", False):
+            surrogate = HarmonySurrogate(bounds)
+            surrogate.observe(harmony_memory, [individual["obj"] for individual in population_hs])
+
+        # Rounds of hs_batch_size harmonies, evaluated concurrently: max_iter evaluations in all
+        batch_size = max(1, int(self.cfg.get("hs_batch_size", 1)))
+        for iteration in range(0, self.cfg.max_iter, batch_size):
+            new_harmonies = self.propose_harmonies(harmony_memory, bounds,
+                                                   min(batch_size, self.cfg.max_iter - iteration), surrogate)
+            population_hs, harmony_memory = self.update_harmony_memory(population_hs, harmony_memory, new_harmonies,
+                                                                       func_block, parameter_ranges, iteration,
+                                                                       surrogate, fidelity)
+        if self.cfg.get("hs_memory", False):
+            self.remember_harmonies(hs_memory_key, parameter_ranges, harmony_memory, population_hs)
         best_obj_id = self.find_best_obj(population_hs)
-        population_hs[best_obj_id]["tryHS"] = True
         hs_best = population_hs[best_obj_id]["obj"]
-        logging.info(f"[HS-CHECK] iter={self.iteration} hm_size={self.cfg.hm_size} "
+        surrogate_pool = int(self.cfg.get("hs_surrogate_pool", 20)) if surrogate is not None else 0
+        fidelity_check = ""
+        if fidelity is not None:
+            # Only full-fidelity objectives compare with the population's: re-score the best harmonies
+            ranked = [i for i in np.argsort([individual["obj"] for individual in population_hs], kind="stable")
+                      if population_hs[i]["exec_success"]]
+            promoted = ranked[:max(1, int(self.cfg.get("hs_promote", 2)))]
+            population_hs = self.create_population_hs(func_block, parameter_ranges, harmony_memory[promoted],
+                                                      self.cfg.max_iter)
+            best_obj_id = self.find_best_obj(population_hs)
+            # In full evaluations: what scoring the evaluated harmonies at full fidelity would have cost, minus the
+            # actual cost. Recalled harmonies were not evaluated
+            n_evaluated = self.cfg.hm_size - len(known) + self.cfg.max_iter
+            evals_saved = n_evaluated * (1 - fidelity) - len(promoted)
+            fidelity_check = (f"low_fidelity={fidelity} promoted={len(promoted)} "
+                              f"full_best={population_hs[best_obj_id]['obj']} evals_saved={evals_saved:.1f} ")
+        logging.info(f"[HS-CHECK] iter={self.iteration} hm_size={self.cfg.hm_size} batch_size={batch_size} "
+                     f"surrogate_pool={surrogate_pool} reused={len(known)} {fidelity_check}"
                      f"valid={len(init_objs)} distinct_init_objs={n_distinct} "
                      f"init_best={init_best} hs_best={hs_best} "
                      f"improved_over_init={hs_best < init_best}")
+        if not population_hs[best_obj_id]["exec_success"]:
+            return None
+        population_hs[best_obj_id]["tryHS"] = True
         return population_hs[best_obj_id]
 
     def evolve(self):
-      generation = 0
       try:
-        while self.function_evals < self.cfg.max_fe:
-            generation += 1
-            logging.info(f"===== [Gen {generation}] start (function_evals={self.function_evals}, "
+        # Budgets are checked between generations, and all but max_fe also between stages. A stage under way always
+        # completes
+        while True:
+            self.check_budget()
+            self.generation += 1
+            logging.info(f"===== [Gen {self.generation}] start (function_evals={self.function_evals:g}, "
                          f"best_obj={self.best_obj_overall}) =====")
             # If all individuals are invalid, stop
             if all([not individual["exec_success"] for individual in self.population]):
@@ -696,19 +927,17 @@ class HSEvo:
             # Reflection
             self.flash_reflection(selected_population)
             self.comprehensive_reflection()
+            self.check_budget(mid_generation=True)
             curr_code_path = self.elitist["code_path"]
 
-            # Crossover
-            crossed_population = self.crossover(selected_population)
-            # Evaluate
-            self.population = self.evaluate_population(crossed_population)
+            # Crossover and evaluate
+            self.population = self.crossover(selected_population)
             # Update
             self.update_iter()
+            self.check_budget(mid_generation=True)
 
-            # Mutate
-            mutated_population = self.mutate()
-            # Evaluate
-            self.population.extend(self.evaluate_population(mutated_population))
+            # Mutate and evaluate
+            self.population.extend(self.mutate())
             # Update
             self.update_iter()
 
@@ -721,6 +950,7 @@ class HSEvo:
             # Harmony Search
             try_hs_num = 3
             while try_hs_num:
+                self.check_budget(mid_generation=True)
                 individual_hs = self.harmony_search()
                 if individual_hs is not None:
                     self.population.extend([individual_hs])
@@ -730,9 +960,16 @@ class HSEvo:
                 else:
                     try_hs_num -= 1
             self.update_iter()
-            logging.info(f"===== [Gen {generation}] done (function_evals={self.function_evals}, "
+            self.save_checkpoint()
+            logging.info(f"===== [Gen {self.generation}] done (function_evals={self.function_evals:g}, "
                          f"best_obj={self.best_obj_overall}) =====")
+            self.log_budget_usage()
+      except BudgetExhausted as e:
+        logging.info(f"HSEvo evolution finished: {e}")
       except RuntimeError as e:
         logging.info(f"HSEvo evolution terminated: {e}")
+      finally:
+        self.log_budget_usage()
+        self.evaluator.close()
 
       return self.best_code_overall, self.best_code_path_overall
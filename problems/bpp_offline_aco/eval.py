@@ -1,25 +1,31 @@
 from aco import ACO
 import numpy as np
 import logging
-from gen_inst import BPPInstance, load_dataset, dataset_conf
+from gen_inst import BPPInstance, load_dataset, dataset_conf, CAPACITY, DEMAND_LOW, DEMAND_HIGH
 import sys
 sys.path.insert(0, "../../../")
 
-import gpt
 from utils.utils import get_heuristic_name
 
 
 possible_func_names = ["heuristics", "heuristics_v1", "heuristics_v2", "heuristics_v3"]
 
-heuristic_name = get_heuristic_name(gpt, possible_func_names)
-heuristics = getattr(gpt, heuristic_name)
+heuristics = None  # bound to the candidate's function by set_heuristic()
 
 
 N_ITERATIONS = 15
 N_ANTS = 20
 SAMPLE_COUNT = 200
 
-def solve(inst: BPPInstance, mode = 'sample'):
+
+def set_heuristic(module):
+    from evaluation.record import timed_heuristic
+    global heuristics
+    heuristic_name = get_heuristic_name(module, possible_func_names)
+    heuristics = timed_heuristic(getattr(module, heuristic_name))
+
+
+def solve(inst: BPPInstance, mode = 'aco'):
     heu = heuristics(inst.demands.copy(), inst.capacity) # normalized in ACO
     assert tuple(heu.shape) == (inst.n, inst.n)
     assert 0 < heu.max() < np.inf
@@ -30,9 +36,37 @@ def solve(inst: BPPInstance, mode = 'sample'):
         obj, _ = aco.run(N_ITERATIONS)
     return obj
 
+
+def preflight_instance() -> BPPInstance:
+    """A small random instance for screening candidates before the full evaluation."""
+    demands = np.random.default_rng(0).integers(DEMAND_LOW, DEMAND_HIGH + 1, size=20)
+    return BPPInstance(20, CAPACITY, demands)
+
+
+def preflight_output_shape(demand, capacity):
+    """Shape of the heuristic's output for these arguments, checked by the pre-flight screen."""
+    return (len(demand), len(demand))
+
+
+def load_instances(problem_size, mood):
+    """Load the instances of a dataset split, generating the datasets on first use."""
+    import os
+
+    basepath = os.path.dirname(__file__)
+    # automacially generate dataset if nonexists
+    if not os.path.isfile(os.path.join(basepath, f"dataset/train{dataset_conf['train'][0]}_dataset.npz")):
+        from gen_inst import generate_datasets
+        generate_datasets()
+    dataset_path = os.path.join(basepath, f"dataset/{mood}{problem_size}_dataset.npz")
+    return dataset_path, load_dataset(dataset_path)
+
+
 if __name__ == "__main__":
     import sys
-    import os
+    import gpt
+    sys.path.insert(0, sys.argv[2])  # project root, when run without evaluation/launch.py
+    set_heuristic(gpt)
+    from evaluation.record import report_objective, solve_instances
 
     print("[*] Running ...")
 
@@ -43,32 +77,18 @@ if __name__ == "__main__":
     assert mood in ['train', 'val']
     assert method in ['sample', 'aco']
 
-    basepath = os.path.dirname(__file__)
-    # automacially generate dataset if nonexists
-    if not os.path.isfile(os.path.join(basepath, f"dataset/train{dataset_conf['train'][0]}_dataset.npz")):
-        from gen_inst import generate_datasets
-        generate_datasets()
-    
     if mood == 'train':
-        dataset_path = os.path.join(basepath, f"dataset/{mood}{problem_size}_dataset.npz")
-        dataset = load_dataset(dataset_path)
+        dataset_path, dataset = load_instances(problem_size, mood)
         n_instances = len(dataset)
 
         print(f"[*] Dataset loaded: {dataset_path} with {n_instances} instances.")
         
-        objs = []
-        for i, instance in enumerate(dataset):
-            obj = solve(instance, mode=method)
-            print(f"[*] Instance {i}: {obj}")
-            objs.append(obj)
-        
-        print("[*] Average:")
-        print(np.mean(objs))
+        objs = solve_instances(solve, dataset, mode=method)
+        report_objective(np.mean(objs))
 
     else: # mood == 'val'
         for problem_size in dataset_conf['val']:
-            dataset_path = os.path.join(basepath, f"dataset/{mood}{problem_size}_dataset.npz")
-            dataset = load_dataset(dataset_path)
+            dataset_path, dataset = load_instances(problem_size, mood)
             n_instances = dataset[0].n
             logging.info(f"[*] Evaluating {dataset_path}")
 
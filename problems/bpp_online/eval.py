@@ -3,10 +3,17 @@ Adapted from https://github.com/google-deepmind/funsearch
 """
 
 import numpy as np
+import os
 import pickle
 import sys
 
-from gpt import priority_v2 as priority
+priority = None  # bound to the candidate's function by set_heuristic()
+
+
+def set_heuristic(module):
+    from evaluation.record import timed_heuristic
+    global priority
+    priority = timed_heuristic(getattr(module, "priority_v2"))
 
 
 def get_valid_bin_indices(item: float, bins: np.ndarray) -> np.ndarray:
@@ -35,6 +42,22 @@ def online_binpack(
     return packing, bins
 
 
+def num_bins_used(instance: dict) -> int:
+    """Pack one online binpacking instance and count the bins it uses."""
+    capacity = instance['capacity']
+    items = instance['items']
+    items = np.array(items) if isinstance(items, list) else items
+    # Create num_items bins so there will always be space for all items,
+    # regardless of packing order. Array has shape (num_items,).
+    bins = np.array([capacity for _ in range(instance['num_items'])])
+    # Pack items into bins and return remaining capacity in bins_packed, which
+    # has shape (num_items,).
+    _, bins_packed = online_binpack(items.astype(float), bins)
+    # If remaining capacity in a bin is equal to initial capacity, then it is
+    # unused. Count number of used bins.
+    return (bins_packed != capacity).sum()
+
+
 def evaluate(instances: dict) -> float:
     """Evaluate heuristic function on a set of online binpacking instances."""
     # List storing number of bins used for each instance.
@@ -43,24 +66,54 @@ def evaluate(instances: dict) -> float:
     for name in instances:
         if name == 'l1_bound':
             continue
-        instance = instances[name]
-        capacity = instance['capacity']
-        items = instance['items']
-        items = np.array(items) if isinstance(items, list) else items
-        # Create num_items bins so there will always be space for all items,
-        # regardless of packing order. Array has shape (num_items,).
-        bins = np.array([capacity for _ in range(instance['num_items'])])
-        # Pack items into bins and return remaining capacity in bins_packed, which
-        # has shape (num_items,).
-        _, bins_packed = online_binpack(items.astype(float), bins)
-        # If remaining capacity in a bin is equal to initial capacity, then it is
-        # unused. Count number of used bins.
-        num_bins.append((bins_packed != capacity).sum())
+        num_bins.append(num_bins_used(instances[name]))
     # Score of heuristic function is negative of average number of bins used
     # across instances (as we want to minimize number of bins).
     return -np.mean(num_bins)
 
 
+def solve(instance: tuple[dict, float]) -> float:
+    """Excess (in %) of the bins used on one instance over the dataset's L1 bound.
+
+    The mean over a dataset equals the excess reported by ``__main__``.
+    """
+    instance, l1_bound = instance
+    return 100 * (num_bins_used(instance) - l1_bound) / l1_bound
+
+
+def preflight_instance() -> tuple[dict, float]:
+    """A small random instance for screening candidates before the full evaluation."""
+    from gen_inst import bin_capacity, l1_bound
+    items = np.random.default_rng(0).integers(1, 100, size=50)
+    instance = {'capacity': bin_capacity, 'num_items': len(items), 'items': items}
+    return instance, l1_bound(items, bin_capacity)
+
+
+def preflight_output_shape(item, bins):
+    """Shape of the heuristic's output for these arguments, checked by the pre-flight screen."""
+    return bins.shape
+
+
+def load_dataset(mood: str) -> tuple[str, dict]:
+    """Load the pickled dataset of a split, generating the datasets on first use."""
+    file_name = f"weibull_5k_{mood}.pickle"
+    basepath = os.path.dirname(__file__)
+    dataset_path = os.path.join(basepath, "dataset", file_name)
+
+    if not os.path.isfile(dataset_path):
+        from gen_inst import generate_datasets
+        generate_datasets()
+
+    return dataset_path, pickle.load(open(dataset_path, 'rb'))
+
+
+def load_instances(problem_size, mood):
+    """Load the instances of a dataset split as ``(instance, l1_bound)`` pairs."""
+    dataset_path, dataset = load_dataset(mood)
+    l1_bound = dataset['l1_bound']
+    return dataset_path, [(dataset[name], l1_bound) for name in dataset if name != 'l1_bound']
+
+
 def is_valid_packing(
     packing: list[list[float, ...], ...], items: list[float], capacity: float
 ) -> bool:
@@ -89,7 +142,11 @@ def is_valid_packing(
 
 
 if __name__ == "__main__":
-    import os
+    import gpt
+    sys.path.insert(0, sys.argv[2])  # project root, when run without evaluation/launch.py
+    set_heuristic(gpt)
+    from evaluation.record import report_objective, solve_instances
+
     print("[*] Running ...")
 
     problem_size = int(sys.argv[1])
@@ -98,24 +155,16 @@ if __name__ == "__main__":
     assert mood in ['train', 'val']
     assert problem_size in [5000, -1]
     
-    file_name = f"weibull_5k_{mood}.pickle"
-    basepath = os.path.dirname(__file__)
-    dataset_path = os.path.join(basepath, "dataset", file_name)
-    
-    if not os.path.isfile(dataset_path):
-        from gen_inst import generate_datasets
-        generate_datasets()
+    dataset_path, instances = load_instances(problem_size, mood)
+    file_name = os.path.basename(dataset_path)
     
-    dataset = pickle.load(open(dataset_path, 'rb'))
-    
-    # Evaluate heuristic function on dataset
-    avg_num_bins = -evaluate(dataset)
-    l1_bound = dataset['l1_bound']
-    excess = (avg_num_bins - l1_bound) / l1_bound
+    # Evaluate heuristic function on dataset, one instance at a time
+    excess = np.mean(solve_instances(solve, instances))
+    l1_bound = instances[0][1]
+    avg_num_bins = l1_bound * (1 + excess / 100)
     print(file_name)
     print(f'\t Average number of bins: {avg_num_bins}')
     print(f'\t Lower bound on optimum: {l1_bound}')
-    print(f'\t Excess: {100 * excess:.2f}%')
+    print(f'\t Excess: {excess:.2f}%')
     
-    print("[*] Average:")
-    print(excess * 100)
\ No newline at end of file
+    report_objective(excess)
\ No newline at end of file
@@ -8,20 +8,27 @@ import inspect
 import sys
 sys.path.insert(0, "../../../")
 
-import gpt
 from utils.utils import get_heuristic_name
 
 
 possible_func_names = ["heuristics", "heuristics_v1", "heuristics_v2", "heuristics_v3"]
 
-heuristic_name = get_heuristic_name(gpt, possible_func_names)
-heuristics = getattr(gpt, heuristic_name)
+heuristics = None  # bound to the candidate's function by set_heuristic()
 
 N_ITERATIONS = 100
 N_ANTS = 30
 CAPACITY = 50
 
-def solve(node_pos, demand):
+
+def set_heuristic(module):
+    from evaluation.record import timed_heuristic
+    global heuristics
+    heuristic_name = get_heuristic_name(module, possible_func_names)
+    heuristics = timed_heuristic(getattr(module, heuristic_name))
+
+
+def solve(instance):
+    node_pos, demand = instance
     dist_mat = distance_matrix(node_pos, node_pos)
     dist_mat[np.diag_indices_from(dist_mat)] = 1 # set diagonal to a large number
     if len(inspect.getfullargspec(heuristics).args) == 4:
@@ -34,7 +41,37 @@ def solve(node_pos, demand):
     return obj
 
 
+def preflight_instance():
+    """A small random instance for screening candidates before the full evaluation."""
+    rng = np.random.default_rng(0)
+    node_pos = np.concatenate(([[0.5, 0.5]], rng.random((20, 2))))
+    demand = np.concatenate(([0.], rng.integers(1, 10, size=20).astype(float)))
+    return node_pos, demand
+
+
+def preflight_output_shape(distance_matrix, *args):
+    """Shape of the heuristic's output for these arguments, checked by the pre-flight screen."""
+    return distance_matrix.shape
+
+
+def load_instances(problem_size, mood):
+    """Load the instances of a dataset split, generating the datasets on first use."""
+    basepath = os.path.dirname(__file__)
+    if not os.path.isfile(os.path.join(basepath, "dataset/train50_dataset.npy")):
+        from gen_inst import generate_datasets
+        generate_datasets()
+    dataset_path = os.path.join(basepath, f"dataset/{mood}{problem_size}_dataset.npy")
+    dataset = np.load(dataset_path)
+    demands, node_positions = dataset[:, :, 0], dataset[:, :, 1:]
+    return dataset_path, list(zip(node_positions, demands))
+
+
 if __name__ == "__main__":
+    import gpt
+    sys.path.insert(0, sys.argv[2])  # project root, when run without evaluation/launch.py
+    set_heuristic(gpt)
+    from evaluation.record import report_objective, solve_instances
+
     print("[*] Running ...")
 
     problem_size = int(sys.argv[1])
@@ -42,40 +79,25 @@ if __name__ == "__main__":
     mood = sys.argv[3]
     assert mood in ['train', 'val']
 
-    basepath = os.path.dirname(__file__)
-    if not os.path.isfile(os.path.join(basepath, "dataset/train50_dataset.npy")):
-        from gen_inst import generate_datasets
-        generate_datasets()
-    
     if mood == 'train':
-        dataset_path = os.path.join(basepath, f"dataset/{mood}{problem_size}_dataset.npy")
-        dataset = np.load(dataset_path)
-        demands, node_positions = dataset[:, :, 0], dataset[:, :, 1:]
+        dataset_path, instances = load_instances(problem_size, mood)
         
-        n_instances = node_positions.shape[0]
+        n_instances = len(instances)
         print(f"[*] Dataset loaded: {dataset_path} with {n_instances} instances.")
         
-        objs = []
-        for i, (node_pos, demand) in enumerate(zip(node_positions, demands)):
-            obj = solve(node_pos, demand)
-            print(f"[*] Instance {i}: {obj}")
-            objs.append(obj.item())
-        
-        print("[*] Average:")
-        print(np.mean(objs))
+        objs = solve_instances(solve, instances)
+        report_objective(np.mean(objs))
         
     else:
         for problem_size in [20, 50, 100]:
-            dataset_path = os.path.join(basepath, f"dataset/{mood}{problem_size}_dataset.npy")
-            dataset = np.load(dataset_path)
-            demands, node_positions = dataset[:, :, 0], dataset[:, :, 1:]
+            dataset_path, instances = load_instances(problem_size, mood)
             
-            n_instances = node_positions.shape[0]
+            n_instances = len(instances)
             logging.info(f"[*] Evaluating {dataset_path}")
             
             objs = []
-            for i, (node_pos, demand) in enumerate(zip(node_positions, demands)):
-                obj = solve(node_pos, demand)
+            for i, instance in enumerate(instances):
+                obj = solve(instance)
                 objs.append(obj.item())
             
             print(f"[*] Average for {problem_size}: {np.mean(objs)}")
\ No newline at end of file
@@ -5,20 +5,27 @@ import logging
 import sys
 sys.path.insert(0, "../../../")
 
-import gpt
 from utils.utils import get_heuristic_name
 
 
 possible_func_names = ["heuristics", "heuristics_v1", "heuristics_v2", "heuristics_v3"]
 
-heuristic_name = get_heuristic_name(gpt, possible_func_names)
-heuristics = getattr(gpt, heuristic_name)
+heuristics = None  # bound to the candidate's function by set_heuristic()
 
 
 N_ITERATIONS = 50
 N_ANTS = 10
 
-def solve(prize: np.ndarray, weight: np.ndarray):
+
+def set_heuristic(module):
+    from evaluation.record import timed_heuristic
+    global heuristics
+    heuristic_name = get_heuristic_name(module, possible_func_names)
+    heuristics = timed_heuristic(getattr(module, heuristic_name))
+
+
+def solve(instance: tuple[np.ndarray, np.ndarray]):
+    prize, weight = instance
     n, m = weight.shape
     heu = heuristics(prize.copy(), weight.copy()) + 1e-9
     assert heu.shape == (n,)
@@ -28,9 +35,40 @@ def solve(prize: np.ndarray, weight: np.ndarray):
     return obj
 
 
+def preflight_instance():
+    """A small random instance for screening candidates before the full evaluation."""
+    rng = np.random.default_rng(0)
+    prize, weight = rng.random(20), rng.random((20, 5))
+    constraints = rng.uniform(low=weight.max(0), high=weight.sum(0))
+    return prize, weight / constraints.reshape(1, -1)
+
+
+def preflight_output_shape(prize, weight):
+    """Shape of the heuristic's output for these arguments, checked by the pre-flight screen."""
+    return prize.shape
+
+
+def load_instances(problem_size, mood):
+    """Load the instances of a dataset split, generating the datasets on first use."""
+    import os
+
+    basepath = os.path.dirname(__file__)
+    # automacially generate dataset if nonexists
+    if not os.path.isfile(os.path.join(basepath, f"dataset/train50_dataset.npz")):
+        from gen_inst import generate_datasets
+        generate_datasets()
+    dataset_path = os.path.join(basepath, f"dataset/{mood}{problem_size}_dataset.npz")
+    dataset = np.load(dataset_path)
+    prizes, weights = dataset['prizes'], dataset['weights']
+    return dataset_path, list(zip(prizes, weights))
+
+
 if __name__ == "__main__":
     import sys
-    import os
+    import gpt
+    sys.path.insert(0, sys.argv[2])  # project root, when run without evaluation/launch.py
+    set_heuristic(gpt)
+    from evaluation.record import report_objective, solve_instances
 
     print("[*] Running ...")
 
@@ -39,40 +77,24 @@ if __name__ == "__main__":
     mood = sys.argv[3]
     assert mood in ['train', 'val']
 
-    basepath = os.path.dirname(__file__)
-    # automacially generate dataset if nonexists
-    if not os.path.isfile(os.path.join(basepath, f"dataset/train50_dataset.npz")):
-        from gen_inst import generate_datasets
-        generate_datasets()
-    
     if mood == 'train':
-        dataset_path = os.path.join(basepath, f"dataset/{mood}{problem_size}_dataset.npz")
-        dataset = np.load(dataset_path)
-        prizes, weights = dataset['prizes'], dataset['weights']
-        n_instances = prizes.shape[0]
+        dataset_path, instances = load_instances(problem_size, mood)
+        n_instances = len(instances)
 
         print(f"[*] Dataset loaded: {dataset_path} with {n_instances} instances.")
         
-        objs = []
-        for i, (prize, weight) in enumerate(zip(prizes, weights)):
-            obj = solve(prize, weight)
-            print(f"[*] Instance {i}: {obj}")
-            objs.append(obj.item())
-        
-        print("[*] Average:")
-        print(np.mean(objs))
+        objs = solve_instances(solve, instances)
+        report_objective(np.mean(objs))
 
     else: # mood == 'val'
         for problem_size in [100, 300, 500]:
-            dataset_path = os.path.join(basepath, f"dataset/{mood}{problem_size}_dataset.npz")
-            dataset = np.load(dataset_path)
-            prizes, weights = dataset['prizes'], dataset['weights']
-            n_instances = prizes.shape[0]
+            dataset_path, instances = load_instances(problem_size, mood)
+            n_instances = len(instances)
             logging.info(f"[*] Evaluating {dataset_path}")
 
             objs = []
-            for i, (prize, weight) in enumerate(zip(prizes, weights)):
-                obj = solve(prize, weight)
+            for i, instance in enumerate(instances):
+                obj = solve(instance)
                 objs.append(obj.item())
             
             print(f"[*] Average for {problem_size}: {np.mean(objs)}")
\ No newline at end of file
@@ -1,25 +1,30 @@
 from aco import ACO
 import numpy as np
 import logging
-from gen_inst import OPInstance, load_dataset
+from gen_inst import OPInstance, load_dataset, gen_distance_matrix, gen_prizes, get_max_len
 import torch
 import sys
 sys.path.insert(0, "../../../")
 
-import gpt
 from utils.utils import get_heuristic_name
 
 
 possible_func_names = ["heuristics", "heuristics_v1", "heuristics_v2", "heuristics_v3"]
 
-heuristic_name = get_heuristic_name(gpt, possible_func_names)
-heuristics = getattr(gpt, heuristic_name)
+heuristics = None  # bound to the candidate's function by set_heuristic()
 
 
 N_ITERATIONS = 50
 N_ANTS = 20
 
 
+def set_heuristic(module):
+    from evaluation.record import timed_heuristic
+    global heuristics
+    heuristic_name = get_heuristic_name(module, possible_func_names)
+    heuristics = timed_heuristic(getattr(module, heuristic_name))
+
+
 def solve(inst: OPInstance):
     heu = heuristics(np.array(inst.prize), np.array(inst.distance), inst.maxlen) + 1e-9
     assert tuple(heu.shape) == (inst.n, inst.n)
@@ -30,9 +35,36 @@ def solve(inst: OPInstance):
     return obj
 
 
+def preflight_instance() -> OPInstance:
+    """A small random instance for screening candidates before the full evaluation."""
+    coord = torch.from_numpy(np.random.default_rng(0).random((20, 2)))
+    return OPInstance(20, coord, gen_distance_matrix(coord), gen_prizes(coord), get_max_len(20))
+
+
+def preflight_output_shape(prize, distance, maxlen):
+    """Shape of the heuristic's output for these arguments, checked by the pre-flight screen."""
+    return distance.shape
+
+
+def load_instances(problem_size, mood):
+    """Load the instances of a dataset split, generating the datasets on first use."""
+    import os
+
+    basepath = os.path.dirname(__file__)
+    # automacially generate dataset if nonexists
+    if not os.path.isfile(os.path.join(basepath, f"dataset/train50_dataset.npz")):
+        from gen_inst import generate_datasets
+        generate_datasets()
+    dataset_path = os.path.join(basepath, f"dataset/{mood}{problem_size}_dataset.npz")
+    return dataset_path, load_dataset(dataset_path)
+
+
 if __name__ == "__main__":
     import sys
-    import os
+    import gpt
+    sys.path.insert(0, sys.argv[2])  # project root, when run without evaluation/launch.py
+    set_heuristic(gpt)
+    from evaluation.record import report_objective, solve_instances
 
     print("[*] Running ...")
 
@@ -41,32 +73,18 @@ if __name__ == "__main__":
     mood = sys.argv[3]
     assert mood in ['train', 'val']
 
-    basepath = os.path.dirname(__file__)
-    # automacially generate dataset if nonexists
-    if not os.path.isfile(os.path.join(basepath, f"dataset/train50_dataset.npz")):
-        from gen_inst import generate_datasets
-        generate_datasets()
-    
     if mood == 'train':
-        dataset_path = os.path.join(basepath, f"dataset/{mood}{problem_size}_dataset.npz")
-        dataset = load_dataset(dataset_path)
+        dataset_path, dataset = load_instances(problem_size, mood)
         n_instances = len(dataset)
 
         print(f"[*] Dataset loaded: {dataset_path} with {n_instances} instances.")
         
-        objs = []
-        for i, instance in enumerate(dataset):
-            obj = solve(instance)
-            print(f"[*] Instance {i}: {obj}")
-            objs.append(obj.item())
-        
-        print("[*] Average:")
-        print(np.mean(objs))
+        objs = solve_instances(solve, dataset)
+        report_objective(np.mean(objs))
 
     else: # mood == 'val'
         for problem_size in [50, 100, 200]:
-            dataset_path = os.path.join(basepath, f"dataset/{mood}{problem_size}_dataset.npz")
-            dataset = load_dataset(dataset_path)
+            dataset_path, dataset = load_instances(problem_size, mood)
             logging.info(f"[*] Evaluating {dataset_path}")
 
             objs = []
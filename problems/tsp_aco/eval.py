@@ -7,19 +7,24 @@ import logging
 import sys
 sys.path.insert(0, "../../../")
 
-import gpt
 from utils.utils import get_heuristic_name
 
 
 possible_func_names = ["heuristics", "heuristics_v1", "heuristics_v2", "heuristics_v3"]
 
-heuristic_name = get_heuristic_name(gpt, possible_func_names)
-heuristics = getattr(gpt, heuristic_name)
+heuristics = None  # bound to the candidate's function by set_heuristic()
 
 N_ITERATIONS = 100
 N_ANTS = 30
 
 
+def set_heuristic(module):
+    from evaluation.record import timed_heuristic
+    global heuristics
+    heuristic_name = get_heuristic_name(module, possible_func_names)
+    heuristics = timed_heuristic(getattr(module, heuristic_name))
+
+
 def solve(node_pos):
     dist_mat = distance_matrix(node_pos, node_pos)
     dist_mat[np.diag_indices_from(dist_mat)] = 1 # set diagonal to a large number
@@ -29,7 +34,33 @@ def solve(node_pos):
     obj = aco.run(N_ITERATIONS)
     return obj
 
+
+def preflight_instance():
+    """A small random instance for screening candidates before the full evaluation."""
+    return np.random.default_rng(0).random((20, 2))
+
+
+def preflight_output_shape(distance_matrix):
+    """Shape of the heuristic's output for these arguments, checked by the pre-flight screen."""
+    return distance_matrix.shape
+
+
+def load_instances(problem_size, mood):
+    """Load the instances of a dataset split, generating the datasets on first use."""
+    basepath = path.join(path.dirname(__file__), "dataset")
+    if not path.isfile(path.join(basepath, "train50_dataset.npy")):
+        from gen_inst import generate_datasets
+        generate_datasets()
+    dataset_path = path.join(basepath, f"{mood}{problem_size}_dataset.npy")
+    return dataset_path, np.load(dataset_path)
+
+
 if __name__ == "__main__":
+    import gpt
+    sys.path.insert(0, sys.argv[2])  # project root, when run without evaluation/launch.py
+    set_heuristic(gpt)
+    from evaluation.record import report_objective, solve_instances
+
     print("[*] Running ...")
 
     problem_size = int(sys.argv[1])
@@ -37,30 +68,17 @@ if __name__ == "__main__":
     mood = sys.argv[3]
     assert mood in ['train', 'val']
 
-    basepath = path.join(path.dirname(__file__), "dataset")
-    if not path.isfile(path.join(basepath, "train50_dataset.npy")):
-        from gen_inst import generate_datasets
-        generate_datasets()
-    
     if mood == 'train':
-        dataset_path = path.join(basepath, f"{mood}{problem_size}_dataset.npy")
-        node_positions = np.load(dataset_path)
+        dataset_path, node_positions = load_instances(problem_size, mood)
         n_instances = node_positions.shape[0]
         print(f"[*] Dataset loaded: {dataset_path} with {n_instances} instances.")
         
-        objs = []
-        for i, node_pos in enumerate(node_positions):
-            obj = solve(node_pos)
-            print(f"[*] Instance {i}: {obj}")
-            objs.append(obj)
-        
-        print("[*] Average:")
-        print(np.mean(objs))
+        objs = solve_instances(solve, node_positions)
+        report_objective(np.mean(objs))
     
     else:
         for problem_size in [20, 50, 100]:
-            dataset_path = path.join(basepath, f"{mood}{problem_size}_dataset.npy")
-            node_positions = np.load(dataset_path)
+            dataset_path, node_positions = load_instances(problem_size, mood)
             logging.info(f"[*] Evaluating {dataset_path}")
             n_instances = node_positions.shape[0]
             objs = []
@@ -7,13 +7,17 @@ from scipy.spatial import distance_matrix
 import logging
 from copy import copy
 
-try:
-    from gpt import select_next_node_v2 as select_next_node
-except:
-    from gpt import select_next_node
+select_next_node = None  # bound to the candidate's function by set_heuristic()
 
 
-def eval_heuristic(node_positions: np.ndarray) -> float:
+def set_heuristic(module):
+    from evaluation.record import timed_heuristic
+    global select_next_node
+    select_next_node = timed_heuristic(
+        getattr(module, "select_next_node_v2", None) or getattr(module, "select_next_node"))
+
+
+def solve(node_positions: np.ndarray) -> float:
     '''
     Generate solution for TSP problem using the GPT-generated heuristic algorithm.
     
@@ -56,9 +60,34 @@ def eval_heuristic(node_positions: np.ndarray) -> float:
     for i in range(problem_size):
         obj += dist_mat[solution[i], solution[(i + 1) % problem_size]]
     return obj
+
+
+def preflight_instance() -> np.ndarray:
+    """A small random instance for screening candidates before the full evaluation."""
+    return np.random.default_rng(0).random((20, 2))
+
+
+def preflight_output_shape(current_node, destination_node, unvisited_nodes, distance_matrix):
+    """Shape of the heuristic's output for these arguments, checked by the pre-flight screen."""
+    return ()
+
+
+def load_instances(problem_size, mood):
+    """Load the instances of a dataset split, generating the datasets on first use."""
+    basepath = path.join(path.dirname(__file__), "dataset")
+    if not path.isfile(path.join(basepath, "train50_dataset.npy")):
+        from gen_inst import generate_datasets
+        generate_datasets()
+    dataset_path = path.join(basepath, f"{mood}{problem_size}_dataset.npy")
+    return dataset_path, np.load(dataset_path)
     
 
 if __name__ == '__main__':
+    import gpt
+    sys.path.insert(0, sys.argv[2])  # project root, when run without evaluation/launch.py
+    set_heuristic(gpt)
+    from evaluation.record import report_objective, solve_instances
+
     print("[*] Running ...")
 
     problem_size = int(sys.argv[1])
@@ -66,34 +95,21 @@ if __name__ == '__main__':
     mood = sys.argv[3]
     assert mood in ['train', 'val']
 
-    basepath = path.join(path.dirname(__file__), "dataset")
-    if not path.isfile(path.join(basepath, "train50_dataset.npy")):
-        from gen_inst import generate_datasets
-        generate_datasets()
-    
     if mood == 'train':
-        dataset_path = path.join(basepath, f"train{problem_size}_dataset.npy")
-        node_positions = np.load(dataset_path)
+        dataset_path, node_positions = load_instances(problem_size, mood)
         n_instances = node_positions.shape[0]
         print(f"[*] Dataset loaded: {dataset_path} with {n_instances} instances.")
         
-        objs = []
-        for i in range(n_instances):
-            obj = eval_heuristic(node_positions[i])
-            print(f"[*] Instance {i}: {obj}")
-            objs.append(obj)
-        
-        print("[*] Average:")
-        print(np.mean(objs))
+        objs = solve_instances(solve, node_positions)
+        report_objective(np.mean(objs))
     
     else:
         for problem_size in [20, 50, 100, 200]:
-            dataset_path = path.join(basepath, f"val{problem_size}_dataset.npy")
+            dataset_path, node_positions = load_instances(problem_size, mood)
             logging.info(f"[*] Evaluating {dataset_path}")
-            node_positions = np.load(dataset_path)
             n_instances = node_positions.shape[0]
             objs = []
             for i in range(n_instances):
-                obj = eval_heuristic(node_positions[i])
+                obj = solve(node_positions[i])
                 objs.append(obj)
             print(f"[*] Average for {problem_size}: {np.mean(objs)}")
\ No newline at end of file
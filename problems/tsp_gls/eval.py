@@ -2,16 +2,18 @@ import numpy as np
 import logging
 from gen_inst import TSPInstance, load_dataset, dataset_conf
 from gls import guided_local_search
-from tqdm import tqdm
 
-try:
-    from gpt import update_edge_distance_v2 as heuristics
-except:
-    from gpt import heuristics
+heuristics = None  # bound to the candidate's function by set_heuristic()
 
 perturbation_moves = 30
 iter_limit = 1200
 
+
+def set_heuristic(module):
+    from evaluation.record import timed_heuristic
+    global heuristics
+    heuristics = timed_heuristic(getattr(module, "update_edge_distance_v2", None) or getattr(module, "heuristics"))
+
 def calculate_cost(inst: TSPInstance, path: np.ndarray) -> float:
     return inst.distmat[path, np.roll(path, 1)].sum().item()
 
@@ -22,9 +24,26 @@ def solve(inst: TSPInstance) -> float:
     # print(result)
     return calculate_cost(inst, result)
 
+
+def load_instances(problem_size, mood):
+    """Load the instances of a dataset split, generating the datasets on first use."""
+    import os
+
+    basepath = os.path.dirname(__file__)
+    # automacially generate dataset if nonexists
+    if not os.path.isfile(os.path.join(basepath, f"dataset/train{dataset_conf['train'][0]}_dataset.npy")):
+        from gen_inst import generate_datasets
+        generate_datasets()
+    dataset_path = os.path.join(basepath, f"dataset/{mood}{problem_size}_dataset.npy")
+    return dataset_path, load_dataset(dataset_path)
+
+
 if __name__ == "__main__":
     import sys
-    import os
+    import gpt
+    sys.path.insert(0, sys.argv[2])  # project root, when run without evaluation/launch.py
+    set_heuristic(gpt)
+    from evaluation.record import report_objective, solve_instances
 
     print("[*] Running ...")
 
@@ -32,32 +51,19 @@ if __name__ == "__main__":
     mood = sys.argv[3]
     assert mood in ['train', 'val', "test"]
 
-    basepath = os.path.dirname(__file__)
-    # automacially generate dataset if nonexists
-    if not os.path.isfile(os.path.join(basepath, f"dataset/train{dataset_conf['train'][0]}_dataset.npy")):
-        from gen_inst import generate_datasets
-        generate_datasets()
-    
     if mood == 'train':
-        dataset_path = os.path.join(basepath, f"dataset/{mood}{problem_size}_dataset.npy")
-        dataset = load_dataset(dataset_path)
+        dataset_path, dataset = load_instances(problem_size, mood)
         n_instances = dataset[0].n
 
         print(f"[*] Dataset loaded: {dataset_path} with {n_instances} instances.")
         
-        objs = []
-        for i, instance in enumerate(dataset):
-            obj = solve(instance)
-            print(f"[*] Instance {i}: {obj}")
-            objs.append(obj)
-        
-        print("[*] Average:")
-        print(np.mean(objs))
+        objs = solve_instances(solve, dataset)
+        report_objective(np.mean(objs))
 
     else: # mood == 'val'
+        from tqdm import tqdm  # Progress bars only for validation; train runs skip the import
         for problem_size in dataset_conf['val']:
-            dataset_path = os.path.join(basepath, f"dataset/{mood}{problem_size}_dataset.npy")
-            dataset = load_dataset(dataset_path)
+            dataset_path, dataset = load_instances(problem_size, mood)
             n_instances = dataset[0].n
             logging.info(f"[*] Evaluating {dataset_path}")
 
@@ -0,0 +1,59 @@
+"""Score the candidate in ``gpt.py`` with the GLS sandbox of ``baselines/reevo/gls_tsp_adapt``.
+
+Run by :class:`~evaluation.sandbox.SandboxEvaluator` through
+``evaluation/launch.py``, with the same arguments as ``eval.py``. Like the
+sandbox, it adds ``import numpy as np`` to the candidate and compiles it with
+numba before running it on the sandbox's instances. The candidate is first
+compiled on a 20-node instance. If numba cannot compile it, it runs in
+numba's object mode, or else as plain Python; the mode is printed and
+recorded in the telemetry. Compiled candidates are cached in
+``.cache/gls_jit`` by the hash of their code.
+
+With one joblib job per evaluation (the default share of the CPUs), or with
+an instance budget or a race, the instances are solved one at a time through
+:func:`~evaluation.record.solve_instances`, which applies them and records
+each instance. Otherwise they are solved concurrently, as by the sandbox,
+and only the mean gap is recorded. At a fidelity below 1, only that fraction
+of the instances is solved either way. Unlike the sandbox, a failure ends
+the run with its traceback, which becomes the feedback.
+"""
+
+import importlib.util
+import sys
+
+if __name__ == '__main__':
+    sys.path.insert(0, sys.argv[2])  # project root, when run without evaluation/launch.py
+    from baselines.reevo.gls_tsp_adapt import _evaluator_accelerate
+    from baselines.reevo.gls_tsp_adapt.gls_tsp_eval import JIT_CACHE_DIR, probe_args
+    from baselines.reevo.gls_tsp_adapt.tsp_eval_helper import ael_evaluation
+    import numpy as np
+
+    from evaluation.record import (current_budget, current_race, current_record, fidelity_instances,
+                                   report_objective, solve_instances)
+
+    print("[*] Running ...")
+    with open(importlib.util.find_spec("gpt").origin, 'r') as f:
+        code = f.read()
+    func_name = _evaluator_accelerate._extract_function_name(code)
+    heuristic, mode, compile_time = _evaluator_accelerate.compile_heuristic(code, func_name, probe_args(),
+                                                                            JIT_CACHE_DIR)
+    print(f"[*] Heuristic compiled in {mode} mode in {compile_time:.2f} s")
+    current_record().telemetry["compile_time"] = compile_time
+    current_record().telemetry.update({f"jit_{jit_mode}": float(jit_mode == mode)
+                                       for jit_mode in _evaluator_accelerate.JIT_MODES})
+
+    def solve(x):
+        gap = evaluation.solve(x, heuristic)
+        if gap is None:
+            raise RuntimeError(f"GLS evaluation failed on instance {x}")
+        return gap
+
+    evaluation = ael_evaluation.Evaluation()
+    instance_ids = range(len(evaluation.instances))
+    if evaluation.n_jobs() > 1 and current_budget() is None and current_race() is None:
+        obj = evaluation.evaluateGLS(heuristic, fidelity_instances(instance_ids))
+    else:
+        obj = float(np.mean(solve_instances(solve, instance_ids)))
+    if obj is None or not obj > 0:
+        raise RuntimeError(f"GLS evaluation failed on at least one instance (objective: {obj})")
+    report_objective(obj)
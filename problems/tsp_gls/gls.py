@@ -2,6 +2,7 @@ import numpy as np
 import numpy.typing as npt
 import numba as nb
 import concurrent.futures
+import os
 
 FloatArray = npt.NDArray[np.float_]
 IntArray = npt.NDArray[np.int_]
@@ -168,7 +169,9 @@ def multi_start_guided_local_search(
     guide = guide.astype(np.float32)
     start_nodes = np.arange(n_starts).astype(np.uint16)
 
-    with concurrent.futures.ThreadPoolExecutor() as executor:
+    # One thread per CPU of the evaluation's slot (evaluation.cpu_slots), not per CPU of the machine
+    max_workers = int(os.environ.get("HSEVO_CPU_SLOTS") or 0) or None
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
         futures = []
         for start in start_nodes:
             future = executor.submit(_guided_local_search, dist, guide, start, perturbation_moves = perturbation_moves, iter_limit = iter_limit)
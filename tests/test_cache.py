@@ -0,0 +1,131 @@
+import json
+
+import pytest
+
+from evaluation.cache import CachedEvaluator, FitnessCache, code_fingerprint, normalize_code
+from evaluation.engine import EvaluationResult, EvaluationTask
+from evaluation.stream import TaskStream
+
+ALIASES = ("heuristics", "heuristics_v1", "heuristics_v2", "heuristics_v3")
+
+CODE = '''
+import numpy as np
+
+def heuristics_v2(distance_matrix: np.ndarray) -> np.ndarray:
+    """Inverse distance."""
+    return 1 / distance_matrix
+'''
+
+REFORMATTED = '''
+import numpy as np
+def heuristics_v2(distance_matrix:np.ndarray)->np.ndarray:
+    # Shorter edges are more promising
+    return 1/distance_matrix
+'''
+
+
+class FakeEvaluator:
+    """Answers each candidate with the objective or outcome queued for its code, and counts the calls."""
+
+    def __init__(self, outcomes: dict[str, dict]) -> None:
+        self.outcomes = outcomes
+        self.evaluated: list[str] = []
+
+    def iter_results(self, tasks):
+        stream = TaskStream.of(tasks)
+        while not stream.finished:
+            for task in stream.drain():
+                self.evaluated.append(task.code)
+                yield EvaluationResult(task, **self.outcomes[task.code])
+
+    def close(self) -> None:
+        pass
+
+
+def make_tasks(tmp_path, codes, **kwargs) -> list[EvaluationTask]:
+    return [EvaluationTask(code, str(tmp_path / f"stdout_{i}.txt"), response_id=i, **kwargs)
+            for i, code in enumerate(codes)]
+
+
+def test_normalize_code_ignores_formatting_comments_and_docstrings():
+    assert normalize_code(CODE) == normalize_code(REFORMATTED)
+    assert normalize_code(CODE) != normalize_code(CODE.replace("1 /", "2 /"))
+
+
+def test_normalize_code_merges_heuristic_name_suffixes_only_with_aliases():
+    v1 = CODE.replace("heuristics_v2", "heuristics_v1")
+    assert normalize_code(v1, ALIASES) == normalize_code(CODE, ALIASES)
+    assert normalize_code(v1) != normalize_code(CODE)
+    # Two aliased functions: which one the evaluator binds is ambiguous, so nothing is renamed
+    both = CODE + v1
+    assert normalize_code(both, ALIASES) != normalize_code(both.replace("heuristics_v1", "heuristics_v3"), ALIASES)
+
+
+def test_normalize_code_falls_back_to_the_source_when_it_does_not_parse():
+    assert normalize_code("def f(:\n    pass   \n") == "def f(:\n    pass"
+
+
+def test_code_fingerprint_covers_problem_size_split_and_version():
+    key = code_fingerprint(CODE, "tsp_aco", 50, "train", "v")
+    assert key == code_fingerprint(REFORMATTED, "tsp_aco", 50, "train", "v")
+    assert len({key,
+                code_fingerprint(CODE, "cvrp_aco", 50, "train", "v"),
+                code_fingerprint(CODE, "tsp_aco", 100, "train", "v"),
+                code_fingerprint(CODE, "tsp_aco", 50, "val", "v"),
+                code_fingerprint(CODE, "tsp_aco", 50, "train", "w")}) == 5
+
+
+def test_duplicates_in_a_batch_are_evaluated_once(tmp_path):
+    inner = FakeEvaluator({CODE: {"obj": 1.5}, REFORMATTED: {"obj": 2.0}, "x = 1": {"obj": 3.0}})
+    evaluator = CachedEvaluator(inner, FitnessCache(), "tsp_aco", 50)
+    results = evaluator.run(make_tasks(tmp_path, [CODE, REFORMATTED, "x = 1", CODE]))
+    assert inner.evaluated == [CODE, "x = 1"]
+    assert [result.task.response_id for result in results] == [0, 1, 2, 3]
+    assert [result.obj for result in results] == [1.5, 1.5, 3.0, 1.5]
+    assert "Fitness cache hit" in (tmp_path / "stdout_1.txt").read_text()
+
+
+def test_known_candidates_are_answered_from_the_cache(tmp_path):
+    inner = FakeEvaluator({CODE: {"obj": 1.5}, "x = 1": {"traceback_msg": "Traceback: boom"}})
+    evaluator = CachedEvaluator(inner, FitnessCache(), "tsp_aco", 50)
+    evaluator.run(make_tasks(tmp_path, [CODE, "x = 1"]))
+    results = evaluator.run(make_tasks(tmp_path, [REFORMATTED, "x = 1"]))
+    assert inner.evaluated == [CODE, "x = 1"]
+    assert results[0].obj == 1.5
+    assert not results[1].success and results[1].traceback_msg == "Traceback: boom"
+
+
+@pytest.mark.parametrize("outcome", [
+    {"timed_out": True, "traceback_msg": "Timed out"},
+    {"stopped_early": True, "traceback_msg": "Evaluation stopped early"},
+    {"obj": 4.0, "timed_out_instances": [1]},
+])
+def test_load_dependent_results_are_not_cached(tmp_path, outcome):
+    inner = FakeEvaluator({CODE: outcome})
+    cache = FitnessCache()
+    evaluator = CachedEvaluator(inner, cache, "tsp_aco", 50)
+    evaluator.run(make_tasks(tmp_path, [CODE]))
+    evaluator.run(make_tasks(tmp_path, [CODE]))
+    assert inner.evaluated == [CODE, CODE]
+    assert len(cache) == 0
+
+
+def test_lower_fidelity_is_cached_apart_from_full_evaluations(tmp_path):
+    inner = FakeEvaluator({CODE: {"obj": 1.5}})
+    evaluator = CachedEvaluator(inner, FitnessCache(), "tsp_aco", 50)
+    evaluator.run(make_tasks(tmp_path, [CODE], fidelity=0.25))
+    evaluator.run(make_tasks(tmp_path, [CODE]))
+    evaluator.run(make_tasks(tmp_path, [CODE], fidelity=0.25))
+    assert inner.evaluated == [CODE, CODE]
+
+
+def test_only_successes_are_persisted(tmp_path):
+    path = tmp_path / "cache" / "fitness.jsonl"
+    inner = FakeEvaluator({CODE: {"obj": 1.5}, "x = 1": {"traceback_msg": "Traceback: boom"}})
+    CachedEvaluator(inner, FitnessCache(str(path)), "tsp_aco", 50).run(make_tasks(tmp_path, [CODE, "x = 1"]))
+    assert [json.loads(line)["obj"] for line in path.read_text().splitlines()] == [1.5]
+
+    inner = FakeEvaluator({CODE: {"obj": 9.0}, "x = 1": {"obj": 2.0}})
+    results = CachedEvaluator(inner, FitnessCache(str(path)), "tsp_aco", 50).run(make_tasks(tmp_path, [CODE, "x = 1"]))
+    assert inner.evaluated == ["x = 1"]
+    assert [result.obj for result in results] == [1.5, 2.0]
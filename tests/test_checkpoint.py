@@ -0,0 +1,59 @@
+import os
+import random
+
+import numpy as np
+import pytest
+from omegaconf import OmegaConf
+
+from hsevo import CHECKPOINT_FILENAME, CHECKPOINT_STATE, HSEvo
+
+
+def make_hsevo(checkpoint: bool = True) -> HSEvo:
+    """An HSEvo with only the state the checkpoint touches, without a config's evaluator or LLM."""
+    hsevo = HSEvo.__new__(HSEvo)
+    hsevo.cfg = OmegaConf.create({"checkpoint": checkpoint})
+    hsevo.wall_time_before = 0.0
+    hsevo.start_time = 0.0
+    return hsevo
+
+
+@pytest.fixture(autouse=True)
+def in_tmp_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+
+def test_resume_restores_the_run_state_and_rngs():
+    hsevo = make_hsevo()
+    for i, name in enumerate(CHECKPOINT_STATE):
+        setattr(hsevo, name, i)
+    hsevo.population = [{"code": "def heuristics(): pass", "obj": 1.5}]
+    hsevo.hs_memory = {"key": [({"a": 0.1}, 2.0)]}
+    hsevo.iteration = 3
+    random.seed(0)
+    np.random.seed(0)
+    hsevo.save_checkpoint()
+    expected = random.random(), np.random.rand()
+    for name in ("metrics_iter2.jsonl", "metrics_iter3.jsonl", "metrics_iter4.jsonl"):
+        open(name, 'w').close()
+
+    resumed = make_hsevo()
+    assert resumed.load_checkpoint()
+    for name in CHECKPOINT_STATE:
+        assert getattr(resumed, name) == getattr(hsevo, name), name
+    assert (random.random(), np.random.rand()) == expected
+    assert resumed.wall_time_before > 0
+    # Metrics of the iteration that was interrupted are written again
+    assert sorted(name for name in os.listdir() if name.startswith("metrics_iter")) == ["metrics_iter2.jsonl"]
+
+
+def test_resume_without_checkpoint_starts_a_new_run():
+    hsevo = make_hsevo()
+    assert not hsevo.load_checkpoint()
+    assert not hasattr(hsevo, "generation")
+
+
+def test_checkpoint_can_be_disabled():
+    hsevo = make_hsevo(checkpoint=False)
+    hsevo.generation = 1
+    hsevo.save_checkpoint()
+    assert not os.path.exists(CHECKPOINT_FILENAME)
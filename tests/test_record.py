@@ -0,0 +1,70 @@
+import signal
+import time
+
+import pytest
+
+from evaluation.record import InstanceBudget, current_record, reset_record, solve_instances
+
+
+@pytest.fixture(autouse=True)
+def fresh_record():
+    reset_record()
+    yield
+    reset_record()
+
+
+def solve(instance):
+    """Returns the instance itself, or hangs on ``"slow"``."""
+    if instance == "slow":
+        time.sleep(5)
+    return instance
+
+
+def test_instance_over_budget_scores_the_penalty():
+    reset_record(budget=InstanceBudget(seconds=0.1, penalty=0.5))
+    start = time.monotonic()
+    objs = solve_instances(solve, [1.0, "slow", 3.0])
+    assert time.monotonic() - start < 2
+    assert objs == [1.0, 4.5, 3.0]
+    record = current_record()
+    assert record.timed_out_instances == [1]
+    assert record.instance_objs == [1.0, 4.5, 3.0]
+    assert len(record.instance_times) == 3
+
+
+def test_penalty_is_worse_in_the_maximisation_sense():
+    reset_record(budget=InstanceBudget(seconds=0.1, penalty=0.5, maximize=True))
+    assert solve_instances(solve, [2.0, "slow", 4.0]) == [2.0, 1.0, 4.0]
+
+
+def test_candidate_cannot_swallow_the_timeout():
+    def stubborn(instance):
+        try:
+            return solve(instance)
+        except Exception:
+            return 0.0
+
+    reset_record(budget=InstanceBudget(seconds=0.1))
+    assert solve_instances(stubborn, [1.0, "slow"]) == [1.0, 2.0]
+    assert current_record().timed_out_instances == [1]
+
+
+def test_every_instance_timing_out_is_a_failure():
+    reset_record(budget=InstanceBudget(seconds=0.1))
+    with pytest.raises(RuntimeError, match="Every instance exceeded the time budget"):
+        solve_instances(solve, ["slow", "slow"])
+    assert current_record().timed_out_instances == [0, 1]
+
+
+def test_alarm_is_disarmed_and_handler_restored():
+    handler = signal.getsignal(signal.SIGALRM)
+    reset_record(budget=InstanceBudget(seconds=0.1))
+    solve_instances(solve, [1.0, "slow", 2.0])
+    assert signal.getitimer(signal.ITIMER_REAL) == (0.0, 0.0)
+    assert signal.getsignal(signal.SIGALRM) is handler
+
+
+def test_without_budget_instances_are_not_interrupted():
+    reset_record()
+    assert solve_instances(lambda instance: time.sleep(0.2) or instance, [1.0, 2.0]) == [1.0, 2.0]
+    assert current_record().timed_out_instances == []
@@ -1,4 +1,4 @@
-from litellm import completion
+import ast
 import os
 import logging
 import concurrent.futures
@@ -25,18 +25,6 @@ def filter_traceback(s):
     return ''  # Return an empty string if no Traceback is found
 
 
-def block_until_running(stdout_filepath, log_status=False, iter_num=-1, response_id=-1):
-    # Ensure that the evaluation has started before moving on
-    while True:
-        log = file_to_string(stdout_filepath)
-        if len(log) > 0:
-            if log_status and "Traceback" in log:
-                logging.info(f"Iteration {iter_num}: Code Run {response_id} execution error!")
-            else:
-                logging.info(f"Iteration {iter_num}: Code Run {response_id} successful!")
-            break
-
-
 def extract_description(response: str) -> tuple[str, str]:
     # Regex patterns to extract code description enclosed in GPT response, it starts with ‘<start>’ and ends with ‘<end>’
     pattern_desc = [r'<start>(.*?)```python', r'<start>(.*?)<end>']
@@ -101,6 +89,18 @@ def multi_chat_completion(messages_list: list[list[dict]], n, model, temperature
     ]
     param: n: number of responses to generate for each message in messages_list
     """
+    contents = dict(iter_chat_completion(messages_list, n, model, temperature, max_tokens, enable_thinking,
+                                         n_parallel))
+    return [contents[i] for i in range(len(contents))]
+
+
+def iter_chat_completion(messages_list: list[list[dict]], n, model, temperature,
+                         max_tokens=None, enable_thinking=None, n_parallel=None):
+    """
+    Same requests as `multi_chat_completion`, but yields `(index, content)` as soon as each request completes,
+    so that a response can be processed while slower ones are still being generated. `index` is the position
+    of the response in the list `multi_chat_completion` would return.
+    """
     # If messages_list is not a list of list (i.e., only one conversation), convert it to a list of list
     assert isinstance(messages_list, list), "messages_list should be a list."
     try:
@@ -122,14 +122,11 @@ def multi_chat_completion(messages_list: list[list[dict]], n, model, temperature
         num_workers = min(max(len(messages_list), 1), max(1, int(limit)))
 
     with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers) as executor:
-        args = [(n, messages, model, temperature, max_tokens, enable_thinking) for messages in messages_list]
-        choices = executor.map(lambda p: chat_completion(*p), args)
-
-    contents: list[str] = []
-    for choice in choices:
-        for c in choice:
-            contents.append(_get_message_text(c.message))
-    return contents
+        futures = {executor.submit(chat_completion, n, messages, model, temperature, max_tokens, enable_thinking): i
+                   for i, messages in enumerate(messages_list)}
+        for future in concurrent.futures.as_completed(futures):
+            for j, c in enumerate(future.result()):
+                yield futures[future] * n + j, _get_message_text(c.message)
 
 
 def chat_completion(n: int, messages: list[dict], model: str, temperature: float,
@@ -157,6 +154,9 @@ def chat_completion(n: int, messages: list[dict], model: str, temperature: float
         if enable_thinking:
             kwargs['extra_body'] = {'chat_template_kwargs': {'enable_thinking': True}}
 
+    # Imported here: litellm takes about a second to import, and eval.py runs import this module
+    from litellm import completion
+
     response_cur = None
     for attempt in range(30):
         try:
@@ -194,9 +194,41 @@ def extract_code_from_generator(content):
     if code_string is None:
         return None
 
-    global_imports = "import numpy as np\nimport random\nimport math\nimport scipy\nimport torch\n"
-    code_string = global_imports + code_string
-    return code_string
+    return add_missing_imports(code_string)
+
+
+# Modules the LLM often uses without importing them, by the name it uses them under
+COMMON_IMPORTS = {
+    "np": "import numpy as np",
+    "random": "import random",
+    "math": "import math",
+    "scipy": "import scipy",
+    "torch": "import torch",
+}
+
+
+def add_missing_imports(code_string):
+    """Prepend the common imports that the code uses but does not import itself.
+
+    Every candidate is imported by each evaluation, so an unused ``import torch``
+    costs seconds per evaluation on problems that never use torch.
+    """
+    try:
+        tree = ast.parse(code_string)
+    except SyntaxError:
+        # Let the evaluation report the error; guess the names from the text
+        used = {name for name in COMMON_IMPORTS if re.search(rf"\b{name}\.", code_string)}
+        bound = set()
+    else:
+        used = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+        bound = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                bound.update((alias.asname or alias.name).split('.')[0] for alias in node.names)
+            elif isinstance(node, ast.ImportFrom):
+                bound.update(alias.asname or alias.name for alias in node.names)
+    imports = [statement for name, statement in COMMON_IMPORTS.items() if name in used and name not in bound]
+    return "".join(statement + "\n" for statement in imports) + code_string
 
 
 def filter_code(code_string):
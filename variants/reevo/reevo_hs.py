@@ -1,8 +1,8 @@
-import subprocess
 import numpy as np
 import json
 import tiktoken
 from utils.utils import *
+from evaluation import EvaluationTask, make_evaluator
 
 
 class ReEvoHS:
@@ -23,6 +23,7 @@ class ReEvoHS:
         self.best_code_path_overall = None
 
         self.init_prompt()
+        self.evaluator = make_evaluator(self.cfg, self.root_dir)
         self.init_population()
 
     def init_prompt(self) -> None:
@@ -191,56 +192,27 @@ class ReEvoHS:
         """
         Evaluate population by running code in parallel and computing objective values.
         """
-        inner_runs = []
-        # Run code to evaluate
+        tasks = []
         for response_id in range(len(population)):
             self.function_evals += 1
             # Skip if response is invalid
             if population[response_id]["code"] is None:
                 population[response_id] = self.mark_invalid_individual(population[response_id], "Invalid response!")
-                inner_runs.append(None)
                 continue
 
             logging.info(f"Iteration {self.iteration}: Running Code {response_id}")
-
-            try:
-                process = self._run_code(population[response_id], response_id)
-                inner_runs.append(process)
-            except Exception as e:  # If code execution fails
-                logging.info(f"Error for response_id {response_id}: {e}")
-                population[response_id] = self.mark_invalid_individual(population[response_id], str(e))
-                inner_runs.append(None)
-
-        # Update population with objective values
-        for response_id, inner_run in enumerate(inner_runs):
-            if inner_run is None:  # If code execution fails, skip
-                continue
-            try:
-                inner_run.communicate(timeout=self.cfg.timeout)  # Wait for code execution to finish
-            except subprocess.TimeoutExpired as e:
-                logging.info(f"Error for response_id {response_id}: {e}")
-                population[response_id] = self.mark_invalid_individual(population[response_id], str(e))
-                inner_run.kill()
-                continue
-
             individual = population[response_id]
-            stdout_filepath = individual["stdout_filepath"]
-            with open(stdout_filepath, 'r') as f:  # read the stdout file
-                stdout_str = f.read()
-            traceback_msg = filter_traceback(stdout_str)
+            tasks.append(EvaluationTask(individual["code"], individual["stdout_filepath"], response_id))
 
-            individual = population[response_id]
-            # Store objective value for each individual
-            if traceback_msg == '':  # If execution has no error
-                try:
-                    individual["obj"] = float(stdout_str.split('\n')[-2]) if self.obj_type == "min" else -float(
-                        stdout_str.split('\n')[-2])
-                    individual["exec_success"] = True
-                except:
-                    population[response_id] = self.mark_invalid_individual(population[response_id],
-                                                                           "Invalid std out / objective value!")
+        # Update population with objective values
+        for result in self.evaluator.run(tasks):
+            response_id = result.task.response_id
+            if result.success:
+                population[response_id]["obj"] = result.obj if self.obj_type == "min" else -result.obj
+                population[response_id]["exec_success"] = True
             else:  # Otherwise, also provide execution traceback error feedback
-                population[response_id] = self.mark_invalid_individual(population[response_id], traceback_msg)
+                population[response_id] = self.mark_invalid_individual(population[response_id],
+                                                                       result.traceback_msg)
 
         # Log after all population is evaluated
         valid_objs = [ind["obj"] for ind in population if ind["exec_success"]]
@@ -249,25 +221,6 @@ class ReEvoHS:
 
         return population
 
-    def _run_code(self, individual: dict, response_id) -> subprocess.Popen:
-        """
-        Write code into a file and run eval script.
-        """
-        logging.debug(f"Iteration {self.iteration}: Processing Code Run {response_id}")
-
-        with open(self.output_file, 'w') as file:
-            file.writelines(individual["code"] + '\n')
-
-        # Execute the python file with flags
-        with open(individual["stdout_filepath"], 'w') as f:
-            eval_file_path = f'{self.root_dir}/problems/{self.problem}/eval.py' if self.problem_type != "black_box" else f'{self.root_dir}/problems/{self.problem}/eval_black_box.py'
-            process = subprocess.Popen(['python', '-u', eval_file_path, f'{self.problem_size}', self.root_dir, "train"],
-                                       stdout=f, stderr=f)
-
-        block_until_running(individual["stdout_filepath"], log_status=True, iter_num=self.iteration,
-                            response_id=response_id)
-        return process
-
     def update_iter(self) -> None:
         """
         Update after each iteration
@@ -583,6 +536,7 @@ class ReEvoHS:
         return population_hs[best_obj_id]
 
     def evolve(self):
+      try:
         while self.function_evals < self.cfg.max_fe:
             # If all individuals are invalid, stop
             if all([not individual["exec_success"] for individual in self.population]):
@@ -625,4 +579,7 @@ class ReEvoHS:
                 else:
                     try_hs_num -= 1
             self.update_iter()
-        return self.best_code_overall, self.best_code_path_overall
+      finally:
+        self.evaluator.close()
+
+      return self.best_code_overall, self.best_code_path_overall